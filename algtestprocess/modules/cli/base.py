@@ -9,12 +9,16 @@ logging.basicConfig(
 
 import click
 
-from algtestprocess.modules.cli.tpm.base import tpm_cli
+from algtestprocess.modules.cli.lazy import LazyGroup
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    lazy_commands={
+        'roca-scan': "algtestprocess.modules.cli.commands.roca_scan.roca_scan",
+        'javacard': "algtestprocess.modules.cli.javacard.base.javacard_cli",
+        'tpm': "algtestprocess.modules.cli.tpm.base.tpm_cli",
+    },
+)
 def cli():
     pass
-
-
-cli.add_command(tpm_cli)
@@ -0,0 +1,51 @@
+import logging
+import sys
+
+import click
+
+from algtestprocess.modules.utilities.rocascan import roca_scan as scan
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True,
+                type=click.Path(exists=True, file_okay=True, dir_okay=True))
+@click.option("--output", "-o", "output_path", default=None,
+              type=click.Path(dir_okay=False, writable=True),
+              help="JSON lines file with results, standard output if omitted.")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=1,
+              help="Number of processes scanning the files.")
+@click.option("--all", "all_keys", is_flag=True, default=False,
+              help="Report also the keys without the fingerprint.")
+@click.option("--old", is_flag=True, default=False,
+              help="Use the older fingerprinting by moduli.")
+def roca_scan(paths, output_path, jobs, all_keys, old):
+    """
+    Scans files, tar archives and directory trees (e.g. TPM measurement
+    dumps and certificate stores) for RSA keys with ROCA fingerprint.
+    Format of each file is detected from its first bytes, files of unknown
+    format are skipped. Results are written as JSON lines as soon as
+    each file is scanned.
+    """
+    logging.info(
+        f"roca_scan: {paths=}, {output_path=}, {jobs=}, {all_keys=}, {old=}")
+
+    out = open(output_path, "w") if output_path is not None else sys.stdout
+    files = skipped = tested = found = 0
+    try:
+        for path, fmt, lines, file_tested, file_found in scan(
+                paths, jobs=jobs, old=old, marked_only=not all_keys):
+            files += 1
+            if fmt is None:
+                skipped += 1
+                logging.debug(f"roca_scan: unknown format, skipping {path=}")
+            for line in lines:
+                out.write(line + "\n")
+            out.flush()
+            tested += file_tested
+            found += file_found
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    click.echo(f"{files} files ({skipped} skipped), {tested} keys tested, "
+               f"{found} with fingerprint", err=True)
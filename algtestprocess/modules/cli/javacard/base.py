@@ -0,0 +1,18 @@
+import click
+
+from algtestprocess.modules.cli.lazy import LazyGroup
+
+COMMANDS = "algtestprocess.modules.cli.javacard.commands"
+
+
+@click.group(
+    name='javacard',
+    help='A collection of commands for processing of results from JCAlgTest',
+    cls=LazyGroup,
+    lazy_commands={
+        'convert': f"{COMMANDS}.convert.convert",
+        'dataset-export': f"{COMMANDS}.dataset_export.dataset_export",
+    },
+)
+def javacard_cli():
+    pass
@@ -0,0 +1,20 @@
+import logging
+
+import click
+
+from algtestprocess.modules.parser.javacard.performance import convert_to_json
+
+
+@click.command()
+@click.argument("results_path",
+                type=click.Path(exists=True, file_okay=False, dir_okay=True))
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=1,
+              help="Number of processes converting the files.")
+def convert(results_path, jobs):
+    """
+    Converts JCAlgTest performance CSVs found in the results directory
+    into JSON profiles stored next to them.
+    """
+    logging.info(f"convert: {results_path=}, {jobs=}")
+    converted = convert_to_json(results_path, True, jobs=jobs)
+    logging.info(f"convert: {len(converted)} files converted")
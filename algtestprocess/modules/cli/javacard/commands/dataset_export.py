@@ -0,0 +1,37 @@
+import logging
+
+import click
+
+from algtestprocess.modules.parser.javacard.corpus import \
+    load_javacard_corpus
+
+
+@click.command()
+@click.argument("results_path",
+                type=click.Path(exists=True, file_okay=False, dir_okay=True))
+@click.option("--output", "-o",
+              type=click.Path(dir_okay=False, writable=True),
+              default="javacard-performance.csv",
+              help="Output CSV, or parquet file if it ends with .parquet.")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=1,
+              help="Number of processes parsing the profiles.")
+@click.option("--cache", type=click.Path(file_okay=False), default=None,
+              help="Directory of parsed profiles reused by later runs.")
+def dataset_export(results_path, output, jobs, cache):
+    """
+    Loads all JavaCard performance profiles found in the results directory
+    and exports them as one table, row per measured function and card.
+    """
+    logging.info(f"dataset_export: {results_path=}, {output=}, {jobs=}")
+    dataset = load_javacard_corpus(
+        results_path, kinds=[], jobs=jobs, cache_path=cache, dataset=True
+    )
+    frame = dataset.frame.copy()
+    frame["device"] = [dataset.devices[i] for i in frame["device"]]
+
+    if output.endswith(".parquet"):
+        frame.to_parquet(output, index=False)
+    else:
+        frame.to_csv(output, index=False)
+    logging.info(
+        f"dataset_export: {len(dataset.devices)} cards, {len(frame)} results")
@@ -0,0 +1,37 @@
+import importlib
+from typing import Dict, List, Optional
+
+import click
+
+
+class LazyGroup(click.Group):
+    """
+    Click group which imports its subcommands only when they are needed
+
+    Subcommands are given as "module.attribute" import paths, so that
+    invoking one command does not import the dependencies of the others
+    (e.g. plotting stack of report-create for metadata-update).
+    """
+
+    def __init__(self, *args, lazy_commands: Optional[Dict[str, str]] = None,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) |
+                      set(self.lazy_commands.keys()))
+
+    def get_command(self, ctx: click.Context,
+                    cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name: str) -> click.Command:
+        module_name, attribute = self.lazy_commands[cmd_name].rsplit(".", 1)
+        command = getattr(importlib.import_module(module_name), attribute)
+        if not isinstance(command, click.Command):
+            raise ValueError(
+                f"Lazy command {cmd_name} is not a click command: {command}")
+        return command
@@ -1,20 +1,21 @@
 import click
 
-from algtestprocess.modules.cli.tpm.commands.metadata_update import \
-    metadata_update
-from algtestprocess.modules.cli.tpm.commands.report_create import report_create
-from algtestprocess.modules.cli.tpm.commands.summary_create import \
-    summary_create
+from algtestprocess.modules.cli.lazy import LazyGroup
+
+COMMANDS = "algtestprocess.modules.cli.tpm.commands"
 
 
 @click.group(
     name='tpm',
     help='A collection of commands for processing of results from tpm2-algtest',
+    cls=LazyGroup,
+    lazy_commands={
+        'keystore-ingest': f"{COMMANDS}.keystore_ingest.keystore_ingest",
+        'metadata-update': f"{COMMANDS}.metadata_update.metadata_update",
+        'report-create': f"{COMMANDS}.report_create.report_create",
+        'rsa-fingerprint': f"{COMMANDS}.rsa_fingerprint.rsa_fingerprint",
+        'summary-create': f"{COMMANDS}.summary_create.summary_create",
+    },
 )
 def tpm_cli():
     pass
-
-
-tpm_cli.add_command(metadata_update)
-tpm_cli.add_command(report_create)
-tpm_cli.add_command(summary_create)
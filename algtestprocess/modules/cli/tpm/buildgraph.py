@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+import os.path
+from typing import Any, Dict, Optional, Set
+
+from checksumdir import dirhash
+
+Digest = str
+BuildRecord = Dict[str, Any]
+"""
+{
+    "digest": str,
+    "produced": bool,
+    "data": Any
+}
+"""
+
+
+def digest_of(*parts: Any) -> Digest:
+    """Stable digest of json serializable build inputs"""
+    serialized = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class BuildGraph:
+    """
+    Make-style dependency cache of the report outputs
+
+    Each output (path relative to the report root) declares a digest of its
+    inputs, typically measurement folder hashes together with the parameters
+    of the plot. Outputs whose digest did not change since the last run are
+    considered fresh and are not rebuilt. Outputs which were recorded in the
+    previous run but were not declared in the current one are pruned.
+    """
+
+    FILENAME = ".build-graph.json"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.path = os.path.join(root, BuildGraph.FILENAME)
+        self.records: Dict[str, BuildRecord] = {}
+        self.declared: Set[str] = set()
+        self._folder_hashes: Dict[str, Digest] = {}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.records = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                logging.warning(
+                    f"BuildGraph: could not load {self.path}, rebuilding all")
+                self.records = {}
+
+    def _key(self, output: str) -> str:
+        return os.path.relpath(output, self.root)
+
+    def folder_hash(self, folder: str) -> Digest:
+        """Hash of the measurement folder contents, computed once per run"""
+        if folder not in self._folder_hashes:
+            self._folder_hashes[folder] = dirhash(folder)
+        return self._folder_hashes[folder]
+
+    def fresh(self, output: str, digest: Digest) -> bool:
+        """
+        Checks whether output is up to date, also declares it for this run
+        :param output: path to the output file
+        :param digest: digest of all inputs of the output
+        :return: True if the output does not have to be rebuilt
+        """
+        key = self._key(output)
+        self.declared.add(key)
+        record = self.records.get(key)
+        if record is None or record["digest"] != digest:
+            return False
+        return not record["produced"] or os.path.exists(output)
+
+    def data(self, output: str) -> Optional[Any]:
+        """Returns additional data stored along with the output"""
+        record = self.records.get(self._key(output))
+        return record.get("data") if record else None
+
+    def record(self, output: str, digest: Digest, produced: bool = True,
+               data: Optional[Any] = None):
+        """
+        Records the output as built from inputs with given digest
+        :param output: path to the output file
+        :param digest: digest of all inputs of the output
+        :param produced: False if the build did not produce any file,
+               e.g. there was no data to plot
+        :param data: additional json serializable data to be stored
+        """
+        key = self._key(output)
+        self.declared.add(key)
+        self.records[key] = {
+            "digest": digest,
+            "produced": produced,
+            "data": data
+        }
+
+    def prune(self):
+        """Removes stale outputs which were not declared in this run"""
+        for key in set(self.records.keys()) - self.declared:
+            record = self.records.pop(key)
+            path = os.path.join(self.root, key)
+            if record["produced"] and os.path.isfile(path):
+                logging.info(f"BuildGraph: pruning stale output {path}")
+                os.remove(path)
+
+            # Remove directories which remained empty after pruning
+            directory = os.path.dirname(path)
+            while os.path.abspath(directory) != os.path.abspath(self.root) \
+                    and os.path.isdir(directory) \
+                    and not os.listdir(directory):
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.records, f, indent=2)
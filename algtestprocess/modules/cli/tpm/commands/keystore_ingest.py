@@ -0,0 +1,56 @@
+import json
+import logging
+
+import click
+
+from algtestprocess.modules.cli.tpm.types import ReportMetadata
+from algtestprocess.modules.data.tpm.keystore import KeyStore, \
+    cryptoprops_records, tpm_pcr_records, EK, RSK
+from algtestprocess.modules.data.tpm.manager import TPMProfileManager
+
+
+@click.command()
+@click.argument("store_path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--tpm-pcr-metadata", "tpm_pcr_metadata_path",
+              type=click.Path(exists=True, dir_okay=False), default=None,
+              help="tpm-pcr-metadata.json created by summary-create.")
+@click.option("--report-metadata", "report_metadata_path",
+              type=click.Path(exists=True, dir_okay=False), default=None,
+              help="metadata.json with tpm2-algtest measurement paths.")
+def keystore_ingest(store_path, tpm_pcr_metadata_path, report_metadata_path):
+    """
+    Adds EKs and RSKs from TPM-PCR and tpm2-algtest measurements into
+    the key store, keys already present in the store are skipped.
+    """
+    logging.info(
+        f"keystore_ingest: "
+        f"{store_path=}, "
+        f"{tpm_pcr_metadata_path=}, "
+        f"{report_metadata_path=}"
+    )
+
+    with KeyStore(store_path) as store:
+        if tpm_pcr_metadata_path is not None:
+            with open(tpm_pcr_metadata_path, "r") as f:
+                measurements = json.load(f)
+            added = store.add(tpm_pcr_records(measurements))
+            logging.info(f"keystore_ingest: {added} keys from TPM-PCR")
+
+        if report_metadata_path is not None:
+            with open(report_metadata_path, "r") as f:
+                metadata: ReportMetadata = json.load(f)
+
+            added = 0
+            for entry in metadata.get("entries", {}).values():
+                for folder in entry.get("measurement paths", []):
+                    try:
+                        cpps = TPMProfileManager(folder).cryptoprops
+                    except Exception as e:
+                        logging.error(
+                            f"keystore_ingest: could not load {folder=}, {e}")
+                        continue
+                    if cpps is not None:
+                        added += store.add(cryptoprops_records(cpps))
+            logging.info(f"keystore_ingest: {added} keys from tpm2-algtest")
+
+        print(f"{store.count(EK)} EKs, {store.count(RSK)} RSKs in {store_path}")
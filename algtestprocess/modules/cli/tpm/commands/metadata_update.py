@@ -1,17 +1,79 @@
+import hashlib
 import json
 import logging
 import os.path
+from typing import Dict, FrozenSet, Optional
 
 import click
-from checksumdir import dirhash
 
+from algtestprocess.modules.cli.tpm.options import create_scheduler, \
+    scheduler_options
 from algtestprocess.modules.cli.tpm.types import ReportMetadata
 from algtestprocess.modules.data.tpm.manager import TPMProfileManager
 from algtestprocess.modules.parser.tpm.utils import _walk
+from algtestprocess.modules.scheduler import Scheduler, Task
+
+
+def inspect_folder(folder: str, known_hashes: FrozenSet[str]) \
+        -> Dict[str, Optional[str]]:
+    """
+    Hashes the measurement folder and retrieves the TPM it measured,
+    parsing is skipped for folders already included
+    :return: dict with hash, TPM name and vendor, name is None if the folder
+             could not be parsed
+    """
+    from checksumdir import dirhash
+
+    h = dirhash(folder)
+    inspected = {"hash": h, "TPM name": None, "vendor": None}
+    if h in known_hashes:
+        return inspected
+
+    # We try to parse each, so that in final report only successfully parse-able profiles are included
+    try:
+        manager = TPMProfileManager(folder)
+        support = manager.support_profile
+
+        tpm_name = None
+        vendor = None
+        if support is not None:
+            tpm_name = support.device_name
+            vendor = support.manufacturer
+
+        if support is None or len(support.results) == 0:
+            logging.info(
+                f"inspect_folder: no support results in {folder=}")
+
+        if tpm_name is None:
+            performance = manager.performance_profile
+            if performance:
+                tpm_name = performance.device_name
+                vendor = performance.manufacturer
+
+            if tpm_name is None:
+                logging.warning(
+                    f"inspect_folder: unable to retrieve TPM name in {folder=}")
+                return inspected
+
+        del manager
+    except Exception as e:
+        logging.error(
+            f"inspect_folder: {folder} unknown error, typically parsing old format {e}")
+        return inspected
+
+    inspected["TPM name"] = tpm_name.replace('"', '').strip()
+    inspected["vendor"] = vendor.replace('"', '').strip()
+    return inspected
 
 
 def process_measurement_folders(metadata: ReportMetadata, measurement_folders,
-                                key: str):
+                                key: str,
+                                scheduler: Optional[Scheduler] = None):
+    """
+    Adds the folders not included yet to the entries of the metadata
+    :param scheduler: runs inspection of the folders, by default single
+           worker process without journal
+    """
     if metadata.get("entries") is None:
         metadata["entries"] = {}
 
@@ -21,9 +83,25 @@ def process_measurement_folders(metadata: ReportMetadata, measurement_folders,
     else:
         hashes = set(metadata["hashes"])
 
-    for folder in measurement_folders:
-        # First check if folder already isn't in hashes
-        h = dirhash(folder)
+    known_hashes = frozenset(hashes)
+    known_digest = hashlib.sha256(
+        "\n".join(sorted(known_hashes)).encode("utf-8")).hexdigest()
+    tasks = [
+        Task(f"metadata:{folder}", inspect_folder, (folder, known_hashes),
+             inputs=[folder], params=[known_digest])
+        for folder in measurement_folders
+    ]
+    results = (scheduler or Scheduler(progress=False)).run(tasks)
+
+    # Results are merged in order of the folders, so that the first one
+    # of folders with the same contents is included
+    for folder, result in zip(measurement_folders, results):
+        if not result.ok:
+            logging.error(
+                f"process_measurement_folders: {folder=} failed, {result.error}")
+            continue
+
+        h = result.result["hash"]
         if h in hashes:
             logging.info(
                 f"process_measurement_folders: {folder=} was already in hashes")
@@ -31,42 +109,11 @@ def process_measurement_folders(metadata: ReportMetadata, measurement_folders,
 
         hashes.add(h)
 
-        # We try to parse each, so that in final report only successfully parse-able profiles are included
-        try:
-            manager = TPMProfileManager(folder)
-            support = manager.support_profile
-
-            tpm_name = None
-            vendor = None
-            if support is not None:
-                tpm_name = support.device_name
-                vendor = support.manufacturer
-
-            if support is None or len(support.results) == 0:
-                logging.info(
-                    f"process_measurement_folders: no support results in {folder=}")
-
-            if tpm_name is None:
-                performance = manager.performance_profile
-                if performance:
-                    tpm_name = performance.device_name
-                    vendor = performance.manufacturer
-
-                if tpm_name is None:
-                    logging.warning(
-                        f"process_measurement_folders: unable to retrieve TPM name in {folder=}")
-                    del manager
-                    continue
-
-            del manager
-        except Exception as e:
-            logging.error(
-                f"process_measurement_folders: {folder} unknown error, typically parsing old format {e}")
+        tpm_name = result.result["TPM name"]
+        vendor = result.result["vendor"]
+        if tpm_name is None:
             continue
 
-        tpm_name = tpm_name.replace('"', '').strip()
-        vendor = vendor.replace('"', '').strip()
-
         prefix = "" if key == "" else " "
         entry_key = f"{tpm_name}{prefix}{key}"
         entry = metadata["entries"].get(entry_key)
@@ -85,8 +132,6 @@ def process_measurement_folders(metadata: ReportMetadata, measurement_folders,
     metadata["hashes"] = list(hashes)
 
 
-
-
 @click.command()
 @click.argument("measurements_path",
                 type=click.Path(exists=True, dir_okay=True))
@@ -103,11 +148,18 @@ def process_measurement_folders(metadata: ReportMetadata, measurement_folders,
     default=None
 )
 @click.option("--key", type=click.STRING, default="")
+@scheduler_options
 def metadata_update(measurements_path, output_path, prev_report_metadata_path,
-                  key):
+                  key, scheduler_config):
     """
     Over several steps collects metadata on what is to be included in the report,
     preventing things such as double includes and similar.
+
+    Measurement folders are inspected by --jobs worker processes, finished
+    folders are journaled, so that an interrupted run can be continued
+    with --resume. Folders which exceed --timeout or --memory-limit, or
+    crash their worker, are quarantined and skipped by following runs
+    until they change.
     """
     logging.info(
         f"report_update: "
@@ -135,7 +187,10 @@ def metadata_update(measurements_path, output_path, prev_report_metadata_path,
             f"metadata_update: no measurements folder found in {measurements_path=}")
         return
 
-    process_measurement_folders(metadata, measurement_folders, key)
+    with create_scheduler("metadata-update", output_path,
+                          **scheduler_config) as scheduler:
+        process_measurement_folders(metadata, measurement_folders, key,
+                                    scheduler)
 
     with open(os.path.join(output_path, "metadata.json"), "w") as f:
         json.dump(metadata, f, indent=2)
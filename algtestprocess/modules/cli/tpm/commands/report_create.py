@@ -3,48 +3,230 @@ import json
 import logging
 import os
 import os.path
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
 import click
 import pandas as pd
 
+from algtestprocess.modules.cli.tpm.buildgraph import BuildGraph, digest_of
+from algtestprocess.modules.cli.tpm.options import create_scheduler, \
+    scheduler_options
 from algtestprocess.modules.cli.tpm.types import ReportEntry, ReportMetadata
 from algtestprocess.modules.data.tpm.enums import CryptoPropResultCategory
 from algtestprocess.modules.data.tpm.manager import TPMProfileManager
-from algtestprocess.modules.visualization.heatmap import Heatmap
+from algtestprocess.modules.visualization.heatmap import FastHeatmap, Heatmap
+from algtestprocess.modules.visualization.plot import Plot, PlotCache
 from algtestprocess.modules.visualization.spectrogram import Spectrogram
+from algtestprocess.modules.scheduler import Task, TaskResult
 
+# Upper bound on number of rows, after which no more measurements are added
+MAX_PLOTTED_ROWS = 100000
 
-def process_vendor(entries: List[ReportEntry], vendor: str, vendor_path: str):
-    vendor_tpm_count = 0
-    vendor_support_stats = {}
-    for entry in entries:
-        tpm_name = entry["TPM name"]
-        title = entry["title"]
-        support_found = False
 
-        # Assuming that all TPMs with exact same firmware version and manufacturer support same capabilities
-        # Because I have no idea to tell if the tpm2-algtest was just unsuccessful retrieving them, crashed,
-        # or same TPMs really can have different capabilities
-        tpm_support_stats = set()
+def load_support_stats(managers: List[TPMProfileManager]):
+    """
+    Collects capabilities supported by the TPM
+    :return: tuple (support found, set of capabilities)
+    """
+    support_found = False
+    tpm_support_stats = set()
+    for manager in managers:
+        support_handle = manager.support_profile
+
+        if support_handle is not None and len(support_handle.results) > 0:
+            support_found = True
+            for capability in support_handle.results.keys():
+                tpm_support_stats.add(capability)
+        gc.collect()
+    return support_found, tpm_support_stats
+
+
+# Plots of each TPM, (algorithm, columns, plot name)
+PLOTS = [
+    (CryptoPropResultCategory.RSA_1024, ["n", "p", "q"], "heatmap"),
+    (CryptoPropResultCategory.RSA_2048, ["n", "p", "q"], "heatmap"),
+    (CryptoPropResultCategory.ECC_BN256_ECDSA, ["duration", "duration_extra","nonce"], "spectrogam"),
+    (CryptoPropResultCategory.ECC_P256_ECDSA, ["duration", "duration_extra","nonce"], "spectrogam"),
+    (CryptoPropResultCategory.ECC_P384_ECDSA, ["duration", "duration_extra","nonce"], "spectrogam"),
+]
+
+
+class EntryPlan:
+    """Outputs of single TPM entry and the task rebuilding the stale ones"""
+
+    def __init__(self, entry: ReportEntry, task: Task,
+                 capabilities_path: str, capabilities_digest: str,
+                 output_digests: Dict[str, str]):
+        self.entry = entry
+        self.task = task
+        self.capabilities_path = capabilities_path
+        self.capabilities_digest = capabilities_digest
+        self.output_digests = output_digests
+
+
+def plan_entry(entry: ReportEntry, vendor_path: str,
+               graph: Optional[BuildGraph] = None,
+               plot_cache: Optional[str] = None,
+               render_threads: int = 1,
+               fast_heatmaps: bool = False) -> EntryPlan:
+    """
+    Declares outputs of the TPM entry in the build graph and creates the task
+    rendering those which are not fresh
+    """
+    tpm_name = entry["TPM name"]
+    title = entry["title"]
+
+    tpm_dir = os.path.join(vendor_path, f"{tpm_name}{title}")
+    os.makedirs(tpm_dir, exist_ok=True)
+
+    folder_hashes = None
+    if graph is not None:
+        folder_hashes = [graph.folder_hash(path)
+                         for path in entry["measurement paths"]]
+
+    # Assuming that all TPMs with exact same firmware version and manufacturer support same capabilities
+    # Because I have no idea to tell if the tpm2-algtest was just unsuccessful retrieving them, crashed,
+    # or same TPMs really can have different capabilities
+    capabilities_path = os.path.join(tpm_dir, "capabilities")
+    capabilities_digest = digest_of(folder_hashes, "capabilities")
+    support_stats = None
+    if graph is not None and graph.fresh(capabilities_path,
+                                         capabilities_digest):
+        support_stats = graph.data(capabilities_path)
+
+    outputs = []
+    output_digests = {}
+    for alg, cols, pname in PLOTS:
+        output = os.path.join(tpm_dir, f"{pname}_{alg.value}.png")
+        # Plot parameters are part of the inputs, so that change
+        # in the way plots are drawn invalidates them as well
+        output_digest = digest_of(
+            folder_hashes, alg.value, cols, pname, tpm_name, title,
+            MAX_PLOTTED_ROWS, fast_heatmaps and pname == "heatmap"
+        )
+        if graph is not None and graph.fresh(output, output_digest):
+            continue
+        outputs.append((alg, output))
+        output_digests[output] = output_digest
+
+    task = Task(
+        f"report:{tpm_dir}", render_entry,
+        (entry, support_stats, outputs, plot_cache, fast_heatmaps,
+         render_threads),
+        inputs=entry["measurement paths"],
+        outputs=output_digests.keys(),
+        params=[support_stats, sorted(output_digests.items()),
+                fast_heatmaps, MAX_PLOTTED_ROWS]
+    )
+    return EntryPlan(entry, task, capabilities_path, capabilities_digest,
+                     output_digests)
+
+
+def render_entry(entry: ReportEntry, support_stats: Optional[list],
+                 outputs: List[Tuple[CryptoPropResultCategory, str]],
+                 plot_cache: Optional[str] = None,
+                 fast_heatmaps: bool = False,
+                 render_threads: int = 1) -> Dict[str, Any]:
+    """
+    Collects capabilities of the TPM entry and renders its plots,
+    run by the scheduler
+    :param support_stats: [support found, capabilities] from the previous
+           run, None if they have to be collected
+    :param outputs: (algorithm, path) of the plots to be rendered
+    :param plot_cache: path to the PlotCache directory
+    :param render_threads: number of threads rendering the plots
+    :return: dict with support stats and whether each output was produced
+    """
+    tpm_name = entry["TPM name"]
+    title = entry["title"]
+
+    # Managers are created only when some of the outputs has to be rebuilt
+    managers = []
+
+    def get_managers():
+        if not managers:
+            for measurement_path in entry["measurement paths"]:
+                managers.append(TPMProfileManager(measurement_path))
+        return managers
+
+    if support_stats is None:
+        support_found, tpm_support_stats = load_support_stats(get_managers())
+        support_stats = [support_found, sorted(tpm_support_stats)]
+
+    cache = PlotCache(plot_cache) if plot_cache else None
+
+    # The plotting section
+    heatmap = lambda df: partial(
+        FastHeatmap if fast_heatmaps else Heatmap,
+        rsa_df=df,
+        device_name=tpm_name,
+        title=title,
+        cache=cache
+    )
+
+    spectrogram = lambda df: partial(
+        Spectrogram,
+        df=df,
+        device_name=tpm_name,
+        cache=cache
+    )
+
+    plots = {alg: (cols, heatmap if pname == "heatmap" else spectrogram)
+             for alg, cols, pname in PLOTS}
+
+    executor = ThreadPoolExecutor(render_threads) if render_threads > 1 \
+        else None
+    # Plots being rendered by the executor
+    pending = []
+    produced = {}
+    for alg, output in outputs:
+        cols, plot = plots[alg]
+        p = build_plot(get_managers(), alg, cols, plot, tpm_name, title)
+        produced[output] = p is not None
+        if p is not None and executor is not None:
+            pending.append(executor.submit(p.save, output, 'png'))
+            continue
+
+        if p is not None:
+            p.save(output, format='png')
+        gc.collect()
+
+    for future in pending:
+        future.result()
+    if executor is not None:
+        executor.shutdown()
 
-        tpm_dir = os.path.join(vendor_path, f"{tpm_name}{title}")
-        os.mkdir(tpm_dir)
+    del managers
+    gc.collect()
+    return {"support": support_stats, "produced": produced}
 
-        # Prepare manager classes, and collect support statistics
-        managers = []
-        for measurement_path in entry["measurement paths"]:
-            manager = TPMProfileManager(measurement_path)
-            managers.append(manager)
 
-            support_handle = manager.support_profile
+def process_vendor(plans: List[EntryPlan], results: List[TaskResult],
+                   graph: Optional[BuildGraph] = None):
+    """
+    Records the outputs of entries of the vendor in the build graph
+    and collects capabilities of its TPMs
+    :return: tuple (number of TPMs with support, capability -> count)
+    """
+    vendor_tpm_count = 0
+    vendor_support_stats = {}
+    for plan, result in zip(plans, results):
+        if not result.ok:
+            logging.error(
+                f"process_vendor: {plan.entry['TPM name']} failed, "
+                f"{result.error}")
+            continue
 
-            if support_handle is not None and len(support_handle.results) > 0:
-                support_found = True
-                for capability in support_handle.results.keys():
-                    tpm_support_stats.add(capability)
-            gc.collect()
+        support_found, tpm_support_stats = result.result["support"]
+        if graph is not None:
+            graph.record(plan.capabilities_path, plan.capabilities_digest,
+                         produced=False,
+                         data=[support_found, tpm_support_stats])
+            for output, produced in result.result["produced"].items():
+                graph.record(output, plan.output_digests[output],
+                             produced=produced)
 
         if support_found:
             for capability in tpm_support_stats:
@@ -53,76 +235,56 @@ def process_vendor(entries: List[ReportEntry], vendor: str, vendor_path: str):
                 vendor_support_stats[capability] += 1
             vendor_tpm_count += 1
 
-        # The plotting section
-        heatmap = lambda df: partial(
-            Heatmap,
-            rsa_df=df,
-            device_name=tpm_name,
-            title=title
-        )
-        
-        spectrogram = lambda df: partial(
-            Spectrogram,
-            df=df,
-            device_name=tpm_name
-        )
+    return vendor_tpm_count, vendor_support_stats
 
-        # For each algorithm, create smaller dataframe which will fit in memory
-        items = [
-            (CryptoPropResultCategory.RSA_1024, ["n", "p", "q"], heatmap,
-             "heatmap"),
-            (CryptoPropResultCategory.RSA_2048, ["n", "p", "q"], heatmap,
-             "heatmap"),
-            (CryptoPropResultCategory.ECC_BN256_ECDSA, ["duration", "duration_extra","nonce"], spectrogram, "spectrogam"),
-            (CryptoPropResultCategory.ECC_P256_ECDSA, ["duration", "duration_extra","nonce"], spectrogram, "spectrogam"),
-            (CryptoPropResultCategory.ECC_P384_ECDSA, ["duration", "duration_extra","nonce"], spectrogram, "spectrogam"),
-        ]
 
-        for alg, cols, plot, pname in items:
-            df = None
-            for man in managers:
-                cpps = man.cryptoprops
-
-                if cpps is None:
-                    logging.warning(
-                        f"process_vendor: manager for one of {tpm_name}{title} didn't find cryptoprops")
-                    continue
-
-                res = cpps.results.get(alg)
-
-                if res is not None:
-                    current_df = res.data
-                    
-                    # If the dataframe does not contain nonce, then we will skip
-                    # Some nonces, can be computed back from their coordinates on EC
-                    # but for now those wont be recovered
-                    if not set(cols).issubset(current_df.columns):
-                        continue
-                    
-                    stripped_df = current_df.loc[:, cols]
-                    if df is None:
-                        df = stripped_df
-                    else:
-                        if len(df.index) >= 100000:
-                            break
-                        df = pd.concat([df, stripped_df])
+def build_plot(managers: List[TPMProfileManager], alg, cols, plot,
+               tpm_name: str, title: str) -> Optional[Plot]:
+    """
+    Collects the data from all measurements of the TPM and computes the plot
+    :return: plot ready to be rendered, None if there is nothing to plot
+    """
+    df = None
+    for man in managers:
+        cpps = man.cryptoprops
 
-            if df is None:
-                logging.warning(
-                    f"process_vendor: {alg.value} for {tpm_name}{title} not found")
+        if cpps is None:
+            logging.warning(
+                f"process_vendor: manager for one of {tpm_name}{title} didn't find cryptoprops")
+            continue
+
+        res = cpps.results.get(alg)
+
+        if res is not None:
+            current_df = res.data
+
+            # If the dataframe does not contain nonce, then we will skip
+            # Some nonces, can be computed back from their coordinates on EC
+            # but for now those wont be recovered
+            if not set(cols).issubset(current_df.columns):
                 continue
 
-            if len(df.index) >= 5:
-                try:
-                    plot(df)().build().save(
-                    os.path.join(tpm_dir, f"{pname}_{alg.value}.png"),
-                    format='png')
-                except ValueError:
-                    logging.error(f"Heatmap: RSA dataframe has {len(df)} for {tpm_name} has no rows")
+            stripped_df = current_df.loc[:, cols]
+            if df is None:
+                df = stripped_df
+            else:
+                if len(df.index) >= MAX_PLOTTED_ROWS:
+                    break
+                df = pd.concat([df, stripped_df])
+
+    if df is None:
+        logging.warning(
+            f"process_vendor: {alg.value} for {tpm_name}{title} not found")
+        return None
 
-            gc.collect()
+    if len(df.index) < 5:
+        return None
 
-    return vendor_tpm_count, vendor_support_stats
+    try:
+        return plot(df)()
+    except ValueError:
+        logging.error(f"Heatmap: RSA dataframe has {len(df)} for {tpm_name} has no rows")
+        return None
 
 
 def _table(l: List[List[any]], cols, header):
@@ -148,10 +310,18 @@ def _table(l: List[List[any]], cols, header):
     return out
 
 
-def make_support_table(stats, count, title, output_path):
+def make_support_table(stats, count, title, output_path,
+                       graph: Optional[BuildGraph] = None):
     stats = [[alg] + [value, round(100 * (value / count), 2)] for
              alg, value in sorted(stats.items(), key=lambda x: x[0])]
-    with open(os.path.join(output_path, "support.md"), "w") as f:
+    path = os.path.join(output_path, "support.md")
+    if graph is not None:
+        digest = digest_of(stats, title)
+        if graph.fresh(path, digest):
+            return
+        graph.record(path, digest)
+
+    with open(path, "w") as f:
         f.write(f"# {title}\n")
         f.write(_table(stats, 1, ["Algorithm", "Support", "%"]))
 
@@ -161,7 +331,20 @@ def make_support_table(stats, count, title, output_path):
                 type=click.Path(exists=True, file_okay=True))
 @click.option("--output-path", "-o",
               type=click.Path(exists=True, dir_okay=True), default=".")
-def report_create(report_metadata_path, output_path):
+@click.option("--incremental", is_flag=True, default=False,
+              help="Rebuild only outputs whose inputs changed since the "
+                   "last run and prune the stale ones")
+@click.option("--plot-cache", type=click.Path(file_okay=False), default=None,
+              help="Directory of rendered plots keyed by hash of their data, "
+                   "shared between runs and reports")
+@click.option("--render-threads", type=click.IntRange(min=1), default=1,
+              help="Number of threads rendering the plots")
+@click.option("--fast-heatmaps", is_flag=True, default=False,
+              help="Render RSA heatmaps with the numpy based renderer "
+                   "instead of seaborn")
+@scheduler_options
+def report_create(report_metadata_path, output_path, incremental, plot_cache,
+                  render_threads, fast_heatmaps, scheduler_config):
     """
     Creates several folders and files, containing various info. Assumes we are
     content with all the folders we set up to be included in the report.
@@ -187,6 +370,22 @@ def report_create(report_metadata_path, output_path):
     | Support table |
 
     Links to visualizations
+
+    With --incremental, the inputs of each output (measurement folder hashes
+    and plot parameters) are recorded in ./tpms/.build-graph.json, and
+    only the outputs whose inputs changed are rebuilt.
+
+    With --plot-cache, the plots are looked up by hash of the plotted data
+    and parameters, so identical plots are rendered only once.
+
+    With --render-threads, the plots of each TPM are rendered in a thread
+    pool while the data of following plots is being loaded.
+
+    TPMs are processed by --jobs worker processes, finished TPMs are
+    journaled in ./tpms/.report-create.journal, so that an interrupted run
+    can be continued with --resume. TPMs whose measurements exceed
+    --timeout or --memory-limit, or crash their worker, are quarantined
+    in ./tpms/.report-create.quarantine.json until the measurements change.
     """
     grouped = load_metadata(report_metadata_path)
     
@@ -195,14 +394,34 @@ def report_create(report_metadata_path, output_path):
 
     # Create the tpms folder
     tpms_folder = os.path.join(output_path, "tpms")
-    os.mkdir(tpms_folder)
+    os.makedirs(tpms_folder, exist_ok=True)
 
-    total_count, total_stats = 0, {}
+    graph = BuildGraph(tpms_folder) if incremental else None
+
+    plans = {}
     for vendor in grouped.keys():
         vendor_folder = os.path.join(tpms_folder, vendor)
-        os.mkdir(vendor_folder)
-        vendor_tpm_count, vendor_stats = process_vendor(grouped[vendor], vendor,
-                                                        vendor_folder)
+        os.makedirs(vendor_folder, exist_ok=True)
+        plans[vendor] = [
+            plan_entry(entry, vendor_folder, graph, plot_cache,
+                       render_threads, fast_heatmaps)
+            for entry in grouped[vendor]
+        ]
+
+    # Tasks of all vendors are run at once, results are collected per vendor
+    with create_scheduler("report-create", tpms_folder,
+                          **scheduler_config) as scheduler:
+        results = iter(scheduler.run(
+            [plan.task for vendor_plans in plans.values()
+             for plan in vendor_plans]
+        ))
+
+    total_count, total_stats = 0, {}
+    for vendor, vendor_plans in plans.items():
+        vendor_folder = os.path.join(tpms_folder, vendor)
+        vendor_results = [next(results) for _ in vendor_plans]
+        vendor_tpm_count, vendor_stats = process_vendor(vendor_plans,
+                                                        vendor_results, graph)
 
         if vendor_tpm_count > 0:
             total_count += vendor_tpm_count
@@ -212,9 +431,14 @@ def report_create(report_metadata_path, output_path):
                 total_stats[capability] += count
             # Vendor support table
             make_support_table(vendor_stats, vendor_tpm_count, vendor,
-                               vendor_folder)
+                               vendor_folder, graph)
+
+    make_support_table(total_stats, total_count, 'Total support', tpms_folder,
+                       graph)
 
-    make_support_table(total_stats, total_count, 'Total support', tpms_folder)
+    if graph is not None:
+        graph.prune()
+        graph.save()
 
 def load_metadata(metadata_path):
     try:
@@ -0,0 +1,67 @@
+import csv
+import json
+import logging
+from typing import Dict, List
+
+import click
+
+from algtestprocess.modules.cli.tpm.types import ReportMetadata
+from algtestprocess.modules.utilities.rsa_fingerprint import BUCKET_COLUMNS, \
+    fingerprint_counts
+
+COLUMNS = ["firmware", "algorithm"] + BUCKET_COLUMNS + ["count"]
+
+
+@click.command()
+@click.argument("report_metadata_path",
+                type=click.Path(exists=True, dir_okay=False))
+@click.option("--output", "-o",
+              type=click.Path(dir_okay=False, writable=True),
+              default="rsa-fingerprint.csv",
+              help="Output CSV, or parquet file if it ends with .parquet.")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=1,
+              help="Number of processes computing the fingerprints.")
+@click.option("--recompute-q/--keep-q", default=True,
+              help="Compute prime q from n and p, as q is missing "
+                   "in some measurements.")
+def rsa_fingerprint(report_metadata_path, output, jobs, recompute_q):
+    """
+    Computes 5p_5q_blum_mod_roca fingerprint of RSA keys generated by TPMs
+    listed in metadata.json and writes table with number of keys per
+    firmware, algorithm and fingerprint bucket.
+    """
+    logging.info(
+        f"rsa_fingerprint: "
+        f"{report_metadata_path=}, "
+        f"{output=}, "
+        f"{jobs=}, "
+        f"{recompute_q=}"
+    )
+
+    with open(report_metadata_path, "r") as f:
+        metadata: ReportMetadata = json.load(f)
+
+    groups: Dict[str, List[str]] = {}
+    for entry in metadata.get("entries", {}).values():
+        groups.setdefault(entry["TPM name"], []).extend(
+            entry.get("measurement paths", []))
+
+    counts = fingerprint_counts(groups, jobs=jobs, recompute_q=recompute_q)
+    rows = [
+        [firmware, algorithm] + [int(x) for x in bucket] + [count]
+        for (firmware, algorithm), buckets in sorted(counts.items())
+        for bucket, count in sorted(buckets.items())
+    ]
+
+    if output.endswith(".parquet"):
+        import pandas as pd
+
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(output, index=False)
+    else:
+        with open(output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+    logging.info(
+        f"rsa_fingerprint: {sum(x[-1] for x in rows)} keys of "
+        f"{len({x[0] for x in rows})} firmwares")
@@ -0,0 +1,88 @@
+import os.path
+from functools import wraps
+from typing import Optional
+
+import click
+
+from algtestprocess.modules.scheduler import Journal, Quarantine, Scheduler
+
+
+def scheduler_options(command):
+    """
+    Adds options of the task scheduler to the command, the command receives
+    them as the scheduler_config dict passed to create_scheduler
+    """
+
+    @click.option("--jobs", "-j", type=click.IntRange(min=1), default=1,
+                  help="Number of worker processes.")
+    @click.option("--retries", type=click.IntRange(min=0), default=0,
+                  help="Number of times a failed task is run again.")
+    @click.option("--timeout", type=click.FloatRange(min=0, min_open=True),
+                  default=None,
+                  help="Time limit of a single task in seconds.")
+    @click.option("--journal", type=click.Path(dir_okay=False), default=None,
+                  help="Journal of finished tasks, defaults to a hidden file "
+                       "next to the outputs.")
+    @click.option("--resume", is_flag=True, default=False,
+                  help="Skip tasks finished by the previous run according "
+                       "to the journal if their inputs did not change.")
+    @click.option("--progress/--no-progress", default=True,
+                  help="Report progress on standard error.")
+    @click.option("--memory-limit", type=click.IntRange(min=1), default=None,
+                  help="Address space limit of each worker process in MiB.")
+    @click.option("--quarantine", type=click.Path(dir_okay=False),
+                  default=None,
+                  help="List of tasks which timed out, crashed or exceeded "
+                       "the memory limit, these are skipped until their "
+                       "inputs change or --timeout or --memory-limit is "
+                       "raised. Defaults to a hidden file next to the "
+                       "outputs.")
+    @click.option("--retry-quarantined", is_flag=True, default=False,
+                  help="Run the quarantined tasks again.")
+    @wraps(command)
+    def wrapper(*args, jobs, retries, timeout, journal, resume, progress,
+                memory_limit, quarantine, retry_quarantined, **kwargs):
+        scheduler_config = {
+            "jobs": jobs,
+            "retries": retries,
+            "timeout": timeout,
+            "journal": journal,
+            "resume": resume,
+            "progress": progress,
+            "memory_limit": memory_limit,
+            "quarantine": quarantine,
+            "retry_quarantined": retry_quarantined,
+        }
+        return command(*args, scheduler_config=scheduler_config, **kwargs)
+
+    return wrapper
+
+
+def create_scheduler(name: str, output_path: str, jobs: int = 1,
+                     retries: int = 0, timeout: Optional[float] = None,
+                     journal: Optional[str] = None, resume: bool = False,
+                     progress: bool = True,
+                     memory_limit: Optional[int] = None,
+                     quarantine: Optional[str] = None,
+                     retry_quarantined: bool = False) -> Scheduler:
+    """
+    Creates the scheduler of the command with journal and quarantine
+    in output folder
+    :param name: name of the command
+    :param output_path: folder where the default journal and quarantine
+           are placed
+    :param memory_limit: address space limit of each worker in MiB
+    """
+    if journal is None:
+        journal = os.path.join(output_path, f".{name}.journal")
+    if quarantine is None:
+        quarantine = os.path.join(output_path, f".{name}.quarantine.json")
+
+    quarantined = Quarantine(quarantine)
+    if retry_quarantined:
+        quarantined.release_all()
+
+    return Scheduler(jobs, retries, timeout, Journal(journal, resume),
+                     progress, name,
+                     memory_limit << 20 if memory_limit else None,
+                     quarantined)
@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from typing import Callable, List, Optional, TextIO, Tuple, Union
+
+from dominate.dom_tag import dom_tag
+from dominate.util import container, raw
+
+from algtestprocess.modules.components.layout import layout
+
+# Placeholder which marks where the streamed content goes
+MARKER = "<!--algtestprocess-stream-->"
+
+
+def split_tag(tag: dom_tag) -> Tuple[str, str]:
+    """
+    Renders the tag without its children
+    :return: opening and closing part of the tag
+    """
+    tag.add(raw(MARKER))
+    opening, closing = tag.render(pretty=False).split(MARKER, 1)
+    return opening, closing
+
+
+class PageWriter:
+    """
+    Writes the page content into the output piece by piece, so that only
+    the currently generated part (e.g. table row) is kept in memory
+    """
+
+    def __init__(self, out: TextIO):
+        self.out = out
+
+    def write(self, *nodes: Union[dom_tag, str]):
+        """Renders detached dominate nodes or strings into the output"""
+        for node in nodes:
+            if isinstance(node, dom_tag):
+                node = node.render(pretty=False)
+            self.out.write(node)
+
+    @contextmanager
+    def tag(self, tag: dom_tag):
+        """Writes the opening tag before and closing tag after the block"""
+        opening, closing = split_tag(tag)
+        self.out.write(opening)
+        yield self
+        self.out.write(closing)
+
+    def capture(self, children: Callable):
+        """
+        Writes nodes created by the function, which builds them
+        in usual dominate way, that is in current context
+        """
+        with container() as c:
+            children()
+        self.write(c)
+
+
+@contextmanager
+def stream_layout(
+        out: TextIO,
+        doc_title: str,
+        asset_additions: Optional[List[str]] = None,
+        other_scripts: Optional[List[Callable]] = None,
+        back_to_top: bool = False,
+        path_prefix: str = './',
+        notebook: bool = False,
+        device: str = 'javacard'
+):
+    """
+    Same document layout as layout(), with the content written into out
+    by the PageWriter given to the block
+    """
+    html = layout(
+        doc_title=doc_title,
+        children_outside=lambda: raw(MARKER),
+        asset_additions=asset_additions,
+        other_scripts=other_scripts,
+        back_to_top=back_to_top,
+        path_prefix=path_prefix,
+        notebook=notebook,
+        device=device
+    )
+    prefix, suffix = html.split(MARKER, 1)
+    out.write(prefix)
+    yield PageWriter(out)
+    out.write(suffix)
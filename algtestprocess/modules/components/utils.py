@@ -1,5 +1,8 @@
+import hashlib
+import os
 import sys
-from typing import List
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 
 from dominate import tags
 from dominate.util import  raw
@@ -18,19 +21,115 @@ class AssetsPaths:
     D3_JS = "assets/js/d3.v3.min.js"
     RADAR_JS = "assets/js/RadarChart.js"
     CHECKBOXES_JS = "assets/js/checkboxes.js"
+    SIMILARITY_JS = "assets/js/SimilarityTable.js"
 
 
-def get_assets(paths: List[str]):
+class Asset:
+    """Content of an asset file along with its content hash"""
+
+    def __init__(self, path: str, content: str):
+        self.path = path
+        self.content = content
+        self.digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        self.filetype = "css" if "css" in path else "js" if "js" in path \
+            else None
+
+    @property
+    def hashed_name(self) -> str:
+        """File name of the asset with the content hash, e.g. style.<hash>.css"""
+        stem, ext = os.path.splitext(os.path.basename(self.path))
+        return f"{stem}.{self.digest}{ext}"
+
+
+# Process-wide cache of read assets, keyed by absolute path. The entries are
+# revalidated by modification time and size, so edited assets are reread.
+_ASSETS: Dict[str, Tuple[Tuple[int, int], Asset]] = {}
+
+
+def load_asset(path: str) -> Asset:
+    """Reads the asset once per process, later calls return cached content"""
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _ASSETS.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with open(key, "r") as f:
+        asset = Asset(path, f.read())
+    _ASSETS[key] = (version, asset)
+    return asset
+
+
+def clear_asset_cache():
+    _ASSETS.clear()
+
+
+class AssetBundle:
+    """
+    Shared assets of a set of pages
+
+    Each asset is written into the bundle directory only once under its
+    hashed name and the pages reference it instead of embedding the content.
+    Changed assets get a new name, so stale browser caches are not an issue.
+    """
+
+    def __init__(self, directory: str, href: Optional[str] = None):
+        """
+        :param directory: folder into which the assets are written
+        :param href: prefix of the asset references in pages, defaults to
+               the directory name, that is pages stored next to the directory
+        """
+        self.directory = directory
+        self.href = href if href is not None \
+            else os.path.basename(os.path.normpath(directory))
+        self.written: Dict[str, str] = {}
+
+    def add(self, asset: Asset) -> str:
+        """
+        Writes the asset into the bundle unless it is there already
+        :return: reference to be used in pages
+        """
+        name = self.written.get(asset.digest)
+        if name is None:
+            name = asset.hashed_name
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    f.write(asset.content)
+                os.replace(tmp, path)
+            self.written[asset.digest] = name
+        return f"{self.href}/{name}" if self.href else name
+
+
+_bundle: Optional[AssetBundle] = None
+
+
+@contextmanager
+def shared_assets(bundle: AssetBundle):
+    """
+    Pages created within the block reference the assets from the bundle
+    instead of inlining them
+    """
+    global _bundle
+    previous = _bundle
+    _bundle = bundle
+    try:
+        yield bundle
+    finally:
+        _bundle = previous
+
+
+def get_assets(paths: List[str]) -> List[Asset]:
     out = []
     for path in paths:
         try:
-            with open(path, "r") as f:
-                data = f.read()
-
-            if "css" in path:
-                out.append(("css", data))
-            elif "js" in path:
-                out.append(("js", data))
+            asset = load_asset(path)
+            if asset.filetype:
+                out.append(asset)
 
         except Exception as ex:
             print("Please ensure assets directory is in the same folder "
@@ -41,9 +140,18 @@ def get_assets(paths: List[str]):
 
 
 def inline_assets(paths):
-    data = get_assets(paths)
-    for filetype, content in data:
-        if filetype == "css":
-            tags.style(raw(content))
-        elif filetype == "js":
-            tags.script(raw(content), type="text/javascript")
+    """
+    Inlines the assets into the page, or references them when
+    created within shared_assets block
+    """
+    for asset in get_assets(paths):
+        if _bundle is not None:
+            href = _bundle.add(asset)
+            if asset.filetype == "css":
+                tags.link(rel="stylesheet", type="text/css", href=href)
+            else:
+                tags.script(src=href, type="text/javascript")
+        elif asset.filetype == "css":
+            tags.style(raw(asset.content))
+        elif asset.filetype == "js":
+            tags.script(raw(asset.content), type="text/javascript")
@@ -0,0 +1,109 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+def decode_hex(value: Any) -> Optional[int]:
+    """
+    Decodes single hex value of CSV column
+    :return: the number or None if the value is missing or not hex
+    """
+    if value is None or isinstance(value, float):
+        # Missing values are NaN in pandas columns
+        return None
+    if not isinstance(value, str):
+        # Hex values with decimal digits only are read as numbers by pandas
+        value = str(value)
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return int(value, 16)
+    except ValueError:
+        return None
+
+
+class HexColumn:
+    """
+    Column of hex encoded numbers (primes, moduli, nonces) decoded once
+
+    Items stay aligned with rows of the source, missing values are None
+    in ints and masked out by valid(). Views needed by the analyses are
+    computed on first use and cached, so that plots and fingerprints of
+    the same keys share the decoding work.
+    """
+
+    def __init__(self, ints: List[Optional[int]]):
+        self.ints = ints
+        self._views: Dict[Any, Any] = {}
+
+    @staticmethod
+    def decode(values: Iterable[Any]) -> "HexColumn":
+        return HexColumn([decode_hex(value) for value in values])
+
+    def __len__(self) -> int:
+        return len(self.ints)
+
+    def _cached(self, key: Any, compute: Callable[[], Any]) -> Any:
+        if key not in self._views:
+            self._views[key] = compute()
+        return self._views[key]
+
+    def valid(self) -> np.ndarray:
+        """Mask of rows with a value"""
+        return self._cached("valid", lambda: np.fromiter(
+            (x is not None for x in self.ints), dtype=bool, count=len(self)))
+
+    def values(self) -> List[int]:
+        """Python ints of rows with a value"""
+        return self._cached(
+            "values", lambda: [x for x in self.ints if x is not None])
+
+    def bit_lengths(self) -> np.ndarray:
+        """Bit lengths of the numbers, 0 for missing"""
+        return self._cached("bit_lengths", lambda: np.fromiter(
+            (x.bit_length() if x is not None else 0 for x in self.ints),
+            dtype=np.int32, count=len(self)))
+
+    def top_bits(self, k: int) -> np.ndarray:
+        """
+        Most significant k bits of the numbers, 0 for missing
+        :param k: number of bits, at most 64
+        """
+        if not 0 < k <= 64:
+            raise ValueError(f"top_bits: {k=} is not between 1 and 64")
+        return self._cached(("top_bits", k), lambda: np.fromiter(
+            (x >> max(x.bit_length() - k, 0) if x is not None else 0
+             for x in self.ints),
+            dtype=np.uint64, count=len(self)))
+
+    def top_byte(self) -> np.ndarray:
+        """First byte of big-endian encoding of the numbers, 0 for missing"""
+        def compute():
+            result = np.zeros(len(self), dtype=np.uint8)
+            for i, x in enumerate(self.ints):
+                if x is not None:
+                    length = x.bit_length()
+                    result[i] = x >> (length - (length % 8 or 8)) \
+                        if length else 0
+            return result
+
+        return self._cached("top_byte", compute)
+
+    def to_bytes(self) -> List[Optional[bytes]]:
+        """Big-endian encoding of the numbers, None for missing"""
+        return self._cached("bytes", lambda: [
+            x.to_bytes((x.bit_length() + 7) // 8, "big")
+            if x is not None else None
+            for x in self.ints
+        ])
+
+    def quotient(self, divisor: "HexColumn") -> "HexColumn":
+        """
+        Row-wise integer division, e.g. q = n // p
+        for measurements which do not store q
+        """
+        return HexColumn([
+            a // b if a is not None and b else None
+            for a, b in zip(self.ints, divisor.ints)
+        ])
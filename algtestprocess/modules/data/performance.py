@@ -0,0 +1,170 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from algtestprocess.modules.data.tpm.profiles.performance import \
+    ProfilePerformanceTPM
+from algtestprocess.modules.jcalgtest import ProfilePerformanceFixedJC
+
+Profile = Union[ProfilePerformanceFixedJC, ProfilePerformanceTPM]
+
+COLUMNS = [
+    "device",
+    "function",
+    "avg",
+    "min",
+    "max",
+    "iterations",
+    "data_length",
+    "error",
+]
+
+
+def jc_frame(profile: ProfilePerformanceFixedJC) -> pd.DataFrame:
+    """Results of JavaCard profile, op times are NaN if not measured"""
+    records = []
+    for function, result in profile.results.items():
+        measured = bool(result.operation)
+        records.append([
+            function,
+            result.operation_avg() if measured else np.nan,
+            result.operation_min() if measured else np.nan,
+            result.operation_max() if measured else np.nan,
+            result.iterations,
+            result.data_length,
+            result.error,
+        ])
+    return pd.DataFrame.from_records(records, columns=COLUMNS[1:])
+
+
+def tpm_frame(profile: ProfilePerformanceTPM) -> pd.DataFrame:
+    """Results of TPM profile, taken from the dataframe of the profile"""
+    frame = profile.frame.reset_index().rename(columns={
+        "name": "function",
+        "operation_avg": "avg",
+        "operation_min": "min",
+        "operation_max": "max",
+    })
+    return frame[COLUMNS[1:]]
+
+
+class PerformanceDataset:
+    """
+    Performance results of multiple devices in one long-format table
+
+    Each row is a result of one function measured on one device, the device
+    column holds the position of the device in the devices list. Pivoted
+    matrices are cached, so that pages and notebooks analysing the same
+    devices share the op averages computed only once.
+    """
+
+    def __init__(self, frame: pd.DataFrame, devices: List[str]):
+        self.frame = frame
+        self.devices = devices
+        self._matrices: Dict[Tuple, np.ndarray] = {}
+        self._stats: Optional[pd.DataFrame] = None
+
+    @staticmethod
+    def from_profiles(profiles: List[Profile]) -> "PerformanceDataset":
+        frames = []
+        devices = []
+        for i, profile in enumerate(profiles):
+            if isinstance(profile, ProfilePerformanceTPM):
+                frame = tpm_frame(profile)
+                devices.append(profile.device_name)
+            else:
+                frame = jc_frame(profile)
+                devices.append(profile.device_name())
+            frame.insert(0, "device", i)
+            frames.append(frame)
+
+        frame = pd.concat(frames, ignore_index=True) if frames \
+            else pd.DataFrame(columns=COLUMNS)
+        for column in ["avg", "min", "max"]:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce")
+        return PerformanceDataset(frame, devices)
+
+    @property
+    def functions(self) -> List[str]:
+        """Measured functions in order of their first occurrence"""
+        return list(pd.unique(self.frame["function"]))
+
+    def filter(
+            self,
+            functions: Optional[List[str]] = None,
+            devices: Optional[List[int]] = None
+    ) -> "PerformanceDataset":
+        """
+        Selects the results of given functions and devices
+        :param functions: function names, all if None
+        :param devices: positions of devices, all if None; the positions
+               are kept, so that matrices of the subset have the same shape
+        :return: dataset of the selected results
+        """
+        mask = np.ones(len(self.frame), dtype=bool)
+        if functions is not None:
+            mask &= self.frame["function"].isin(functions).to_numpy()
+        if devices is not None:
+            mask &= self.frame["device"].isin(devices).to_numpy()
+        return PerformanceDataset(
+            self.frame[mask].reset_index(drop=True), self.devices
+        )
+
+    def matrix(
+            self,
+            functions: List[str],
+            value: str = "avg",
+            missing: float = 0.0
+    ) -> np.ndarray:
+        """
+        Values of functions on all devices, computed once per arguments
+        :param functions: columns of the matrix
+        :param value: column of the dataset, e.g. avg, min or max
+        :param missing: value for functions without result, results
+               measured without value are zero
+        :return: matrix devices x functions
+        """
+        key = (tuple(functions), value, missing)
+        if key not in self._matrices:
+            # Functions may be listed repeatedly, e.g. in multiple groups
+            unique = pd.Index(functions).unique()
+            out = np.full(
+                (len(self.devices), len(unique)), missing, dtype=np.float64
+            )
+            columns = unique.get_indexer(self.frame["function"])
+            rows = self.frame["device"].to_numpy(dtype=np.int64)
+            values = pd.to_numeric(self.frame[value], errors="coerce") \
+                .fillna(0).to_numpy(dtype=np.float64)
+            found = columns >= 0
+            out[rows[found], columns[found]] = values[found]
+            out = out[:, unique.get_indexer(functions)]
+            # Callers get a read only view of the cached matrix
+            out.setflags(write=False)
+            self._matrices[key] = out
+        return self._matrices[key]
+
+    def pivot(
+            self,
+            value: str = "avg",
+            functions: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Pivots the dataset to device x function table
+        :param value: column of the dataset shown in the cells
+        :param functions: columns of the table, all functions if None
+        :return: dataframe indexed by device names, NaN for missing results
+        """
+        functions = self.functions if functions is None else functions
+        return pd.DataFrame(
+            self.matrix(functions, value, missing=np.nan),
+            index=pd.Index(self.devices, name="device"),
+            columns=pd.Index(functions, name="function"),
+        )
+
+    def stats(self) -> pd.DataFrame:
+        """Aggregates of op averages per function across devices"""
+        if self._stats is None:
+            self._stats = self.frame.groupby("function", sort=False)["avg"] \
+                .agg(["count", "mean", "min", "max"])
+        return self._stats
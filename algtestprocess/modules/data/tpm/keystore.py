@@ -0,0 +1,271 @@
+import hashlib
+import logging
+import re
+import sqlite3
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from algtestprocess.modules.data.tpm.enums import CryptoPropResultCategory
+from algtestprocess.modules.data.tpm.profiles.cryptoprops import CryptoProps
+
+EK = "ek"
+RSK = "rsk"
+
+TPM_PCR = "tpm-pcr"
+TPM2_ALGTEST = "tpm2-algtest"
+
+# Key material longer than this is taken as the whole modulus,
+# sources usually provide only few bytes of prefix (and suffix)
+MIN_MODULUS_BITS = 512
+
+# Most and least significant bytes of the modulus which every source
+# provides, tpm2-algtest stores only these, so keys are identified by them
+IDENTITY_PREFIX_BYTES = 2
+IDENTITY_SUFFIX_BYTES = 2
+
+COLUMNS = [
+    "digest",
+    "kind",
+    "algorithm",
+    "source",
+    "firmware",
+    "vendor",
+    "path",
+    "prefix",
+    "suffix",
+    "top_byte",
+    "bit_length",
+    "roca",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS keys (
+    digest TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    source TEXT NOT NULL,
+    firmware TEXT,
+    vendor TEXT,
+    path TEXT,
+    prefix TEXT NOT NULL,
+    suffix TEXT,
+    top_byte INTEGER,
+    bit_length INTEGER,
+    roca INTEGER
+);
+CREATE INDEX IF NOT EXISTS keys_kind_firmware ON keys (kind, firmware);
+CREATE INDEX IF NOT EXISTS keys_kind_top_byte ON keys (kind, top_byte);
+"""
+
+KeyRecord = Tuple
+"""Values of COLUMNS"""
+
+# EK format of tpm2-algtest, see parse_ek
+PREFIX_SUFFIX = re.compile(
+    r"n prefix: ([a-f0-9]+)\s*n suffix: ([a-f0-9]+)", flags=re.IGNORECASE)
+HEX = re.compile(r"(0x)?([a-f0-9]+)", flags=re.IGNORECASE)
+
+
+def split_key(text: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Reads key material given either as hex or as prefix and suffix
+    :return: prefix and suffix hex strings, None if the text is not a key
+    """
+    text = text.strip()
+    if (res := PREFIX_SUFFIX.search(text)) is not None:
+        return res.group(1), res.group(2)
+    if (res := HEX.fullmatch(text)) is not None:
+        return res.group(2), None
+    return None
+
+
+def pad_hex(value: str) -> str:
+    """Lowercase hex zero-padded to whole bytes"""
+    value = value.strip().lower()
+    return value.zfill(len(value) + len(value) % 2)
+
+
+def key_identity(prefix: str, suffix: Optional[str]) -> Tuple[str, str]:
+    """
+    Canonical form of the key which all sources can produce, fixed number
+    of the most and least significant bytes of the modulus
+    :param prefix: hex of the modulus or its most significant bytes
+    :param suffix: hex of the least significant bytes of the modulus,
+           None if prefix is the whole modulus
+    :return: hex of the identity prefix and suffix
+    """
+    prefix = pad_hex(prefix)
+    suffix = prefix if suffix is None else pad_hex(suffix)
+    return prefix[:2 * IDENTITY_PREFIX_BYTES], \
+        suffix[-2 * IDENTITY_SUFFIX_BYTES:]
+
+
+def key_digest(kind: str, prefix: str, suffix: Optional[str]) -> str:
+    """Content hash identifying the key regardless of its source"""
+    prefix, suffix = key_identity(prefix, suffix)
+    content = f"{kind}:{prefix}:{suffix}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def roca_fingerprinter():
+    import algtestprocess.modules.utilities.roca as roca
+
+    return roca.RocaFingerprinter()
+
+
+def key_record(
+        kind: str,
+        algorithm: str,
+        source: str,
+        firmware: Optional[str],
+        vendor: Optional[str],
+        path: Optional[str],
+        prefix: str,
+        suffix: Optional[str] = None
+) -> KeyRecord:
+    """
+    Builds the row of the store with precomputed features
+    :param prefix: hex of the modulus or its most significant bytes
+    :param suffix: hex of the least significant bytes of the modulus
+    """
+    prefix = pad_hex(prefix)
+    suffix = None if suffix is None else pad_hex(suffix)
+    value = int(prefix, 16)
+    # First byte of the key as given, same as get_ek_msb
+    top_byte = int(prefix[:2], 16)
+
+    bit_length = roca = None
+    if suffix is None and value.bit_length() >= MIN_MODULUS_BITS:
+        # Whole modulus is known
+        bit_length = value.bit_length()
+        roca = int(roca_fingerprinter().has_fingerprint_moduli(value))
+
+    return (
+        key_digest(kind, prefix, suffix), kind, algorithm, source, firmware,
+        vendor, path, prefix, suffix, top_byte, bit_length, roca
+    )
+
+
+def tpm_pcr_records(measurements: Dict[str, dict]) -> Iterable[KeyRecord]:
+    """
+    Keys of TPM-PCR metadata created by summary-create
+    (firmware -> EK, RSK and paths of reports)
+    """
+    for firmware, measurement in measurements.items():
+        vendor = firmware.split(" ", 1)[0]
+        for ek, rsk, path in zip(measurement["EK"], measurement["RSK"],
+                                 measurement["paths"]):
+            for kind, key in [(EK, ek), (RSK, rsk)]:
+                if not key:
+                    continue
+                material = split_key(key)
+                if material is None:
+                    logging.warning(
+                        f"tpm_pcr_records: unknown {kind} format in {path}")
+                    continue
+                yield key_record(kind, "rsa", TPM_PCR, firmware, vendor,
+                                 path, *material)
+
+
+def cryptoprops_records(profile: CryptoProps) -> Iterable[KeyRecord]:
+    """RSA EKs of tpm2-algtest cryptoprops profile"""
+    result = profile.results.get(CryptoPropResultCategory.EK_RSA)
+    if result is None or not isinstance(result.data, list):
+        return
+
+    firmware = profile.firmware_version
+    if isinstance(firmware, list):
+        firmware = firmware[0]
+    name = f"{profile.manufacturer} {firmware}" if firmware else None
+    path = result.paths[0] if result.paths else None
+    for ek in result.data:
+        # EKs which could not be parsed are None
+        if not isinstance(ek, tuple):
+            continue
+        # Leading zero bytes were lost when parsed to numbers
+        prefix, suffix = ek
+        yield key_record(EK, "rsa", TPM2_ALGTEST, name, profile.manufacturer,
+                         path, f"{prefix:0{2 * IDENTITY_PREFIX_BYTES}x}",
+                         f"{suffix:0{2 * IDENTITY_SUFFIX_BYTES}x}")
+
+
+class KeyStore:
+    """
+    Append-only SQLite store of EKs and RSKs
+
+    Keys are identified by hash of their most and least significant bytes
+    (see key_identity), so ingesting the same source repeatedly or the same
+    key from multiple sources keeps a single row. Features used by EK analyses are computed once at ingestion and
+    indexed, so analyses are queries instead of rescans of measurements.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, records: Iterable[KeyRecord]) -> int:
+        """
+        Inserts keys not present in the store yet
+        :return: number of inserted keys
+        """
+        before = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR IGNORE INTO keys ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                records
+            )
+        return self.connection.total_changes - before
+
+    def count(self, kind: Optional[str] = None) -> int:
+        if kind is None:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM keys").fetchone()[0]
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM keys WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def firmwares(self, kind: str = EK) -> List[str]:
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT firmware FROM keys WHERE kind = ? "
+            "AND firmware IS NOT NULL ORDER BY firmware", (kind,))]
+
+    def top_bytes(
+            self,
+            kind: str = EK,
+            firmware: Optional[str] = None
+    ) -> List[int]:
+        """Most significant bytes of keys, optionally of one firmware"""
+        query = "SELECT top_byte FROM keys WHERE kind = ?"
+        params: Tuple = (kind,)
+        if firmware is not None:
+            query += " AND firmware = ?"
+            params += (firmware,)
+        return [row[0] for row in self.connection.execute(query, params)]
+
+    def top_byte_counts(self, kind: str = EK) -> Dict[str, Dict[int, int]]:
+        """firmware -> most significant byte -> number of keys"""
+        counts: Dict[str, Dict[int, int]] = {}
+        for firmware, top_byte, count in self.connection.execute(
+                "SELECT firmware, top_byte, COUNT(*) FROM keys "
+                "WHERE kind = ? GROUP BY firmware, top_byte "
+                "ORDER BY firmware, top_byte", (kind,)):
+            counts.setdefault(firmware, {})[top_byte] = count
+        return counts
+
+    def roca_firmwares(self, kind: str = EK) -> List[str]:
+        """Firmwares with at least one key with ROCA fingerprint"""
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT firmware FROM keys WHERE kind = ? AND roca = 1 "
+            "ORDER BY firmware", (kind,))]
@@ -68,6 +68,10 @@ class ProfileTPM(ABC, EnforceOverrides):
             return False
         return self.device_name == other.device_name
 
+    def __hash__(self):
+        # Consistent with __eq__, so that profiles can be used as dict keys
+        return hash(self.device_name)
+
     def __lt__(self, other):
         assert isinstance(other, ProfileTPM)
         if self.manufacturer != other.manufacturer:
@@ -2,15 +2,17 @@ import gc
 import logging
 import os
 from functools import partial
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from overrides import overrides
 
 from algtestprocess.modules.data.tpm.enums import CryptoPropResultCategory
 from algtestprocess.modules.data.tpm.profiles.base import ProfileTPM
 from algtestprocess.modules.data.tpm.results.cryptoprops import CryptoPropResult
-from algtestprocess.modules.visualization.heatmap import Heatmap
-from algtestprocess.modules.visualization.spectrogram import Spectrogram
+
+if TYPE_CHECKING:
+    # Plotting stack is imported only by the plot methods
+    from algtestprocess.modules.visualization.plot import PlotCache
 
 
 class CryptoProps(ProfileTPM):
@@ -89,13 +91,14 @@ class CryptoProps(ProfileTPM):
             if self.results.get(alg) is None:
                 logging.info(f"{fname}:{self.path} has no {alg.value}")
                 continue
-            df = self.results.get(alg).data
+            result = self.results.get(alg)
+            df = result.data
             assert df is not None
             if save:
                 assert os.path.exists(os.path.join(output_path))
             try:
                 title = f"{alg.value.replace('_', ' ').upper()}, {len(df.index)} entries"
-                p = plot(df, title)().build()
+                p = plot(df, title, result)().build()
 
                 if save:
                     p.save(
@@ -113,16 +116,21 @@ class CryptoProps(ProfileTPM):
     def plot_heatmaps(self,
                       algs: List[CryptoPropResultCategory],
                       output_path: Optional[str] = ".",
-                      save: bool = False):
+                      save: bool = False,
+                      cache: Optional["PlotCache"] = None):
+        from algtestprocess.modules.visualization.heatmap import Heatmap
+
         allowed = {CryptoPropResultCategory.RSA_1024,
                    CryptoPropResultCategory.RSA_2048}
 
-        def plot_f(df, title):
+        def plot_f(df, title, result):
             return partial(
                 Heatmap,
                 rsa_df=df,
                 device_name=self.device_name,
-                title=title
+                title=title,
+                cache=cache,
+                result=result
             )
 
         return self._plot(plot_f, algs, output_path, allowed, "plot_heatmaps",
@@ -131,7 +139,11 @@ class CryptoProps(ProfileTPM):
     def plot_spectrograms(self,
                           algs: List[CryptoPropResultCategory],
                           output_path: Optional[str] = ".",
-                          save: bool = False):
+                          save: bool = False,
+                          cache: Optional["PlotCache"] = None):
+        from algtestprocess.modules.visualization.spectrogram import \
+            Spectrogram
+
         allowed = {
             CryptoPropResultCategory.ECC_P256_ECDSA,
             CryptoPropResultCategory.ECC_P256_ECDAA,
@@ -144,12 +156,14 @@ class CryptoProps(ProfileTPM):
             CryptoPropResultCategory.ECC_BN256_ECSCHNORR
         }
 
-        def plot_f(df, title):
+        def plot_f(df, title, result):
             return partial(
                 Spectrogram,
                 df=df,
                 device_name=self.device_name,
-                title=title
+                title=title,
+                cache=cache,
+                result=result
             )
 
         return self._plot(plot_f, algs, output_path, allowed,
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from overrides import overrides
 
@@ -6,6 +6,28 @@ from algtestprocess.modules.data.tpm.profiles.base import ProfileTPM
 from algtestprocess.modules.data.tpm.results.performance import \
     PerformanceResultTPM
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Attributes of the results which form the columns of the profile frame
+RESULT_COLUMNS = [
+    "category",
+    "key_params",
+    "algorithm",
+    "key_length",
+    "mode",
+    "encrypt_decrypt",
+    "data_length",
+    "scheme",
+    "operation_avg",
+    "operation_min",
+    "operation_max",
+    "iterations",
+    "successful",
+    "failed",
+    "error",
+]
+
 
 class ProfilePerformanceTPM(ProfileTPM):
     """TPM profile with performance results"""
@@ -13,6 +35,10 @@ class ProfilePerformanceTPM(ProfileTPM):
     def __init__(self):
         super().__init__()
         self.results: Dict[str, PerformanceResultTPM] = {}
+        # Results indexed by category, maintained by add_result
+        self.by_category: Dict[Optional[str], Dict[str, PerformanceResultTPM]] \
+            = {}
+        self._frame: Optional["pd.DataFrame"] = None
 
     @overrides
     def add_result(self, result):
@@ -24,5 +50,35 @@ class ProfilePerformanceTPM(ProfileTPM):
         name += f" {result.encrypt_decrypt}" if result.encrypt_decrypt else ""
         name += f" {result.scheme}" if result.scheme else ""
         name = name.lstrip(' ')
+
+        previous = self.results.get(name)
+        if previous is not None and previous.category != result.category:
+            self.by_category[previous.category].pop(name, None)
+
         self.results[name] = result
+        self.by_category.setdefault(result.category, {})[name] = result
+        self._frame = None
         return name
+
+    def category_results(self, category: str) -> List[PerformanceResultTPM]:
+        """Results of given category in the order they were added"""
+        return list(self.by_category.get(category, {}).values())
+
+    @property
+    def frame(self) -> "pd.DataFrame":
+        """
+        Tidy dataframe of all results, one row per result indexed by
+        the result name, built once and reused until a result is added
+        """
+        if self._frame is None:
+            import pandas as pd
+
+            self._frame = pd.DataFrame.from_records(
+                [
+                    [getattr(result, column) for column in RESULT_COLUMNS]
+                    for result in self.results.values()
+                ],
+                index=pd.Index(list(self.results.keys()), name="name"),
+                columns=RESULT_COLUMNS,
+            )
+        return self._frame
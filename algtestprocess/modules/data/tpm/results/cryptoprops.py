@@ -1,11 +1,23 @@
 import gc
-import logging
-from typing import Optional, List, Union
-
-import pandas as pd
+import sys
+import weakref
+from typing import TYPE_CHECKING, Dict, Optional, List, Union
 
 from algtestprocess.modules.data.tpm.enums import CryptoPropResultCategory
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from algtestprocess.modules.data.hexcolumn import HexColumn
+
+
+def is_dataframe(value) -> bool:
+    """
+    Checks for pandas dataframe without importing pandas, if it was not
+    imported yet, the value cannot be a dataframe
+    """
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and isinstance(value, pandas.DataFrame)
+
 
 class CryptoPropResult:
     def __init__(self):
@@ -14,45 +26,86 @@ class CryptoPropResult:
         self.merged: bool = False
         self._data = None
         self.paths: List[str] = []
+        # Decoded hex columns of data, see columns
+        self._columns: Dict[str, "HexColumn"] = {}
+        # Frames read from paths by data, their rows are in the same order
+        # as rows of the decoded columns
+        self._frames = weakref.WeakValueDictionary()
 
     @property
-    def data(self) -> Optional[Union[pd.DataFrame, str]]:
+    def data(self) -> Optional[Union["pd.DataFrame", str]]:
         if self._data:
             return self._data
 
-        dfs = []
-        for path in self.paths:
-            next_df = None
-            for delim in self.delimiters:
-                next_df = pd.read_csv(
-                    path,
-                    header=0,
-                    delimiter=delim
-                )
-                if len(next_df.columns) > 1:
-                    break
-
-            if next_df is None:
-                logging.warning(
-                    f"CryptoPropResult.data:{path} could not be parsed")
-                continue
+        import pandas as pd
 
-            dfs.append(next_df)
+        from algtestprocess.modules.parser.mmapfile import read_csv
 
-        return pd.concat(dfs)
+        # Delimiter is sniffed from the header, so each file is read once
+        dfs = [read_csv(path, self.delimiters) for path in self.paths]
+        df = pd.concat(dfs)
+        self._frames[id(df)] = df
+        return df
 
     @data.setter
     def data(self, value):
-        assert isinstance(value, str) or isinstance(value,
-                                                    pd.DataFrame) or isinstance(
+        assert isinstance(value, str) or is_dataframe(value) or isinstance(
             value, list)
         self._data = value
+        self._columns = {}
 
     @data.deleter
     def data(self):
         self._data = None
+        self._columns = {}
         gc.collect()
 
+    def columns(self, names: List[str],
+                df: Optional["pd.DataFrame"] = None) -> List["HexColumn"]:
+        """
+        Hex columns of data decoded to numbers, each column is decoded
+        only once and shared by all analyses of the result
+        :param names: names of the columns, e.g. ["p", "q", "n"]
+        :param df: already loaded data, read from paths if not given, other
+               frames than those returned by data (e.g. filtered) are
+               decoded without the cache
+        :return: decoded columns in order of names, columns missing in data
+                 have all values missing
+        """
+        if df is not None and not self._is_own(df):
+            return [self._decode(df, name) for name in names]
+
+        missing = [name for name in names if name not in self._columns]
+        if missing:
+            if df is None:
+                df = self.data
+            for name in missing:
+                self._columns[name] = self._decode(df, name)
+        return [self._columns[name] for name in names]
+
+    def recomputed_q(self,
+                     df: Optional["pd.DataFrame"] = None) -> "HexColumn":
+        """Prime q computed as n // p, as q is omitted in some measurements"""
+        if df is not None and not self._is_own(df):
+            p, n = self.columns(["p", "n"], df)
+            return n.quotient(p)
+
+        if "n//p" not in self._columns:
+            p, n = self.columns(["p", "n"], df)
+            self._columns["n//p"] = n.quotient(p)
+        return self._columns["n//p"]
+
+    def _is_own(self, df: "pd.DataFrame") -> bool:
+        """Checks whether the frame is data of the result as read or set"""
+        return df is self._data or self._frames.get(id(df)) is df
+
+    @staticmethod
+    def _decode(df: "pd.DataFrame", name: str) -> "HexColumn":
+        from algtestprocess.modules.data.hexcolumn import HexColumn
+
+        return HexColumn.decode(df[name]) if name in df.columns \
+            else HexColumn([None] * len(df))
+
     def __add__(self, other):
         assert isinstance(other, CryptoPropResult)
         new = CryptoPropResult()
@@ -69,12 +122,12 @@ class CryptoPropResult:
                 new_data = []
                 if isinstance(self.data, list):
                     new_data += self.data
-                elif not isinstance(self.data, pd.DataFrame):
+                elif not is_dataframe(self.data):
                     new_data += [self.data]
 
                 if isinstance(other.data, list):
                     new_data += other.data
-                elif not isinstance(other.data, pd.DataFrame):
+                elif not is_dataframe(other.data):
                     new_data += [other.data]
                 new.data = new_data
         return new
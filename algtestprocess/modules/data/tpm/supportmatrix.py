@@ -0,0 +1,86 @@
+import csv
+import json
+import re
+from typing import Dict, List, Set, TextIO
+
+from algtestprocess.modules.config import TPM2Identifier
+from algtestprocess.modules.data.tpm.profiles.support import ProfileSupportTPM
+from algtestprocess.modules.data.tpm.results.support import SupportResultTPM
+
+HEX_VALUE = re.compile(r"0x[0-9a-f]+")
+
+
+def format_value(result: SupportResultTPM) -> str:
+    """Cell content of a supported item, hex values are shown as decimal"""
+    if result.value:
+        return result.value \
+            if not HEX_VALUE.match(result.value) \
+            else str(int(result.value, 16))
+    return "yes"
+
+
+def missing_value(key: str) -> str:
+    """Cell content of an item the device did not report"""
+    return "-" if key not in TPM2Identifier.ALL_KEYS else "no"
+
+
+class SupportMatrixTPM:
+    """
+    Support results of multiple TPMs indexed for table rendering
+
+    The results of all profiles are scanned once into
+    category -> keys and key -> device index -> formatted value,
+    so that the rows of the support table and its exports are only looked up.
+    """
+
+    def __init__(self, profiles: List[ProfileSupportTPM]):
+        self.devices: List[str] = [
+            profile.device_name for profile in profiles
+        ]
+        self.category_keys: Dict[str, Set[str]] = {}
+        self.values: Dict[str, Dict[int, str]] = {}
+
+        for i, profile in enumerate(profiles):
+            for key, result in profile.results.items():
+                self.category_keys.setdefault(result.category, set()).add(key)
+                self.values.setdefault(key, {})[i] = format_value(result)
+
+    @property
+    def categories(self) -> List[str]:
+        return sorted(self.category_keys.keys(), key=str)
+
+    def keys(self, category: str) -> List[str]:
+        return sorted(self.category_keys.get(category, ()))
+
+    def cell(self, key: str, index: int) -> str:
+        """Formatted support of the key by device with given index"""
+        value = self.values.get(key, {}).get(index)
+        return value if value is not None else missing_value(key)
+
+    def row(self, key: str) -> List[str]:
+        """Formatted support of the key by all devices"""
+        values = self.values.get(key, {})
+        missing = missing_value(key)
+        return [values.get(i, missing) for i in range(len(self.devices))]
+
+    def to_csv(self, out: TextIO):
+        writer = csv.writer(out)
+        writer.writerow(["category", "key"] + self.devices)
+        for category in self.categories:
+            for key in self.keys(category):
+                writer.writerow([category, key] + self.row(key))
+
+    def to_json(self, out: TextIO):
+        json.dump(
+            {
+                "devices": self.devices,
+                "categories": {
+                    category: {
+                        key: self.row(key) for key in self.keys(category)
+                    }
+                    for category in self.categories
+                }
+            },
+            out,
+            indent=2
+        )
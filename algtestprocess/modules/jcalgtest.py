@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
+from array import array
 from enum import Enum
-from typing import Optional, Dict, List, Union, Callable
+from typing import Optional, Dict, List, Union, Callable, Iterable, Tuple, \
+    TYPE_CHECKING
 
 from overrides import EnforceOverrides, overrides
 
+if TYPE_CHECKING:
+    import numpy as np
+
 
 def null_if_none(x: any):
     return 'null' if x is None else x
@@ -31,6 +36,94 @@ class MeasurementResultJC(ABC, EnforceOverrides):
         self.error: Optional[str] = None
 
 
+def _modifies(method):
+    """Wraps array method so that it drops the memoized statistics"""
+    def wrapper(self, *args, **kwargs):
+        self._stats.clear()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+class Measurements(array):
+    """
+    Measured times stored in compact array of doubles
+
+    Statistics are computed on first use and memoized until the array is
+    modified, so that pages asking for the same values repeatedly
+    do not iterate over the measurements again.
+    """
+
+    def __new__(cls, values: Iterable[float] = ()):
+        return super().__new__(cls, "d", values)
+
+    def __init__(self, values: Iterable[float] = ()):
+        self._stats: Dict[str, float] = {}
+
+    def __reduce__(self):
+        return Measurements, (list(self),)
+
+    def __copy__(self):
+        return Measurements(self)
+
+    def __deepcopy__(self, memo):
+        return Measurements(self)
+
+    def _memoized(self, name: str, compute: Callable[[], float]) -> float:
+        if name not in self._stats:
+            self._stats[name] = compute()
+        return self._stats[name]
+
+    def _view(self) -> "np.ndarray":
+        import numpy as np
+
+        return np.frombuffer(self, dtype=np.float64) if len(self) \
+            else np.empty(0)
+
+    def sum(self) -> float:
+        return self._memoized("sum", lambda: sum(self))
+
+    def mean(self) -> float:
+        return self._memoized("mean", lambda: self.sum() / len(self))
+
+    def min(self) -> float:
+        return self._memoized("min", lambda: min(self))
+
+    def max(self) -> float:
+        return self._memoized("max", lambda: max(self))
+
+    def median(self) -> float:
+        import numpy as np
+
+        return self._memoized("median", lambda: float(np.median(self._view())))
+
+    def stddev(self) -> float:
+        """Sample standard deviation, zero for less than two measurements"""
+        import numpy as np
+
+        return self._memoized(
+            "stddev",
+            lambda: float(np.std(self._view(), ddof=1))
+            if len(self) > 1 else 0.0
+        )
+
+    append = _modifies(array.append)
+    extend = _modifies(array.extend)
+    insert = _modifies(array.insert)
+    pop = _modifies(array.pop)
+    remove = _modifies(array.remove)
+    byteswap = _modifies(array.byteswap)
+    frombytes = _modifies(array.frombytes)
+    fromfile = _modifies(array.fromfile)
+    fromlist = _modifies(array.fromlist)
+    __setitem__ = _modifies(array.__setitem__)
+    __delitem__ = _modifies(array.__delitem__)
+    __iadd__ = _modifies(array.__iadd__)
+    __imul__ = _modifies(array.__imul__)
+
+
 class PerformanceResultJC(MeasurementResultJC):
     """
     Most of this class comes from crocs-muni/scrutiny on Github
@@ -44,48 +137,83 @@ class PerformanceResultJC(MeasurementResultJC):
         self.measure_ins: Optional[str] = None
         self.config: Optional[str] = None
 
-        self.baseline: List[float] = []
-        self.operation: List[float] = []
+        self.baseline: Measurements = Measurements()
+        self.operation: Measurements = Measurements()
 
         self.data_length: Optional[int] = None
         self.iterations: Optional[int] = None
         self.invocations: Optional[int] = None
 
+        self._ipm: Optional[Tuple[int, int, int]] = None
+
+    @property
+    def baseline(self) -> Measurements:
+        return self._baseline
+
+    @baseline.setter
+    def baseline(self, values: Iterable[float]):
+        self._baseline = values if isinstance(values, Measurements) \
+            else Measurements(values)
+
+    @property
+    def operation(self) -> Measurements:
+        return self._operation
+
+    @operation.setter
+    def operation(self, values: Iterable[float]):
+        self._operation = values if isinstance(values, Measurements) \
+            else Measurements(values)
+
     def baseline_avg(self) -> float:
         """Average baseline measurement"""
-        return sum(self.baseline) / len(self.baseline)
+        return self.baseline.mean()
 
     def baseline_min(self) -> float:
         """Minimal baseline measurement"""
-        return min(self.baseline)
+        return self.baseline.min()
 
     def baseline_max(self) -> float:
         """Maximal baseline measurement"""
-        return max(self.baseline)
+        return self.baseline.max()
 
     def ipm(self) -> int:
         """
         Algorithm iterations per measurement
         :return: iterations / len(operation)
         """
+        # Memoized for the current iterations and measurement count
+        if self._ipm is not None \
+                and self._ipm[:2] == (self.iterations, len(self.operation)):
+            return self._ipm[2]
+
         if self.iterations % len(self.operation) != 0:
             raise Exception(
                 "Total iterations count is not "
                 "multiple of operation data length"
             )
-        return max(1, int(self.iterations / len(self.operation)))
+        ipm = max(1, int(self.iterations / len(self.operation)))
+        self._ipm = (self.iterations, len(self.operation), ipm)
+        return ipm
 
     def operation_avg(self) -> float:
         """Average single algorithm execution time"""
-        return sum(self.operation) / len(self.operation) / self.ipm()
+        return self.operation.mean() / self.ipm()
 
     def operation_min(self) -> float:
         """Minimal single algorithm execution time"""
-        return min(self.operation) / self.ipm()
+        return self.operation.min() / self.ipm()
 
     def operation_max(self) -> float:
         """Maximal single algorithm execution time"""
-        return max(self.operation) / self.ipm()
+        return self.operation.max() / self.ipm()
+
+    def operation_median(self) -> float:
+        """Median single algorithm execution time"""
+        return self.operation.median() / self.ipm()
+
+    def operation_stddev(self) -> float:
+        """Standard deviation of single algorithm execution time"""
+        return self.operation.stddev() / self.ipm()
 
 
 class SupportResultJC(MeasurementResultJC):
@@ -4,16 +4,12 @@ from typing import List, Dict, Union, Optional
 from dominate import tags
 from overrides import overrides
 
-from algtestprocess.modules.jcalgtest import (
-    ProfilePerformanceFixedJC,
-    PerformanceResultJC,
-)
+from algtestprocess.modules.data.performance import PerformanceDataset
+from algtestprocess.modules.jcalgtest import ProfilePerformanceFixedJC
 from algtestprocess.modules.pages.page import Page
 from algtestprocess.modules.pages.radar import Radar, RadarJC, RadarTPM
-from algtestprocess.modules.pages.utils import run_helper_multi
-from algtestprocess.modules.data.tpm.results.performance import \
-    PerformanceResultTPM
-from algtestprocess.modules.profiles.tpm.performance import \
+from algtestprocess.modules.pages.utils import run_helper_multi, device_name
+from algtestprocess.modules.data.tpm.profiles.performance import \
     ProfilePerformanceTPM
 
 
@@ -29,8 +25,8 @@ class Compare:
 
     def intro(self, profiles: List[Profile]):
         p1, p2 = profiles[0], profiles[1]
-        name1 = p1.device_name()
-        name2 = p2.device_name()
+        name1 = device_name(p1)
+        name2 = device_name(p2)
         tags.h1(f"Comparison on {name1} and {name2}", className="pt-5")
         tags.p(
             "This is comparation radar graph of ",
@@ -51,14 +47,18 @@ class Compare:
 class CompareJC(Radar, Compare, Page):
     def __init__(self, profiles: List[ProfilePerformanceFixedJC]):
         self.profiles = profiles
+        self.dataset = PerformanceDataset.from_profiles(profiles)
         self.normalized: Dict[
             str, Dict[ProfilePerformanceFixedJC, float]
         ] = self.normalize(
             top_functions=RadarJC.TOP_FUNCTIONS,
             profiles=profiles,
-            operation_avg=lambda result: result.operation_avg()
-            if result and result.operation
-            else 0,
+            dataset=self.dataset,
+        )
+        self.averages = self.operation_averages(
+            top_functions=RadarJC.TOP_FUNCTIONS,
+            profiles=profiles,
+            dataset=self.dataset,
         )
 
     @overrides
@@ -69,9 +69,6 @@ class CompareJC(Radar, Compare, Page):
                 f"vs {profiles[1].device_name()} radar graph"
             )
 
-        def operation_avg(result: PerformanceResultJC):
-            return result.operation_avg() if result.operation else 0
-
         output_path = f"{output_path}/{self.SUBFOLDER_NAME}"
         data = run_helper_multi(
             output_path=output_path,
@@ -86,7 +83,7 @@ class CompareJC(Radar, Compare, Page):
                     self.get_graph,
                     top_functions=RadarJC.TOP_FUNCTIONS,
                     normalized=self.normalized,
-                    operation_avg=operation_avg,
+                    averages=self.averages,
                 ),
             ),
             desc="Compare pages",
@@ -97,25 +94,26 @@ class CompareJC(Radar, Compare, Page):
 class CompareTPM(Radar, Compare, Page):
     def __init__(self, profiles: List[ProfilePerformanceTPM]):
         self.profiles = profiles
+        self.dataset = PerformanceDataset.from_profiles(profiles)
         self.normalized: Dict[str, Dict[ProfilePerformanceTPM, float]] = self.normalize(
             top_functions=RadarTPM.TOP_FUNCTIONS(profiles),
             profiles=profiles,
-            operation_avg=lambda result: result.operation_avg
-            if result and result.operation_avg
-            else 0,
+            dataset=self.dataset,
+        )
+        self.averages = self.operation_averages(
+            top_functions=RadarTPM.TOP_FUNCTIONS(profiles),
+            profiles=profiles,
+            dataset=self.dataset,
         )
 
     @overrides
     def run(self, output_path: Optional[str] = None, notebook: bool = False):
         def title(profiles: List[ProfilePerformanceTPM]):
             return (
-                f"tpm2-algtest - {profiles[0].device_name()} "
-                f"vs {profiles[1].device_name()} radar graph"
+                f"tpm2-algtest - {profiles[0].device_name} "
+                f"vs {profiles[1].device_name} radar graph"
             )
 
-        def operation_avg(result: PerformanceResultTPM):
-            return result.operation_avg if result.operation_avg else 0
-
         output_path = f"{output_path}/{self.SUBFOLDER_NAME}"
         data = run_helper_multi(
             output_path=output_path,
@@ -130,7 +128,7 @@ class CompareTPM(Radar, Compare, Page):
                     self.get_graph,
                     top_functions=RadarTPM.TOP_FUNCTIONS(self.profiles),
                     normalized=self.normalized,
-                    operation_avg=operation_avg,
+                    averages=self.averages,
                 ),
                 device="tpm",
             ),
@@ -14,7 +14,7 @@ from algtestprocess.modules.jcalgtest import (
 )
 from algtestprocess.modules.pages.page import Page
 from algtestprocess.modules.pages.utils import run_helper
-from algtestprocess.modules.profiles.tpm.performance import \
+from algtestprocess.modules.data.tpm.profiles.performance import \
     ProfilePerformanceTPM
 
 Profile = ProfilePerformanceFixedJC | ProfilePerformanceTPM
@@ -135,6 +135,8 @@ class ExecutionTimeJC(Page, ExecutionTime):
         "Operation average (ms/op)",
         "Operation minimum (ms/op)",
         "Operation maximum (ms/op)",
+        "Operation median (ms/op)",
+        "Operation std. dev. (ms/op)",
         "Data length (bytes)",
         "Prepare average (ms/op)",
         "Prepare minimum (ms/op)",
@@ -161,6 +163,8 @@ class ExecutionTimeJC(Page, ExecutionTime):
                 format(r.operation_avg(), ".2f"),
                 format(r.operation_min(), ".2f"),
                 format(r.operation_max(), ".2f"),
+                format(r.operation_median(), ".2f"),
+                format(r.operation_stddev(), ".2f"),
                 r.data_length,
                 r.baseline_avg(),
                 r.baseline_min(),
@@ -289,48 +293,40 @@ class ExecutionTimeTPM(Page, ExecutionTime):
         "Failed",
         "Error code",
     ]
+    # Result attributes shown in the columns
+    A_DEPENDANT = {
+        "TPM2_Create": ["key_params"],
+        "TPM2_EncryptDecrypt": [
+            "algorithm", "key_length", "mode", "encrypt_decrypt", "data_length"
+        ],
+        "TPM2_GetRandom": ["data_length"],
+        "TPM2_Hash": ["algorithm", "data_length"],
+        "TPM2_RSA_Decrypt": ["key_params", "scheme"],
+        "TPM2_RSA_Encrypt": ["key_params", "scheme"],
+        "TPM2_Sign": ["key_params", "scheme"],
+        "TPM2_VerifySignature": ["key_params", "scheme"],
+    }
+    A_DEFAULT = [
+        "operation_avg",
+        "operation_min",
+        "operation_max",
+        "iterations",
+        "successful",
+        "failed",
+        "error",
+    ]
 
     def __init__(self, profiles):
         self.profiles: List[ProfilePerformanceTPM] = profiles
 
     @staticmethod
     def get_table_data(profile: ProfilePerformanceTPM, category: str):
-        category_results = [
-            result
-            for _, result in profile.results.items()
-            if result.category == category
+        attributes = ExecutionTimeTPM.A_DEPENDANT[category] \
+            + ExecutionTimeTPM.A_DEFAULT
+        return [
+            [getattr(result, attribute) for attribute in attributes]
+            for result in profile.category_results(category)
         ]
-        data = []
-
-        for result in category_results:
-            category_dependant: Dict[str, list[any]] = {
-                "TPM2_Create": [result.key_params],
-                "TPM2_EncryptDecrypt": [
-                    result.algorithm,
-                    result.key_length,
-                    result.mode,
-                    result.encrypt_decrypt,
-                    result.data_length,
-                ],
-                "TPM2_GetRandom": [result.data_length],
-                "TPM2_Hash": [result.algorithm, result.data_length],
-                "TPM2_RSA_Decrypt": [result.key_params, result.scheme],
-                "TPM2_RSA_Encrypt": [result.key_params, result.scheme],
-                "TPM2_Sign": [result.key_params, result.scheme],
-                "TPM2_VerifySignature": [result.key_params, result.scheme],
-            }
-            default = [
-                result.operation_avg,
-                result.operation_min,
-                result.operation_max,
-                result.iterations,
-                result.successful,
-                result.failed,
-                result.error,
-            ]
-            data.append(category_dependant[category] + default)
-
-        return data
 
     @overrides
     def table(self, profile: Profile, category: str):
@@ -346,10 +342,10 @@ class ExecutionTimeTPM(Page, ExecutionTime):
     @overrides
     def run(self, output_path: Optional[str] = None, notebook: bool = False):
         def title(profile: ProfilePerformanceTPM):
-            return f"tpm-algtest - {profile.device_name()} run time"
+            return f"tpm-algtest - {profile.device_name} run time"
 
         def heading(profile: ProfilePerformanceTPM):
-            tags.h1(f"Run time results - {profile.device_name()}")
+            tags.h1(f"Run time results - {profile.device_name}")
 
         categories = ExecutionTimeTPM.H_DEPENDANT.keys()
 
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 from dominate import tags
 from tqdm import tqdm
@@ -7,14 +8,16 @@ from algtestprocess.modules.components.layout import layout
 from algtestprocess.modules.components.modal import modal, modal_script
 from algtestprocess.modules.pages.page import Page
 from algtestprocess.modules.visualization.heatmap import Heatmap
+from algtestprocess.modules.visualization.plot import PlotCache
 
 
 class Heatmaps(Page):
     FILENAME = "cryptoprops-rsa.html"
     SUBFOLDER_NAME = "heatmaps"
 
-    def __init__(self, profiles):
+    def __init__(self, profiles, cache: Optional[PlotCache] = None):
         self.profiles = profiles
+        self.cache = cache
 
     def columns(self, n: int, items):
         cols = [tags.div(className="col-sm") for _ in range(n)]
@@ -59,7 +62,7 @@ class Heatmaps(Page):
                 try:
                     # If errorneous dataset, skip
                     name = f"{i}-{device_name.replace(' ', '_')}-RSA{bits}.png"
-                    Heatmap(df, device_name).save(
+                    Heatmap(df, device_name, cache=self.cache).save(
                         filename=f"{output_path}/{Heatmaps.SUBFOLDER_NAME}/{name}"
                     )
                 except TypeError:
@@ -1,6 +1,7 @@
 from functools import partial
 from typing import Dict, List, Tuple, Union, Callable, Optional
 
+import numpy as np
 from dominate import tags
 from overrides import overrides
 
@@ -8,15 +9,11 @@ from algtestprocess.modules.components.cardlist import cardlist
 from algtestprocess.modules.components.layout import layout
 from algtestprocess.modules.components.utils import AssetsPaths
 from algtestprocess.modules.config import TopFunctionsJC
-from algtestprocess.modules.jcalgtest import (
-    ProfilePerformanceFixedJC,
-    PerformanceResultJC,
-)
+from algtestprocess.modules.data.performance import PerformanceDataset
+from algtestprocess.modules.jcalgtest import ProfilePerformanceFixedJC
 from algtestprocess.modules.pages.page import Page
 from algtestprocess.modules.pages.utils import run_helper_multi
-from algtestprocess.modules.data.tpm.results.performance import \
-    PerformanceResultTPM
-from algtestprocess.modules.profiles.tpm.performance import \
+from algtestprocess.modules.data.tpm.profiles.performance import \
     ProfilePerformanceTPM
 
 Profile = Union[ProfilePerformanceFixedJC, ProfilePerformanceTPM]
@@ -27,37 +24,55 @@ class Radar:
         self,
         top_functions: List[Tuple[str, str]],
         profiles: List[Profile],
-        operation_avg: Callable,
+        dataset: PerformanceDataset,
     ) -> Dict[str, Dict[Profile, float]]:
         """
         Normalize the operation times for comparison across all profiles
         :param top_functions: functions which are normalized
         :param profiles: profiles
-        :param operation_avg: function which gets the avg_op time from result
+        :param dataset: performance dataset of the profiles
         :return: dict[function][profile] returns normalized values
         """
-        normalized = {}
-        for _, f in top_functions:
-            max_avg = max(
-                [operation_avg(profile.results.get(f)) for profile in profiles]
-            )
-            normalized[f] = {}
-            for profile in profiles:
-                if f in profile.results and max_avg > 0:
-                    normalized[f][profile] = operation_avg(profile.results[f]) / (
-                        1.11 * max_avg
-                    )
-                else:
-                    normalized[f][profile] = 0
-
-        return normalized
+        functions = [f for _, f in top_functions]
+        values = dataset.matrix(functions)
+        max_avg = values.max(axis=0, initial=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normalized = np.where(max_avg > 0, values / (1.11 * max_avg), 0)
+        return {
+            f: {
+                profile: float(normalized[i, j])
+                for i, profile in enumerate(profiles)
+            }
+            for j, f in enumerate(functions)
+        }
+
+    def operation_averages(
+        self,
+        top_functions: List[Tuple[str, str]],
+        profiles: List[Profile],
+        dataset: PerformanceDataset,
+    ) -> Dict[str, Dict[Profile, float]]:
+        """
+        Operation averages shown in the graphs
+        :return: dict[function][profile], only measured functions present
+        """
+        functions = [f for _, f in top_functions]
+        values = dataset.matrix(functions, missing=np.nan)
+        return {
+            f: {
+                profile: float(values[i, j])
+                for i, profile in enumerate(profiles)
+                if not np.isnan(values[i, j])
+            }
+            for j, f in enumerate(functions)
+        }
 
     def get_graph(
         self,
         profiles: List[Profile],
         top_functions: List[Tuple[str, str]],
         normalized: Dict[str, Dict[Profile, float]],
-        operation_avg: Callable,
+        averages: Dict[str, Dict[Profile, float]],
         hide_axes: bool = False,
     ):
         """
@@ -65,7 +80,7 @@ class Radar:
         :param profiles: chosen to be compared
         :param top_functions: which will create axes of the radar chart
         :param normalized: values
-        :param operation_avg: lambda for getting op_avg from result
+        :param averages: op averages of measured functions
         :param hide_axes: optionally can hide axes to prevent clutter
         :return: script html object
         """
@@ -95,8 +110,8 @@ class Radar:
                     "title:'"
                     + (
                         (f"{info} ")
-                        + f"{format(operation_avg(profile.results[name]),'.2f')} ms"
-                        if name in profile.results
+                        + f"{format(averages[name][profile],'.2f')} ms"
+                        if profile in averages[name]
                         else "NS"
                     )
                     + "'},"
@@ -164,14 +179,18 @@ class RadarJC(Radar, Page):
 
     def __init__(self, profiles):
         self.profiles: List[ProfilePerformanceFixedJC] = profiles
+        self.dataset = PerformanceDataset.from_profiles(profiles)
         self.normalized: Dict[
             str, Dict[ProfilePerformanceFixedJC, float]
         ] = self.normalize(
             top_functions=RadarJC.TOP_FUNCTIONS,
             profiles=profiles,
-            operation_avg=lambda result: result.operation_avg()
-            if result and result.operation
-            else 0,
+            dataset=self.dataset,
+        )
+        self.averages = self.operation_averages(
+            top_functions=RadarJC.TOP_FUNCTIONS,
+            profiles=profiles,
+            dataset=self.dataset,
         )
 
     @staticmethod
@@ -200,9 +219,6 @@ class RadarJC(Radar, Page):
         def title(profiles: List[ProfilePerformanceFixedJC]):
             return f"JCAlgTest - {profiles[0].device_name()} radar graph"
 
-        def operation_avg(result: PerformanceResultJC):
-            return result.operation_avg() if result.operation else 0
-
         output_path = f"{output_path}/{RadarJC.SUBFOLDER_NAME}"
         data = run_helper_multi(
             output_path,
@@ -215,7 +231,7 @@ class RadarJC(Radar, Page):
                     self.get_graph,
                     top_functions=RadarJC.TOP_FUNCTIONS,
                     normalized=self.normalized,
-                    operation_avg=operation_avg,
+                    averages=self.averages,
                 ),
                 notebook=notebook,
             ),
@@ -309,12 +325,16 @@ class RadarTPM(Radar, Page):
 
     def __init__(self, profiles):
         self.profiles: List[ProfilePerformanceTPM] = profiles
+        self.dataset = PerformanceDataset.from_profiles(profiles)
         self.normalized: Dict[str, Dict[ProfilePerformanceTPM, float]] = self.normalize(
             top_functions=RadarTPM.TOP_FUNCTIONS(profiles),
             profiles=profiles,
-            operation_avg=lambda result: result.operation_avg
-            if result and result.operation_avg
-            else 0,
+            dataset=self.dataset,
+        )
+        self.averages = self.operation_averages(
+            top_functions=RadarTPM.TOP_FUNCTIONS(profiles),
+            profiles=profiles,
+            dataset=self.dataset,
         )
 
     def intro(self, profile: ProfilePerformanceTPM):
@@ -326,10 +346,7 @@ class RadarTPM(Radar, Page):
             return self.intro(profiles[0])
 
         def title(profiles: List[ProfilePerformanceTPM]):
-            return f"tpm-algtest - {profiles[0].device_name()}"
-
-        def operation_avg(result: PerformanceResultTPM):
-            return result.operation_avg if result.operation_avg else 0
+            return f"tpm-algtest - {profiles[0].device_name}"
 
         output_path = f"{output_path}/{RadarTPM.SUBFOLDER_NAME}"
         data = run_helper_multi(
@@ -343,7 +360,7 @@ class RadarTPM(Radar, Page):
                     self.get_graph,
                     top_functions=RadarTPM.TOP_FUNCTIONS(self.profiles),
                     normalized=self.normalized,
-                    operation_avg=operation_avg,
+                    averages=self.averages,
                     hide_axes=False,
                 ),
                 notebook=notebook,
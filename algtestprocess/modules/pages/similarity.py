@@ -1,113 +1,115 @@
+import base64
+import json
 from functools import partial
-from math import sqrt
-from typing import List, Dict, Tuple, Callable, Union, Optional
+from typing import Any, Dict, List, Callable, Union, Optional, Tuple
 
+import numpy as np
 from dominate import tags
+from dominate.util import raw
 from overrides import overrides
 
 from algtestprocess.modules.components.layout import layout
+from algtestprocess.modules.components.utils import AssetsPaths
 from algtestprocess.modules.config import SimilarityFunctionsJC, \
     SimilarityFunctionsTPM
-from algtestprocess.modules.jcalgtest import ProfilePerformanceFixedJC, \
-    PerformanceResultJC
+from algtestprocess.modules.data.performance import PerformanceDataset
+from algtestprocess.modules.jcalgtest import ProfilePerformanceFixedJC
 from algtestprocess.modules.pages.page import Page
-from algtestprocess.modules.data.tpm.results.performance import \
-    PerformanceResultTPM
-from algtestprocess.modules.profiles.tpm.performance import \
+from algtestprocess.modules.pages.radar import RadarJC, RadarTPM
+from algtestprocess.modules.pages.utils import device_name
+from algtestprocess.modules.data.tpm.profiles.performance import \
     ProfilePerformanceTPM
 
 Profile = Union[ProfilePerformanceFixedJC, ProfilePerformanceTPM]
-ProfilePairSimilarity = Dict[Tuple[Profile, Profile], float]
-Normalized = Dict[str, Dict[Profile, int]]
+# Symmetric matrix of similarities indexed by positions of profiles
+SimilarityMatrix = np.ndarray
+# Matrix of normalized op averages, profiles x functions
+Normalized = np.ndarray
 
 
 class Similarity:
 
     def normalize(
             self,
-            profiles: List[Profile],
-            functions: List[str],
-            operation_avg: Callable
+            dataset: PerformanceDataset,
+            functions: List[str]
     ) -> Normalized:
         """
         Normalizes the function op averages so they can be used in similarity
         computation
-        :param profiles: profiles for which results will be normalized
+        :param dataset: performance dataset of the profiles
         :param functions: which will be normalized
-        :param operation_avg: lambda to get the op avg from result
-        :return: Dict[function][profile]
+        :return: matrix of normalized values, profiles x functions, zero for
+                 missing results
         """
-        normalized = {}
-        for f in functions:
-            max_avg = max(
-                [
-                    operation_avg(profile.results[f])
-                    if f in profile.results
-                    else 0
-                    for profile in profiles
-                ]
-            )
-            normalized[f] = {}
-            for profile in profiles:
-                if f in profile.results and max_avg > 0:
-                    normalized[f][profile] = (
-                            operation_avg(profile.results[f]) / max_avg
-                    )
-                else:
-                    normalized[f][profile] = 0
+        values = dataset.matrix(functions)
+        max_avg = values.max(axis=0, initial=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normalized = np.where(max_avg > 0, values / max_avg, 0)
         return normalized
 
     def compute(
             self,
-            profiles: List[Profile],
             normalized: Normalized,
-            functions: List[str]
-    ) -> ProfilePairSimilarity:
+            columns: List[int]
+    ) -> SimilarityMatrix:
         """
-        Computes the profile pair similarity
-        :param profiles: list of device profiles
+        Computes the profile pair similarity, only the functions measured
+        on both profiles of the pair are taken into account
         :param normalized: normalized values of functions
-        :param functions: the keys for which will be the similarity computed
-        :return: dictionary ((tuple of profiles), similarity value)
+        :param columns: indices of functions for which will be the
+               similarity computed
+        :return: symmetric matrix of similarity values, diagonal is zero
         """
-        similarity = {}
-        for p1 in profiles:
-            for p2 in profiles:
-                if p1 == p2:
-                    continue
-                total = 0
-                num = 0
-                for f in functions:
-                    if normalized[f][p1] != 0 and normalized[f][p2] != 0:
-                        total += (normalized[f][p1] - normalized[f][p2]) ** 2
-                        num += 1
-                total = abs(sqrt(total / num) - 1) if total != 0 else 0
-                total = total ** 2
-                similarity[(p1, p2)] = total
+        values = normalized[:, columns]
+        present = values != 0
+
+        # Pairwise differences in shape profiles x profiles x functions
+        both = present[:, None, :] & present[None, :, :]
+        diff = values[:, None, :] - values[None, :, :]
+        total = np.where(both, diff ** 2, 0).sum(axis=2)
+        num = both.sum(axis=2)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similarity = np.where(
+                total != 0,
+                np.abs(np.sqrt(total / num) - 1) ** 2,
+                0
+            )
+        np.fill_diagonal(similarity, 0)
         return similarity
 
+    def compute_groups(
+            self,
+            normalized: Normalized,
+            functions: List[str],
+            groups: List[List[str]]
+    ) -> List[SimilarityMatrix]:
+        """
+        Computes the similarity matrices for each group of functions
+        :param normalized: normalized values of functions
+        :param functions: functions in order of normalized columns
+        :param groups: groups of functions
+        :return: similarity matrix per group
+        """
+        index = {f: i for i, f in enumerate(functions)}
+        return [
+            self.compute(normalized, [index[f] for f in group])
+            for group in groups
+        ]
+
     def sorted_profiles(
             self,
-            profiles: List[Profile],
-            similarities: List[ProfilePairSimilarity],
-    ) -> List[Profile]:
+            similarities: List[SimilarityMatrix]
+    ) -> List[int]:
         """
-        Sorts the list of profiles according to profile pair similarity
-        :param profiles: list of device profiles
-        :param similarities: dictionary ((tuple of profiles), similarity value)
-        :return: sorted list of profiles
+        Sorts the profiles according to profile pair similarity
+        :param similarities: similarity matrices of groups
+        :return: indices of profiles, most similar to others first
         """
-        pairs = []
-        for p1 in profiles:
-            total = 0
-            for p2 in profiles:
-                if p1 == p2:
-                    continue
-                for s in similarities:
-                    total += s[(p1, p2)]
-            pairs.append((p1, total))
-        pairs.sort(key=lambda x: x[1], reverse=True)
-        return list(map(lambda x: x[0], pairs))
+        totals = np.sum(similarities, axis=(0, 2))
+        return sorted(range(len(totals)), key=lambda i: totals[i],
+                      reverse=True)
 
     def similarity_table_header(
             self,
@@ -124,7 +126,7 @@ class Similarity:
                 tags.th(group_abbreviations[i])
             for profile in profiles:
                 tags.th(
-                    profile.device_name(),
+                    device_name(profile),
                     colspan=3,
                     rowspan=2,
                 )
@@ -136,14 +138,13 @@ class Similarity:
     def similarity_table_row(
             p1: Profile,
             p2: Profile,
-            similarities: List[ProfilePairSimilarity],
+            values: List[float],
     ):
-        name1 = p1.device_name()
-        name2 = p2.device_name()
+        name1 = device_name(p1)
+        name2 = device_name(p2)
         href = f"./compare/{name1}_vs_{name2}.html"
-        for similarity in similarities:
+        for s in values:
             style = "width: 3em; height: 3em;"
-            s = similarity.get((p1, p2))
             color = (
                 f"140, 200, 120, {format(s, '.2f')}"
                 if s > 0.5
@@ -166,7 +167,7 @@ class Similarity:
     def similarity_table(
             self,
             profiles: List[Profile],
-            similarities: List[ProfilePairSimilarity],
+            similarities: List[SimilarityMatrix],
             group_abbreviations: List[str]
     ):
         """
@@ -176,33 +177,198 @@ class Similarity:
         :param group_abbreviations: for groups of algorithms for
                which similarity is computed
         """
+        order = self.sorted_profiles(similarities)
+        ordered = [profiles[i] for i in order]
+        # Similarities of the groups for each pair, in table order
+        stacked = np.stack(similarities, axis=-1)[np.ix_(order, order)]
         with tags.table(className="compare", cellspacing=0):
             with tags.tbody():
                 self.similarity_table_header(
-                    profiles=profiles,
+                    profiles=ordered,
                     group_abbreviations=group_abbreviations
                 )
-                for p1 in profiles:
-                    for i, sim in enumerate(
-                            [similarities[:3], similarities[3:]]
-                    ):
+                for i, p1 in enumerate(ordered):
+                    for half, groups in enumerate([slice(0, 3), slice(3, 6)]):
                         with tags.tr():
-                            if i == 0:
+                            if half == 0:
                                 tags.th(
-                                    p1.device_name(),
+                                    device_name(p1),
                                     colspan=3,
                                     rowspan=2,
                                 )
-                            for p2 in profiles:
+                            for j, p2 in enumerate(ordered):
                                 style = "width: 3em; height: 3em;"
                                 # Empty cells on diagonal
-                                if p1 == p2:
+                                if i == j:
                                     cls = "inactive"
                                     tags.td(className=cls, style=style)
                                     tags.td(className=cls, style=style)
                                     tags.td(className=cls, style=style)
                                     continue
-                                Similarity.similarity_table_row(p1, p2, sim)
+                                Similarity.similarity_table_row(
+                                    p1, p2, stacked[i, j, groups].tolist()
+                                )
+
+    @staticmethod
+    def typed_array(values: np.ndarray, dtype: str) -> Dict[str, Any]:
+        """
+        Serializes the array for JavaScript typed arrays
+        :param values: array to serialize
+        :param dtype: either uint8 or float32
+        :return: dictionary of dtype, shape and base64 encoded data
+        """
+        values = np.ascontiguousarray(
+            values, dtype=np.dtype(dtype).newbyteorder("<")
+        )
+        return {
+            "dtype": dtype,
+            "shape": list(values.shape),
+            "data": base64.b64encode(values.tobytes()).decode("ascii"),
+        }
+
+    def payload(
+            self,
+            profiles: List[Profile],
+            dataset: PerformanceDataset,
+            similarities: List[SimilarityMatrix],
+            group_abbreviations: List[str],
+            radar_functions: List[Tuple[str, str]],
+            compare_filename: str
+    ) -> Dict[str, Any]:
+        """
+        Creates the data of compact similarity table and compare views
+        :param profiles:
+        :param dataset: performance dataset of the profiles
+        :param similarities: computed using compute method
+        :param group_abbreviations: for groups of algorithms
+        :param radar_functions: (axis label, function) pairs of radar graphs
+        :param compare_filename: page showing comparison of two devices
+        :return: json serializable payload
+        """
+        order = self.sorted_profiles(similarities)
+        ordered = [profiles[i] for i in order]
+        stacked = np.stack(similarities)[:, order][:, :, order]
+
+        # Radar values are 1 - op_avg / (1.11 * max op_avg), 0 if missing
+        functions = [f for _, f in radar_functions]
+        normalized = self.normalize(dataset, functions)[order]
+        radar = np.where(normalized != 0, 1 - normalized / 1.11, 0)
+        avgs = dataset.matrix(functions, missing=np.nan)[order]
+
+        return {
+            "devices": [device_name(profile) for profile in ordered],
+            "groups": group_abbreviations,
+            "similarity": self.typed_array(np.rint(100 * stacked), "uint8"),
+            "radar": {
+                "axes": [info for info, _ in radar_functions],
+                "values": self.typed_array(radar, "float32"),
+                "avgs": self.typed_array(avgs, "float32"),
+            },
+            "compare": compare_filename,
+        }
+
+    @staticmethod
+    def payload_script(payload: Dict[str, Any]) -> str:
+        return f"var SIMILARITY_DATA = {json.dumps(payload)};"
+
+    def run_compact(
+            self,
+            output_path: Optional[str],
+            payload: Dict[str, Any],
+            doc_title: str,
+            intro: Callable,
+            filenames: Tuple[str, str, str],
+            notebook: bool = False,
+            device: str = 'javacard'
+    ) -> str:
+        """
+        Creates compact similarity table, drawn on client side from the
+        payload, and a single compare page showing any pair of devices
+        :param output_path: where the pages are saved
+        :param payload: created by payload method
+        :param doc_title:
+        :param intro: intro section
+        :param filenames: of table page, payload script and compare page
+        :param notebook: inlines the payload and assets
+        :param device: either 'javacard' or 'tpm'
+        :return: str of created table page
+        """
+        table_filename, data_filename, compare_filename = filenames
+
+        def payload_tag():
+            if notebook:
+                tags.script(raw(self.payload_script(payload)),
+                            type="text/javascript")
+            else:
+                tags.script(src=f"./{data_filename}", type="text/javascript")
+
+        def children_outside():
+            with tags.div(className="container-fluid pt-5"):
+                with tags.div(className="flex row pt-5"):
+                    intro()
+                tags.div(id="similarity-table")
+
+        html = layout(
+            doc_title=doc_title,
+            children_outside=children_outside,
+            asset_additions=[AssetsPaths.SIMILARITY_JS],
+            other_scripts=[
+                payload_tag,
+                lambda: tags.script(
+                    "SimilarityTable.draw('similarity-table', SIMILARITY_DATA);"
+                )
+            ],
+            notebook=notebook,
+            device=device
+        )
+
+        if notebook or not output_path:
+            return html
+
+        with open(f"{output_path}/{table_filename}", "w") as f:
+            f.write(html)
+        with open(f"{output_path}/{data_filename}", "w") as f:
+            f.write(self.payload_script(payload))
+
+        def compare_children():
+            tags.h1(id="compare-title", className="pt-5")
+            tags.p(
+                "This is comparation radar graph of ",
+                tags.span(id="compare-name1", style="color: blue;"),
+                " and ",
+                tags.span(id="compare-name2", style="color: orange;"),
+                ".",
+            )
+            tags.p(
+                "The values closer to 100% represent the times close to the "
+                "fastest result among all tested devices, whereas values close "
+                "to 10% suggest slower performance in the corresponding "
+                "algorithm. Value of 0%(NS) indicates a lack of support or "
+                "occurrence of unexpected error during the tested algorithm."
+            )
+            tags.div(id="chart", className="col")
+
+        compare = layout(
+            doc_title=doc_title,
+            children=compare_children,
+            asset_additions=[
+                AssetsPaths.D3_JS,
+                AssetsPaths.RADAR_JS,
+                AssetsPaths.SIMILARITY_JS
+            ],
+            other_scripts=[
+                payload_tag,
+                lambda: tags.script(
+                    "CompareView.draw('#chart', SIMILARITY_DATA);"
+                )
+            ],
+            back_to_top=True,
+            device=device
+        )
+        with open(f"{output_path}/{compare_filename}", "w") as f:
+            f.write(compare)
+
+        return html
 
     def run_single(
             self,
@@ -239,9 +405,12 @@ class Similarity:
 class SimilarityJC(Page, Similarity):
     FILENAME = "similarity-table.html"
     PATH = FILENAME
+    DATA_FILENAME = "similarity-data.js"
+    COMPARE_FILENAME = "similarity-compare.html"
 
     def __init__(self, profiles):
         self.profiles: List[ProfilePerformanceFixedJC] = profiles
+        self.dataset = PerformanceDataset.from_profiles(profiles)
 
     @staticmethod
     def intro():
@@ -293,23 +462,41 @@ class SimilarityJC(Page, Similarity):
         )
 
     @overrides
-    def run(self, output_path: Optional[str] = None, notebook: bool = False):
-        def operation_avg(result: PerformanceResultJC):
-            return result.operation_avg() if result.operation else 0
-
+    def run(self, output_path: Optional[str] = None, notebook: bool = False,
+            compact: bool = False):
+        """
+        :param compact: instead of the full HTML table, saves the similarity
+               matrices once and renders the table and comparison of devices
+               on the client side
+        """
         normalized = self.normalize(
-            profiles=self.profiles,
+            dataset=self.dataset,
+            functions=SimilarityFunctionsJC.ALL
+        )
+        similarities = self.compute_groups(
+            normalized=normalized,
             functions=SimilarityFunctionsJC.ALL,
-            operation_avg=operation_avg
+            groups=SimilarityFunctionsJC.GROUPS
         )
-        similarities = [
-            self.compute(
+
+        if compact:
+            payload = self.payload(
                 profiles=self.profiles,
-                normalized=normalized,
-                functions=group
+                dataset=self.dataset,
+                similarities=similarities,
+                group_abbreviations=SimilarityFunctionsJC.ABBREVIATIONS,
+                radar_functions=RadarJC.TOP_FUNCTIONS,
+                compare_filename=SimilarityJC.COMPARE_FILENAME
+            )
+            return self.run_compact(
+                output_path=output_path,
+                payload=payload,
+                doc_title="JCAlgTest - Similarity table",
+                intro=self.intro,
+                filenames=(SimilarityJC.FILENAME, SimilarityJC.DATA_FILENAME,
+                           SimilarityJC.COMPARE_FILENAME),
+                notebook=notebook
             )
-            for group in SimilarityFunctionsJC.GROUPS
-        ]
 
         html = self.run_single(
             doc_title="JCAlgTest - Similarity table",
@@ -317,10 +504,7 @@ class SimilarityJC(Page, Similarity):
             similarity_table=partial(
                 self.similarity_table,
                 similarities=similarities,
-                profiles=self.sorted_profiles(
-                    profiles=self.profiles,
-                    similarities=similarities
-                ),
+                profiles=self.profiles,
                 group_abbreviations=SimilarityFunctionsJC.ABBREVIATIONS,
             )
         )
@@ -334,31 +518,56 @@ class SimilarityJC(Page, Similarity):
 
 class SimilarityTPM(Similarity, Page):
     FILENAME = "similarity-table-tpm.html"
+    DATA_FILENAME = "similarity-data-tpm.js"
+    COMPARE_FILENAME = "similarity-compare-tpm.html"
 
     def __init__(self, profiles):
         self.profiles: List[ProfilePerformanceTPM] = profiles
+        self.dataset = PerformanceDataset.from_profiles(profiles)
 
     def intro(self):
         tags.h1("Similarity of TPMs based on their performance")
 
     @overrides
-    def run(self, output_path: Optional[str] = None, notebook: bool = False):
-        def operation_avg(result: PerformanceResultTPM):
-            return result.operation_avg if result.operation_avg else 0
-
+    def run(self, output_path: Optional[str] = None, notebook: bool = False,
+            compact: bool = False):
+        """
+        :param compact: instead of the full HTML table, saves the similarity
+               matrices once and renders the table and comparison of devices
+               on the client side
+        """
         normalized = self.normalize(
-            profiles=self.profiles,
+            dataset=self.dataset,
+            functions=SimilarityFunctionsTPM.ALL
+        )
+        similarities = self.compute_groups(
+            normalized=normalized,
             functions=SimilarityFunctionsTPM.ALL,
-            operation_avg=operation_avg
+            groups=SimilarityFunctionsTPM.GROUPS
         )
-        similarities = [
-            self.compute(
+
+        if compact:
+            payload = self.payload(
                 profiles=self.profiles,
-                normalized=normalized,
-                functions=group
+                dataset=self.dataset,
+                similarities=similarities,
+                group_abbreviations=SimilarityFunctionsTPM.ABBREVIATIONS,
+                radar_functions=RadarTPM.TOP_FUNCTIONS(self.profiles),
+                compare_filename=SimilarityTPM.COMPARE_FILENAME
             )
-            for group in SimilarityFunctionsTPM.GROUPS
-        ]
+            html = self.run_compact(
+                output_path=output_path,
+                payload=payload,
+                doc_title="tpm2-algtest - Similarity table",
+                intro=self.intro,
+                filenames=(SimilarityTPM.FILENAME, SimilarityTPM.DATA_FILENAME,
+                           SimilarityTPM.COMPARE_FILENAME),
+                notebook=notebook,
+                device='tpm'
+            )
+            if output_path:
+                output_path = f"{output_path}/{SimilarityTPM.FILENAME}"
+            return html, output_path
 
         html = self.run_single(
             doc_title="tpm2-algtest - Similarity table",
@@ -366,10 +575,7 @@ class SimilarityTPM(Similarity, Page):
             similarity_table=partial(
                 self.similarity_table,
                 similarities=similarities,
-                profiles=self.sorted_profiles(
-                    profiles=self.profiles,
-                    similarities=similarities
-                ),
+                profiles=self.profiles,
                 group_abbreviations=SimilarityFunctionsTPM.ABBREVIATIONS
             ),
             notebook=notebook,
@@ -1,7 +1,7 @@
 import os
 
 from dominate import tags
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
 from pandas import Series
 from tqdm import tqdm
 
@@ -9,6 +9,7 @@ from tqdm import tqdm
 from algtestprocess.modules.components.layout import layout
 from algtestprocess.modules.components.modal import modal, modal_script
 from algtestprocess.modules.pages.page import Page
+from algtestprocess.modules.visualization.plot import PlotCache
 from algtestprocess.modules.visualization.spectrogram import Spectrogram
 from algtestprocess.modules.visualization.utils import merge_cryptoprops_dfs
 
@@ -28,8 +29,9 @@ class Spectrograms(Page):
         "ecc_bn256_ecschnorr",
     ]
 
-    def __init__(self, profiles):
+    def __init__(self, profiles, cache: Optional[PlotCache] = None):
         self.profiles = profiles
+        self.cache = cache
         # Custom y axis scaling depending on algorithm
         self.yminymax: Dict[str, Tuple[int, int]] = {}
 
@@ -50,7 +52,9 @@ class Spectrograms(Page):
             try:
                 filename = f"{i}_{device_name.replace(' ', '_')}_{alg}.png"
 
-                Spectrogram(df, device_name, yrange=self.yminymax[alg]).build().save(
+                Spectrogram(
+                    df, device_name, yrange=self.yminymax[alg], cache=self.cache
+                ).build().save(
                     filename=f"{output_path}/{Spectrograms.SUBFOLDER_NAME}/{filename}"
                 )
             except (TypeError, AttributeError) as ex:
@@ -1,16 +1,23 @@
-import re
+import os
 from functools import partial
-from typing import List, Callable, Dict, Set, Optional, Tuple, Union
+from itertools import chain
+from typing import List, Callable, Dict, Set, Optional, Tuple, Union, \
+    Iterable, Iterator, TextIO
 
 from dominate import tags
 from overrides import overrides
 
 from algtestprocess.modules.components.layout import layout
+from algtestprocess.modules.components.stream import PageWriter, \
+    stream_layout
 from algtestprocess.modules.components.utils import AssetsPaths
-from algtestprocess.modules.config import SupportGroupsJC, TPM2Identifier
+from algtestprocess.modules.config import SupportGroupsJC
 from algtestprocess.modules.jcalgtest import ProfileSupportJC
 from algtestprocess.modules.pages.page import Page
-from algtestprocess.modules.profiles.tpm.support import ProfileSupportTPM
+from algtestprocess.modules.pages.utils import device_name
+from algtestprocess.modules.data.tpm.profiles.support import \
+    ProfileSupportTPM
+from algtestprocess.modules.data.tpm.supportmatrix import SupportMatrixTPM
 
 
 def colored_cell(tag: Callable, content: str):
@@ -45,6 +52,10 @@ Profile = Union[ProfileSupportJC, ProfileSupportTPM]
 
 
 class Support:
+    ADDITIONS = [
+        AssetsPaths.SUPPORTTABLE_CSS,
+        AssetsPaths.CHECKBOXES_JS
+    ]
 
     def filter_by_support(
             self,
@@ -124,7 +135,7 @@ class Support:
             p = tags.p(style="margin:0;")
             p.add(tags.input_(type="checkbox", name=f"{i}", id=f"{device}{i}"))
             p.add(tags.b(f"{device}{i}"))
-            p.add(f" - {profile.device_name()}")
+            p.add(f" - {device_name(profile)}")
             curr_div.add(p)
 
     def checkboxes(
@@ -147,34 +158,46 @@ class Support:
                 profiles,
             )
 
-    def category(self, name: str, device: str, profiles, rows: Callable):
+    def category(
+            self,
+            name: str,
+            device: str,
+            profiles,
+            rows: Callable) -> Iterator[tags.tr]:
         """
         Creates category section in table
         :param name: category name
         :param device: acronym for 'tpm' or 'card'
         :param profiles: list of device profiles
-        :param rows: function which creates a row
+        :param rows: function which creates the rows
+        :return: generator of the rows
         """
-        with tags.tr():
+        with tags.tr() as row:
             tags.td(name, className="dark")
             # TODO Introduced in JC ver. xxx column
             for i, profile in enumerate(profiles):
                 tags.th(
                     f"{device}{i}",
                     className=f"dark_index {i}",
-                    title=profile.device_name()
+                    title=device_name(profile)
                 )
-        rows()
+        yield row
+        yield from rows()
 
-    def basic_info_rows(self, basic_info_items, profiles, get_info):
+    def basic_info_rows(
+            self,
+            basic_info_items,
+            profiles,
+            get_info) -> Iterator[tags.tr]:
         """
         Creates basic info section
         :param basic_info_items: items to be shown
         :param profiles: list of device profiles
         :param get_info: getter for the info item
+        :return: generator of the rows
         """
         for item in basic_info_items:
-            with tags.tr():
+            with tags.tr() as row:
                 tags.td(
                     item,
                     className="light"
@@ -185,63 +208,104 @@ class Support:
                     colored_cell(
                         partial(
                             tags.td,
-                            title=f"{profile.device_name()} : {item} : {content}"
+                            title=f"{device_name(profile)} : {item} : {content}"
                         ),
                         content
                     )
+            yield row
 
     def table_header(
             self,
             device: str,
             basic_info_items: List[str],
             profiles: List[Profile],
-            get_info: Callable):
+            get_info: Callable) -> Iterator[tags.tr]:
         """
         Creates support table header
         :param device: acronym for 'tpm' or 'card'
         :param basic_info_items: items to be shown
         :param profiles: list of device profiles
         :param get_info: getter for the info item
+        :return: generator of the header rows
         """
-        with tags.thead():
-            self.category(
-                name="Basic info",
-                device=device,
-                profiles=profiles,
-                rows=partial(
-                    self.basic_info_rows,
-                    basic_info_items,
-                    profiles,
-                    get_info
-                ),
-            )
+        return self.category(
+            name="Basic info",
+            device=device,
+            profiles=profiles,
+            rows=partial(
+                self.basic_info_rows,
+                basic_info_items,
+                profiles,
+                get_info
+            ),
+        )
 
     def main_rows(
             self,
             all_keys: Set[str],
             profiles: List[Profile],
-            get_content: Callable):
+            get_content: Optional[Callable] = None,
+            get_row: Optional[Callable] = None) -> Iterator[tags.tr]:
         """
         Creates rows for given set of keys
         :param all_keys: table side header key
         :param profiles: list of device profiles
         :param get_content: getter for cell content according to profile and key
-        :return:
+        :param get_row: alternatively getter of contents of all cells by key
+        :return: generator of the rows
         """
+        names = [device_name(profile) for profile in profiles]
         for key in sorted(all_keys):
-            with tags.tr():
+            contents = get_row(key) if get_row \
+                else [get_content(profile, key) for profile in profiles]
+            with tags.tr() as row:
                 tags.td(key, className="light")
-                for profile in profiles:
-                    content = get_content(profile, key)
+                for name, content in zip(names, contents):
                     support = content.split(";")[0] if content else "-"
                     status = content.split(';')[1] if support == 'error' else support
                     colored_cell(
                         partial(
                             tags.td,
-                            title=f"{profile.device_name()} : {key} : {status}"
+                            title=f"{name} : {key} : {status}"
                         ),
                         support
                     )
+            yield row
+
+    def support_table(
+            self,
+            header_rows: Iterable[tags.tr],
+            body_rows: Iterable[tags.tr],
+            writer: Optional[PageWriter] = None):
+        """
+        Creates the support table from the rows
+        :param header_rows: rows of the table head
+        :param body_rows: rows of the table body
+        :param writer: if given, the rows are written one by one as they
+               are created instead of building the table in current context
+        """
+        table = partial(
+            tags.table,
+            id="tab",
+            width="37rem",
+            border="0",
+            cellspacing="2",
+            cellpadding="4",
+            className="table"
+        )
+        if writer is None:
+            with table():
+                with tags.thead() as thead:
+                    thead.add(*header_rows)
+                with tags.tbody() as tbody:
+                    tbody.add(*body_rows)
+            return
+
+        with writer.tag(table()):
+            writer.write(tags.thead(*header_rows))
+            with writer.tag(tags.tbody()):
+                for row in body_rows:
+                    writer.write(row)
 
     def run_single(
             self,
@@ -269,10 +333,7 @@ class Support:
         """
         doc_title = title
 
-        additions = [
-            AssetsPaths.SUPPORTTABLE_CSS,
-            AssetsPaths.CHECKBOXES_JS
-        ]
+        additions = Support.ADDITIONS
 
         def children_outside():
             with tags.div(className="container-fluid pt-5"):
@@ -294,6 +355,74 @@ class Support:
             device=device
         )
 
+    def write_page(
+            self,
+            filename: str,
+            output_path: Optional[str],
+            notebook: bool,
+            stream: bool,
+            **parts
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Creates the page from given parts and writes it into output folder
+        :param filename: name of the page file
+        :param output_path: folder where the page is written, if any
+        :param stream: write the page into the file row by row without
+               keeping whole document in memory, html is not returned then
+        :return: html of the page and path of the written file
+        """
+        if output_path:
+            output_path = f"{output_path}/{filename}"
+
+        if stream and output_path:
+            with open(output_path, "w") as f:
+                self.stream_single(f, **parts, notebook=notebook)
+            return None, output_path
+
+        html = self.run_single(**parts, notebook=notebook)
+
+        if output_path:
+            with open(output_path, "w") as f:
+                f.write(html)
+
+        return html, output_path
+
+    def stream_single(
+            self,
+            out: TextIO,
+            title: str,
+            intro: Callable,
+            abbreviations: Callable,
+            notes: Optional[Callable],
+            checkboxes: Callable,
+            table: Callable,
+            notebook: bool = False,
+            device: str = 'javacard'
+    ):
+        """
+        Same page as created by run_single, written into out row by row
+        :param out: file or buffer where the page is written
+        :param table: creates the table, writing it with given PageWriter
+        """
+        with stream_layout(
+                out,
+                doc_title=title,
+                asset_additions=Support.ADDITIONS,
+                back_to_top=True,
+                notebook=notebook,
+                device=device
+        ) as writer:
+            with writer.tag(tags.div(className="container-fluid pt-5")):
+                with tags.div(className="flex row pt-5") as div:
+                    intro()
+                writer.write(div)
+                writer.capture(abbreviations)
+                if notes:
+                    writer.capture(notes)
+                writer.capture(checkboxes)
+                with writer.tag(tags.b()):
+                    table(writer=writer)
+
 
 class SupportJC(Support, Page):
     FILENAME = "table.html"
@@ -414,8 +543,8 @@ class SupportJC(Support, Page):
         p.add(tags.a("https://smartcard-atr.apdu.fr/",
                      href="https://smartcard-atr.apdu.fr"))
 
-    def jc_system(self):
-        self.category(
+    def jc_system(self) -> Iterator[tags.tr]:
+        return self.category(
             name="javacard.framework.JCSystem",
             device="card",
             profiles=self.profiles,
@@ -430,7 +559,7 @@ class SupportJC(Support, Page):
             ),
         )
 
-    def javacard_main(self):
+    def javacard_main(self) -> Iterator[tags.tr]:
         def get_content(profile, key):
             result = profile.results.get(key)
             if result:
@@ -439,7 +568,7 @@ class SupportJC(Support, Page):
             return "-"
 
         for cat in SupportJC.CATEGORIES:
-            self.category(
+            yield from self.category(
                 name=cat,
                 device="card",
                 profiles=self.profiles,
@@ -457,30 +586,28 @@ class SupportJC(Support, Page):
                 ),
             )
 
-    def table(self):
-        with tags.table(
-                id="tab",
-                width="37rem",
-                border="0",
-                cellspacing="2",
-                cellpadding="4",
-                className="table"
-        ):
-            self.table_header(
+    def table(self, writer: Optional[PageWriter] = None):
+        self.support_table(
+            header_rows=self.table_header(
                 device="card",
                 basic_info_items=[
                     "AlgTest applet version", "JavaCard support version"
                 ],
                 profiles=self.profiles,
                 get_info=lambda profile, key: profile.test_info.get(key)
-            )
-            with tags.tbody():
-                self.jc_system()
-                self.javacard_main()
+            ),
+            body_rows=chain(self.jc_system(), self.javacard_main()),
+            writer=writer
+        )
 
     @overrides
-    def run(self, output_path: Optional[str] = None, notebook: bool = False):
-        html = self.run_single(
+    def run(self, output_path: Optional[str] = None, notebook: bool = False,
+            stream: bool = False):
+        return self.write_page(
+            filename=SupportJC.FILENAME,
+            output_path=output_path,
+            notebook=notebook,
+            stream=stream,
             title="JCAlgTest - Support table",
             intro=self.intro,
             abbreviations=self.abbreviations,
@@ -491,17 +618,9 @@ class SupportJC(Support, Page):
                 support_groups=SupportGroupsJC.GROUPS,
                 profiles=self.profiles,
             ),
-            table=self.table,
-            notebook=notebook
+            table=self.table
         )
 
-        if output_path:
-            output_path = f"{output_path}/{SupportJC.FILENAME}"
-            with open(output_path, "w") as f:
-                f.write(html)
-
-        return html, output_path
-
 
 class SupportTPM(Support, Page):
     FILENAME = "tpmtable.html"
@@ -514,6 +633,7 @@ class SupportTPM(Support, Page):
 
     def __init__(self, profiles):
         self.profiles: List[ProfileSupportTPM] = profiles
+        self._matrix: Optional[SupportMatrixTPM] = None
 
     def intro(self):
         with tags.div(className="col-xl-9"):
@@ -526,64 +646,58 @@ class SupportTPM(Support, Page):
             tags.span(profile.test_info["TPM name"])
             tags.br()
 
-    def tpm_main(self):
-        def get_content(profile, key):
-            properties = key not in TPM2Identifier.ALL_KEYS
-            result = profile.results.get(key)
-            if result:
-                if result.value:
-                    return result.value \
-                        if not re.match(r"0x[0-9a-f]+", result.value) \
-                        else str(int(result.value, 16))
-                return "yes"
-            return "-" if properties else "no"
-
-        categories = set(sorted([
-            result.category
-            for profile in self.profiles
-            for _, result in profile.results.items()
-        ]))
-
-        for cat in categories:
-            self.category(
+    @property
+    def matrix(self) -> SupportMatrixTPM:
+        if self._matrix is None:
+            self._matrix = SupportMatrixTPM(self.profiles)
+        return self._matrix
+
+    def tpm_main(self) -> Iterator[tags.tr]:
+        matrix = self.matrix
+        for cat in matrix.categories:
+            yield from self.category(
                 name=cat,
                 device="tpm",
                 profiles=self.profiles,
                 rows=partial(
                     self.main_rows,
-                    all_keys=set([
-                        key for profile in self.profiles
-                        for key, _ in list(filter(
-                            lambda x: x[1].category == cat,
-                            profile.results.items()
-                        ))
-                    ]),
+                    all_keys=matrix.keys(cat),
                     profiles=self.profiles,
-                    get_content=get_content,
+                    get_row=matrix.row,
                 ),
             )
 
-    def table(self):
-        with tags.table(
-                id="tab",
-                width="37rem",
-                border="0",
-                cellspacing="2",
-                cellpadding="4",
-                className="table"
-        ):
-            self.table_header(
+    def export(self, output_path: str):
+        """Writes the support matrix as csv and json next to the page"""
+        stem = os.path.splitext(SupportTPM.FILENAME)[0]
+        with open(f"{output_path}/{stem}.csv", "w", newline="") as f:
+            self.matrix.to_csv(f)
+        with open(f"{output_path}/{stem}.json", "w") as f:
+            self.matrix.to_json(f)
+
+    def table(self, writer: Optional[PageWriter] = None):
+        self.support_table(
+            header_rows=self.table_header(
                 device="card",
                 basic_info_items=["Image tag"],
                 profiles=self.profiles,
                 get_info=lambda profile, key: profile.test_info.get(key)
-            )
-            with tags.tbody():
-                self.tpm_main()
+            ),
+            body_rows=self.tpm_main(),
+            writer=writer
+        )
 
     @overrides
-    def run(self, output_path: Optional[str] = None, notebook: bool = False):
-        html = self.run_single(
+    def run(self, output_path: Optional[str] = None, notebook: bool = False,
+            stream: bool = False):
+        if output_path:
+            self.export(output_path)
+
+        return self.write_page(
+            filename=SupportTPM.FILENAME,
+            output_path=output_path,
+            notebook=notebook,
+            stream=stream,
             title="tpm-algtest - Support table",
             intro=self.intro,
             abbreviations=self.abbreviations,
@@ -595,13 +709,5 @@ class SupportTPM(Support, Page):
                 profiles=self.profiles,
             ),
             table=self.table,
-            notebook=notebook,
             device='tpm'
         )
-
-        if output_path:
-            output_path = f"{output_path}/{SupportTPM.FILENAME}"
-            with open(output_path, "w") as f:
-                f.write(html)
-
-        return html, output_path
@@ -1,37 +1,50 @@
 import os
+from contextlib import nullcontext
 from typing import List, Tuple, Callable, Union, Dict
 
 from tqdm import tqdm
 
+from algtestprocess.modules.components.utils import AssetBundle, \
+    shared_assets
 from algtestprocess.modules.jcalgtest import ProfileJC, PerformanceResultJC
-from algtestprocess.modules.profiles.tpm.base import ProfileTPM
+from algtestprocess.modules.data.tpm.profiles.base import ProfileTPM
 
 Name = str
 Href = str
 Profile = Union[ProfileJC, ProfileTPM]
 
 
+def device_name(profile: Profile) -> str:
+    """JavaCard profiles provide the name by method, TPM ones by property"""
+    name = profile.device_name
+    return name() if callable(name) else name
+
+
 def run_helper(
     output_path: str,
     profiles: List[Profile],
     run_single: Callable,
     desc: str = "Unknown",
+    bundle_assets: bool = False
 ) -> List[Tuple[Name, Href]]:
     """
     Function which repeatedly calls run_single method and saves
     the results of processing
+    :param bundle_assets: inlined (notebook mode) assets are written once
+           into assets folder next to the pages and referenced from them
     :return List of tuples used to reference created files
     """
     if not os.path.exists(output_path):
         os.mkdir(output_path)
     data: List[Tuple[str, str]] = []
-    for i in tqdm(range(len(profiles)), desc=desc):
-        profile = profiles[i]
-        name = profile.device_name()
-        path = f"{output_path}/{name}.html"
-        with open(path, "w") as f:
-            f.write(run_single(profile=profile))
-        data.append((name, path))
+    with assets_context(output_path, bundle_assets):
+        for i in tqdm(range(len(profiles)), desc=desc):
+            profile = profiles[i]
+            name = device_name(profile)
+            path = f"{output_path}/{name}.html"
+            with open(path, "w") as f:
+                f.write(run_single(profile=profile))
+            data.append((name, path))
     return data
 
 
@@ -40,6 +53,7 @@ def run_helper_multi(
     items: List[List[Profile]],
     run_single: Callable,
     desc: str = "Unknown",
+    bundle_assets: bool = False
 ) -> Dict[Tuple[Profile, ...], str]:
     """
     Similar to run_helper method except for the fact it is called for
@@ -48,18 +62,26 @@ def run_helper_multi(
     if not os.path.exists(output_path):
         os.mkdir(output_path)
     data: Dict[Tuple[Profile, ...], str] = {}
-    for j in tqdm(range(len(items)), desc=desc):
-        profiles = items[j]
-        filename = ""
-        for i, profile in enumerate(profiles):
-            filename += ("_vs_" if i > 0 else "") + profile.device_name()
-        path = f"{output_path}/{filename}.html"
-        with open(path, "w") as f:
-            f.write(run_single(profiles))
-        data[tuple(profiles)] = filename
+    with assets_context(output_path, bundle_assets):
+        for j in tqdm(range(len(items)), desc=desc):
+            profiles = items[j]
+            filename = ""
+            for i, profile in enumerate(profiles):
+                filename += ("_vs_" if i > 0 else "") + device_name(profile)
+            path = f"{output_path}/{filename}.html"
+            with open(path, "w") as f:
+                f.write(run_single(profiles))
+            data[tuple(profiles)] = filename
     return data
 
 
+def assets_context(output_path: str, bundle_assets: bool):
+    """Shared asset bundle in output folder, if requested"""
+    if not bundle_assets:
+        return nullcontext()
+    return shared_assets(AssetBundle(f"{output_path}/assets"))
+
+
 def results_map(r: List[PerformanceResultJC]):
     """Remove unsuccessfully measured results"""
     return list(
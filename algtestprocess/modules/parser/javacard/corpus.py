@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from algtestprocess.modules.data.performance import PerformanceDataset
+from algtestprocess.modules.jcalgtest import (
+    ProfilePerformanceFixedJC,
+    ProfilePerformanceVariableJC,
+    ProfileSupportJC,
+)
+from algtestprocess.modules.parser.javacard.performance import \
+    PerformanceParserJC, search_files
+from algtestprocess.modules.parser.javacard.support import SupportParserJC
+
+ProfileJC = Union[
+    ProfileSupportJC, ProfilePerformanceFixedJC, ProfilePerformanceVariableJC
+]
+
+SUPPORT = "support"
+PERFORMANCE = "performance"
+PERFORMANCE_VARIABLE = "performance-variable"
+KINDS = [SUPPORT, PERFORMANCE, PERFORMANCE_VARIABLE]
+
+# Bump when the parsers change, so that stale cached profiles are not used
+CACHE_VERSION = "1"
+
+
+def file_kind(path: str) -> Optional[str]:
+    """
+    Kind of the result file given by its name, support profiles are CSVs
+    from JCAlgTest, performance profiles are JSONs converted by
+    convert_to_json
+    :return: one of KINDS or None if the file is not a profile
+    """
+    name = os.path.basename(path)
+    extension = name[name.rfind('.'):].lower()
+    if extension == ".csv" and "ALGSUPPORT" in name:
+        return SUPPORT
+    if extension == ".json":
+        return PERFORMANCE_VARIABLE if "DATADEPEND" in name else PERFORMANCE
+    return None
+
+
+def discover(path: str, kinds: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    Finds profile files of given kinds in the directory recursively
+    :return: sorted list of (kind, path)
+    """
+    kinds = set(kinds)
+    found = []
+    for file_path in search_files(path):
+        kind = file_kind(file_path)
+        if kind in kinds:
+            found.append((kind, file_path))
+    return sorted(found, key=lambda x: x[1])
+
+
+class ParseCache:
+    """
+    On-disk store of parsed profiles
+
+    Profiles are pickled under a hash of the file content together with
+    its name (support parser reads card name from it) and kind, so a result
+    file is parsed only once until it changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(kind: str, path: str, content: bytes) -> str:
+        h = hashlib.sha256()
+        for part in [CACHE_VERSION, kind, os.path.basename(path)]:
+            h.update(part.encode("utf-8"))
+            h.update(b"\x00")
+        h.update(content)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pickle")
+
+    def get(self, key: str) -> Optional[ProfileJC]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError) as err:
+            logging.warning(f"ParseCache: unusable entry {key=}, {err}")
+            return None
+
+    def put(self, key: str, profile: ProfileJC):
+        path = self._path(key)
+        # Write to temporary file first, so that concurrent workers never
+        # read partially written profile
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(profile, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+
+def parse_file(kind: str, path: str) -> ProfileJC:
+    """Parses the result file of given kind into profile"""
+    if kind == SUPPORT:
+        return SupportParserJC(path).parse()
+    profile = ProfilePerformanceVariableJC() if kind == PERFORMANCE_VARIABLE \
+        else ProfilePerformanceFixedJC()
+    return PerformanceParserJC(path).parse(profile)
+
+
+def load_file(
+        kind: str,
+        path: str,
+        cache_path: Optional[str] = None
+) -> Tuple[str, str, Optional[ProfileJC]]:
+    """
+    Parses the file, possibly taking the profile from the cache
+    :return: kind, path and the profile or None if it could not be parsed
+    """
+    cache = key = None
+    if cache_path is not None:
+        cache = ParseCache(cache_path)
+        with open(path, "rb") as f:
+            key = ParseCache.key(kind, path, f.read())
+        profile = cache.get(key)
+        if profile is not None:
+            return kind, path, profile
+
+    try:
+        profile = parse_file(kind, path)
+    except Exception as err:
+        logging.error(f"load_file: could not parse {kind} {path=}, {err}")
+        return kind, path, None
+
+    if cache is not None:
+        cache.put(key, profile)
+    return kind, path, profile
+
+
+def _load_file(args: Tuple[str, str, Optional[str]]):
+    return load_file(*args)
+
+
+def load_javacard_corpus(
+        path: str,
+        kinds: Iterable[str] = (SUPPORT, PERFORMANCE),
+        jobs: int = 1,
+        cache_path: Optional[str] = None,
+        dataset: bool = False
+) -> Union[Dict[str, List[ProfileJC]], PerformanceDataset]:
+    """
+    Loads all JavaCard profiles found in the results directory
+    :param path: directory searched recursively for result files
+    :param kinds: kinds of profiles to load, see KINDS
+    :param jobs: number of processes parsing the files
+    :param cache_path: directory of parsed profiles cache, no cache if None
+    :param dataset: return performance results as a columnar dataset
+    :return: kind -> profiles in order of their paths,
+             or dataset of fixed data length performance profiles
+    """
+    kinds = list(kinds)
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise ValueError(f"Unknown kinds of profiles {sorted(unknown)}")
+    if dataset and PERFORMANCE not in kinds:
+        kinds.append(PERFORMANCE)
+
+    files = discover(path, kinds)
+    tasks = [(kind, file_path, cache_path) for kind, file_path in files]
+    if jobs <= 1 or len(tasks) <= 1:
+        results = list(map(_load_file, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(
+                _load_file, tasks, chunksize=max(1, len(tasks) // (4 * jobs))
+            ))
+
+    profiles: Dict[str, List[ProfileJC]] = {kind: [] for kind in kinds}
+    for kind, file_path, profile in results:
+        if profile is not None:
+            profiles[kind].append(profile)
+
+    if dataset:
+        return PerformanceDataset.from_profiles(profiles[PERFORMANCE])
+    return profiles
@@ -1,6 +1,7 @@
 import json
 import os
-from typing import Union, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Set, Tuple, Union
 
 from algtestprocess.modules.config import CARD_EXCEPTION_TO_STRING
 from algtestprocess.modules.jcalgtest import (
@@ -73,8 +74,8 @@ class PerformanceParserJC:
                             .split(";"),
                     )
                     info = measurements["operation info:"].split(";")[1::2]
-                    result.baseline = list(baseline)
-                    result.operation = list(operation)
+                    result.baseline = baseline
+                    result.operation = operation
                     result.data_length = int(info[0])
                     result.iterations = int(info[1])
                     result.invocations = int(info[2])
@@ -92,15 +93,24 @@ MEASUREMENT_CATEGORIES = list(map(lambda x: x.value, list(MeasurementCategory)))
 
 
 def search_files(folder):
-    for root, dirs, files in os.walk(folder):
-        yield from [os.path.join(root, x) for x in files]
+    """
+    Yields paths of all files in the folder recursively, the file type
+    is taken from the directory entry, so files are not stat-ed one by one
+    """
+    with os.scandir(folder) as scan:
+        entries = list(scan)
+    # Same order as os.walk, files of the folder before its subfolders
+    for entry in entries:
+        if entry.is_file():
+            yield entry.path
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from search_files(entry.path)
 
 
 def get_files_to_process(walk_dir: str, required_extension: str):
     files_to_process: List[str] = []
     for file_name in search_files(walk_dir):
-        if not os.path.isfile(file_name):
-            continue
         file_ext = file_name[file_name.rfind('.'):]
         if file_ext.lower() != required_extension:
             continue
@@ -109,47 +119,57 @@ def get_files_to_process(walk_dir: str, required_extension: str):
     return files_to_process
 
 
+def read_section(lines: list, i: int, start_string: str,
+                 perf_measurement: bool) -> Tuple[dict, int]:
+    """
+    Reads one section starting at line i
+    :return: items of the section and index of its last processed line
+    """
+    just_entered = True
+    section_items = {}
+    while i < len(lines) and len(
+            lines[i]) > 0:  # process section till its end (newline)
+        if not just_entered and lines[i].startswith(
+                start_string):  # check if we hit another section
+            # we hit start fo another section - finish and let next section to be processed
+            i = i - 1
+            break
+
+        pos = lines[i].find(';')
+        if pos == -1:
+            pos = len(lines[i])
+        if pos > 0:
+            key = lines[i][0: pos].strip()
+            if lines[i].find('method name:;') != -1:
+                # do not strip ending ; for line with method for variable data measurements, strip only starting
+                # method_name;data_length;
+                value = lines[i][pos:].lstrip(';').strip()
+            else:
+                # strip ending ;
+                value = lines[i][pos:].strip().strip(';').strip()
+
+            if perf_measurement and len(
+                    value) == 0:  # error status like NO_SUCH_ALGORITHM
+                section_items['status'] = key
+            else:
+                if lines[i].find(
+                        'Exception') != -1:  # various exceptions
+                    section_items['status'] = key
+                else:
+                    section_items[key] = value
+        i = i + 1
+        just_entered = False
+    return section_items, i
+
+
 def extract_section(lines: list, start_string: str, perf_measurement: bool):
     all_sections = []
     i = 0
     while i < len(lines):
         if lines[i].startswith(
                 start_string):  # detect start of the section to extract
-            just_entered = True
-            section_items = {}
-            while i < len(lines) and len(
-                    lines[i]) > 0:  # process section till its end (newline)
-                if not just_entered and lines[i].startswith(
-                        start_string):  # check if we hit another section
-                    # we hit start fo another section - finish and let next section to be processed
-                    i = i - 1
-                    break
-
-                pos = lines[i].find(';')
-                if pos == -1:
-                    pos = len(lines[i])
-                if pos > 0:
-                    key = lines[i][0: pos].strip()
-                    if lines[i].find('method name:;') != -1:
-                        # do not strip ending ; for line with method for variable data measurements, strip only starting
-                        # method_name;data_length;
-                        value = lines[i][pos:].lstrip(';').strip()
-                    else:
-                        # strip ending ;
-                        value = lines[i][pos:].strip().strip(';').strip()
-
-                    if perf_measurement and len(
-                            value) == 0:  # error status like NO_SUCH_ALGORITHM
-                        section_items['status'] = key
-                    else:
-                        if lines[i].find(
-                                'Exception') != -1:  # various exceptions
-                            section_items['status'] = key
-                        else:
-                            section_items[key] = value
-                i = i + 1
-                just_entered = False
-
+            section_items, i = read_section(
+                lines, i, start_string, perf_measurement)
             all_sections.append(section_items)
         i = i + 1
 
@@ -161,88 +181,139 @@ def update_if_not_empty(struct: dict, values: list):
         struct.update(values[0])
 
 
-def convert_to_json(walk_dir: str, save: bool):
-    files = get_files_to_process(walk_dir, '.csv')
-    output = []
+# Sections of which only the first occurrence is converted
+INFO_SECTIONS = ['INFO:']
+TAIL_SECTIONS = [
+    'Total test time:;',
+    'Total human interventions (retries with physical resets etc.):;',
+    'Total reconnects to card:;',
+]
+JCSYSTEM_SECTIONS = ['JCSystem.getVersion()', 'JavaCard support version']
+CPLC_SECTIONS = ['CPLC;']
 
-    for filename in files:
-        print(filename)
+# Categories grouped by length, so that the category a line starts with
+# is found by few dictionary lookups
+CATEGORIES_BY_LENGTH: Dict[int, Set[str]] = {}
+for _category in MEASUREMENT_CATEGORIES:
+    CATEGORIES_BY_LENGTH.setdefault(len(_category), set()).add(_category)
+
+
+def first_sections(lines: list, starts: Dict[str, int], prefixes: List[str],
+                   struct: dict):
+    """Updates the struct by the first sections with given prefixes"""
+    for prefix in prefixes:
+        if prefix in starts:
+            struct.update(read_section(lines, starts[prefix], prefix, False)[0])
 
-        with open(filename) as f:
-            values = {}
-            lines_temp = f.readlines()
-            lines = [line.rstrip('\n') for line in lines_temp]
-
-            values['Info'] = {}
-            update_if_not_empty(values['Info'],
-                                extract_section(lines, 'INFO:', False))
-            update_if_not_empty(values['Info'],
-                                extract_section(lines[len(lines) - 10:],
-                                                'Total test time:;', False))
-            update_if_not_empty(values['Info'],
-                                extract_section(lines[len(lines) - 10:],
-                                                'Total human interventions (retries with physical resets etc.):;',
-                                                False))
-            update_if_not_empty(values['Info'],
-                                extract_section(lines[len(lines) - 10:],
-                                                'Total reconnects to card:;',
-                                                False))
-
-            values['JCSystem'] = {}
-            update_if_not_empty(values['JCSystem'],
-                                extract_section(lines, 'JCSystem.getVersion()',
-                                                False))
-            update_if_not_empty(values['JCSystem'], extract_section(lines,
-                                                                    'JavaCard support version',
-                                                                    False))
-
-            values['CPLC'] = {}
-            update_if_not_empty(values['CPLC'],
-                                extract_section(lines, 'CPLC;', False))
-
-            values['Measurements'] = {}
-            for category in MEASUREMENT_CATEGORIES:
-                values['Measurements'][category] = {}
-                # find start and end of the specific category
-                i = 0
-                start_index = -1
-                end_index = -1
-                while i < len(lines):
-                    if lines[i].startswith(category):
-                        start_index = i
-                        # find end of section
-                        while i < len(lines):
-                            if lines[i].startswith(category + ' - END'):
-                                end_index = i
-                                break
-                            i = i + 1
 
-                        if start_index > -1 and end_index > -1:
-                            section_data = extract_section(
-                                lines[start_index: end_index], 'method name:;',
-                                True)
-                            for item in section_data:
-                                if len(item.keys()) == 7:  # add explicit OK for correctly measured sections
-                                    item['status'] = 'OK'
-
-                                if item['method name:'] in \
-                                        values['Measurements'][category].keys():
-                                    print('Already exists ' + item[
-                                        'method name:'] + filename)
-                                values['Measurements'][category][
-                                    item['method name:']] = item
-
-                    i = i + 1
-            output.append(filename)
-            if save:
-                with open(filename + ".json", "w") as write_file:
-                    json.dump(values, write_file, indent=2, sort_keys=False)
-    return output
-
-    # # sanity check
-    # for item in values['Measurements']:
-    #     for item2 in item:
-    #         lines.remove()
+def convert_lines(lines: List[str], filename: str = "") -> dict:
+    """
+    Converts lines of the performance CSV into the JSON structure
+    in a single pass, each line is examined once to find starts of the
+    sections and both ends of the measurement categories, afterwards only
+    the found sections are read.
+    :param lines: lines of the file without newlines
+    :param filename: name of the file used in warnings
+    :return: same structure as written by convert_to_json
+    """
+    pending = INFO_SECTIONS + JCSYSTEM_SECTIONS + CPLC_SECTIONS
+    starts: Dict[str, int] = {}
+    # Category -> index of its start line, if its end is not yet found
+    opened: Dict[str, int] = {}
+    spans: Dict[str, List[Tuple[int, int]]] = {
+        category: [] for category in MEASUREMENT_CATEGORIES
+    }
+
+    for i, line in enumerate(lines):
+        if not line:
+            continue
+
+        if pending:
+            for prefix in pending:
+                if line.startswith(prefix):
+                    starts[prefix] = i
+            pending = [prefix for prefix in pending if prefix not in starts]
+
+        for length, categories in CATEGORIES_BY_LENGTH.items():
+            category = line[:length]
+            if category not in categories:
+                continue
+            if category in opened:
+                if line.startswith(category + ' - END'):
+                    spans[category].append((opened.pop(category), i))
+            elif not line.startswith(category + ' - END'):
+                opened[category] = i
+
+    # Totals are searched only at the end of the file
+    tail = max(len(lines) - 10, 0)
+    for i in range(tail, len(lines)):
+        for prefix in TAIL_SECTIONS:
+            if prefix not in starts and lines[i].startswith(prefix):
+                starts[prefix] = i
+
+    values = {'Info': {}}
+    first_sections(lines, starts, INFO_SECTIONS, values['Info'])
+    first_sections(lines, starts, TAIL_SECTIONS, values['Info'])
+
+    values['JCSystem'] = {}
+    first_sections(lines, starts, JCSYSTEM_SECTIONS, values['JCSystem'])
+
+    values['CPLC'] = {}
+    first_sections(lines, starts, CPLC_SECTIONS, values['CPLC'])
+
+    values['Measurements'] = {}
+    for category in MEASUREMENT_CATEGORIES:
+        measurements = values['Measurements'][category] = {}
+        for start_index, end_index in spans[category]:
+            section_data = extract_section(
+                lines[start_index: end_index], 'method name:;', True)
+            for item in section_data:
+                if len(item.keys()) == 7:  # add explicit OK for correctly measured sections
+                    item['status'] = 'OK'
+
+                if item['method name:'] in measurements.keys():
+                    print('Already exists ' + item['method name:'] + filename)
+                measurements[item['method name:']] = item
+    return values
+
+
+def convert_file(filename: str, save: bool) -> dict:
+    """Converts one performance CSV, saves it next to it if required"""
+    print(filename)
+    with open(filename) as f:
+        lines = [line.rstrip('\n') for line in f]
+
+    values = convert_lines(lines, filename)
+    if save:
+        with open(filename + ".json", "w") as write_file:
+            json.dump(values, write_file, indent=2, sort_keys=False)
+    return values
+
+
+def _convert_file(args: Tuple[str, bool]) -> str:
+    filename, save = args
+    convert_file(filename, save)
+    return filename
+
+
+def convert_to_json(walk_dir: str, save: bool, jobs: int = 1):
+    """
+    Converts all performance CSVs in the directory
+    :param walk_dir: results directory searched recursively
+    :param save: whether to write the JSON next to each CSV
+    :param jobs: number of processes converting the files in parallel
+    :return: names of converted files
+    """
+    files = get_files_to_process(walk_dir, '.csv')
+    if jobs <= 1 or len(files) <= 1:
+        return [_convert_file((filename, save)) for filename in files]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(
+            _convert_file,
+            [(filename, save) for filename in files],
+            chunksize=max(1, len(files) // (4 * jobs))
+        ))
 
 
 def prepare_missing_measurements(walk_dir: str):
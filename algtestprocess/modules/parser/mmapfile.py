@@ -0,0 +1,161 @@
+import mmap
+import os
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns of measurement CSVs holding numbers, the others hold hex values,
+# which would be inferred as integers or floats when made of digits only
+NUMERIC_COLUMNS = {"id", "duration", "duration_extra"}
+
+
+class MappedFile:
+    """
+    Read-only memory map of a measurement file
+
+    Lines are returned as memoryview slices of the map, so that large files
+    are neither read whole nor copied, only the lines being processed are
+    paged in. The views must not outlive the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map: Optional[mmap.mmap] = None
+        # Empty files cannot be mapped
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        self.view = memoryview(self._map if self._map is not None else b"")
+
+    def close(self):
+        self.view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Some line views are still alive, the map is unmapped
+                # once they are garbage collected
+                pass
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def lines(self, start: int = 0, end: Optional[int] = None) \
+            -> Iterator[memoryview]:
+        """
+        Views of lines without the line endings (\\n or \\r\\n)
+        :param start: offset of the beginning of the first line
+        :param end: offset after which no more lines are started
+        """
+        if self._map is None:
+            return
+        data = self._map
+        end = len(data) if end is None else min(end, len(data))
+        pos = start
+        while pos < end:
+            newline = data.find(b"\n", pos)
+            stop = len(data) if newline < 0 else newline
+            line_end = stop - 1 if stop > pos and data[stop - 1] == 0x0d \
+                else stop
+            yield self.view[pos:line_end]
+            pos = stop + 1
+
+    def header(self) -> bytes:
+        """First line of the file"""
+        for line in self.lines():
+            return line.tobytes()
+        return b""
+
+
+def read_lines(path: str, skip_empty: bool = False) -> List[str]:
+    """
+    Decoded lines of the text file stripped of whitespace, lines are split
+    in the same way as by readlines of file opened in text mode
+    :param skip_empty: leave out the empty lines
+    """
+    ret = []
+    with MappedFile(path) as f:
+        for view in f.lines():
+            line = str(view, "utf-8")
+            view.release()
+            # Lone carriage returns are line endings as well
+            parts = line.split("\r") if "\r" in line else [line]
+            for part in parts:
+                part = part.strip()
+                if part or not skip_empty:
+                    ret.append(part)
+    return ret
+
+
+def sniff_delimiter(header: bytes, delimiters: Sequence[str]) -> str:
+    """
+    First of the delimiters splitting the header into more columns,
+    the last one if none does
+    """
+    text = header.decode("utf-8", errors="replace")
+    for delimiter in delimiters:
+        if len(text.split(delimiter)) > 1:
+            return delimiter
+    return delimiters[-1]
+
+
+@lru_cache(maxsize=None)
+def has_pyarrow() -> bool:
+    return find_spec("pyarrow") is not None
+
+
+def hex_columns(header: bytes, delimiter: str) -> List[str]:
+    """Names of the header columns which are not in NUMERIC_COLUMNS"""
+    text = header.decode("utf-8", errors="replace")
+    return [name for name in text.split(delimiter)
+            if name.strip() not in NUMERIC_COLUMNS]
+
+
+def read_csv(path: str, delimiters: Sequence[str] = (",", ";")) \
+        -> "pd.DataFrame":
+    """
+    Reads measurement CSV with header, the delimiter is sniffed from the
+    header, so that the file is read only once. With pyarrow installed, the
+    file is tokenized directly over its memory map, otherwise it is read
+    by pandas from the memory map. Both ways give the same frame, columns
+    other than NUMERIC_COLUMNS are strings and empty cells are missing.
+    """
+    import pandas as pd
+
+    with MappedFile(path) as f:
+        header = f.header()
+        delimiter = sniff_delimiter(header, delimiters)
+        strings = hex_columns(header, delimiter)
+        if len(f) > 0 and has_pyarrow():
+            return _read_arrow(f, delimiter, strings)
+
+    return pd.read_csv(path, header=0, delimiter=delimiter, memory_map=True,
+                       dtype={name: str for name in strings})
+
+
+def _read_arrow(f: MappedFile, delimiter: str,
+                strings: List[str]) -> "pd.DataFrame":
+    import pyarrow as pa
+    from pyarrow import csv
+
+    table = csv.read_csv(
+        pa.BufferReader(pa.py_buffer(f.view)),
+        parse_options=csv.ParseOptions(delimiter=delimiter),
+        convert_options=csv.ConvertOptions(
+            column_types={name: pa.string() for name in strings},
+            strings_can_be_null=True
+        )
+    )
+    return table.to_pandas()
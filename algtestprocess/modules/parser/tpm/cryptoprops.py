@@ -7,6 +7,15 @@ from algtestprocess.modules.data.tpm.profiles.cryptoprops import CryptoProps
 from algtestprocess.modules.data.tpm.results.cryptoprops import CryptoPropResult
 from algtestprocess.modules.parser.tpm.utils import parse_ek
 
+RSA_KEYGEN_FILES = [
+    ("rsa_1024", "Keygen:RSA_1024.csv"),
+    ("rsa_1024", "Keygen_RSA_1024.csv"),
+    ("rsa_2048", "Keygen:RSA_2048.csv"),
+    ("rsa_2048", "Keygen_RSA_2048.csv"),
+    ("rsa_2048", "Keygen:RSA_2048.csv"),
+    ("rsa_3072", "Keygen:RSA_3072.csv"),
+]
+
 
 class CryptoPropsParser:
     """
@@ -18,13 +27,7 @@ class CryptoPropsParser:
         assert os.path.exists(path) and os.path.isdir(path)
 
     def parse(self) -> Optional[CryptoProps]:
-        items = [
-            ("rsa_1024", "Keygen:RSA_1024.csv"),
-            ("rsa_1024", "Keygen_RSA_1024.csv"),
-            ("rsa_2048", "Keygen:RSA_2048.csv"),
-            ("rsa_2048", "Keygen_RSA_2048.csv"),
-            ("rsa_2048", "Keygen:RSA_2048.csv"),
-            ("rsa_3072", "Keygen:RSA_3072.csv"),
+        items = RSA_KEYGEN_FILES + [
             ("rsa_1024_rsassa", "Cryptoops_Sign:RSA_1024_0x0014.csv"),
             ("rsa_2048_rsassa", "Cryptoops_Sign:RSA_2048_0x0014.csv"),
             ("rsa_1024_rsapss", "Cryptoops_Sign:RSA_1024_0x0016.csv"),
@@ -1,3 +1,4 @@
+import os.path
 import re
 
 from algtestprocess.modules.config import TPM2Identifier
@@ -5,13 +6,12 @@ from algtestprocess.modules.data.tpm.profiles.performance import \
     ProfilePerformanceTPM
 from algtestprocess.modules.data.tpm.results.performance import \
     PerformanceResultTPM
+from algtestprocess.modules.parser.mmapfile import read_lines
 from algtestprocess.modules.parser.tpm.utils import get_params, to_int
 
 
 def get_data(path: str):
-    with open(path) as f:
-        data = f.readlines()
-    return list(map(lambda x: x.strip(), data)), f.name.rsplit("/", 1)[1]
+    return read_lines(path), os.path.basename(path)
 
 
 def get_algorithm(algorithm: str):
@@ -0,0 +1,110 @@
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from algtestprocess.modules.parser.tpm.cryptoprops import RSA_KEYGEN_FILES
+
+# Size of the part of keygen CSV read by a single task
+CHUNK_SIZE = 8 << 20
+
+RSAKey = Tuple[int, Optional[int], int]
+"""p, q (None if missing) and n"""
+
+KeyChunk = Tuple[str, int, int, str, Tuple[int, int, int]]
+"""path, start and end offset, delimiter and indices of p, q, n columns"""
+
+
+def keygen_files(measurement_path: str) -> List[Tuple[str, str]]:
+    """
+    RSA keygen CSVs of the measurement folder
+    :return: list of (algorithm, path), e.g. ("rsa_2048", ".../Keygen...csv")
+    """
+    found: Dict[str, str] = {}
+    for algorithm, filename in RSA_KEYGEN_FILES:
+        path = os.path.join(measurement_path, "detail", filename)
+        if path not in found and os.path.isfile(path):
+            found[path] = algorithm
+    return [(algorithm, path) for path, algorithm in found.items()]
+
+
+def parse_header(header: bytes) -> Tuple[str, List[str]]:
+    """
+    Splits the header line of keygen CSV, delimiters are tried in the same
+    way as by CryptoPropResult
+    :return: delimiter and column names
+    """
+    text = header.decode("utf-8", errors="replace").strip()
+    for delimiter in [",", ";"]:
+        columns = [x.strip() for x in text.split(delimiter)]
+        if len(columns) > 1:
+            break
+    return delimiter, columns
+
+
+def read_header(path: str) -> Optional[Tuple[int, str, Tuple[int, int, int]]]:
+    """
+    Reads the header of keygen CSV
+    :return: offset of the first row, delimiter and indices of p, q, n
+             columns or None if the file has no such columns
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+    delimiter, columns = parse_header(header)
+    if "p" not in columns or "n" not in columns:
+        return None
+    q = columns.index("q") if "q" in columns else -1
+    return len(header), delimiter, (columns.index("p"), q, columns.index("n"))
+
+
+def key_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> List[KeyChunk]:
+    """Splits the keygen CSV into byte ranges read independently"""
+    header = read_header(path)
+    if header is None:
+        return []
+    start, delimiter, columns = header
+    size = os.path.getsize(path)
+    return [
+        (path, offset, min(offset + chunk_size, size), delimiter, columns)
+        for offset in range(start, size, chunk_size)
+    ]
+
+
+def to_int(value: str) -> Optional[int]:
+    value = value.strip()
+    if not value or value.lower() == "nan":
+        return None
+    try:
+        return int(value, 16)
+    except ValueError:
+        return None
+
+
+def read_keys(
+        path: str,
+        start: int,
+        end: int,
+        delimiter: str,
+        columns: Tuple[int, int, int]
+) -> Iterator[RSAKey]:
+    """
+    Streams keys of rows starting within the byte range, rows without
+    p or n are skipped
+    """
+    p_idx, q_idx, n_idx = columns
+    last = max(columns)
+    with open(path, "rb") as f:
+        # The row crossing the start belongs to the previous range
+        f.seek(max(start - 1, 0))
+        if start > 0:
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            values = line.decode("utf-8", errors="replace").split(delimiter)
+            if len(values) <= last:
+                continue
+            p, n = to_int(values[p_idx]), to_int(values[n_idx])
+            if p is None or n is None:
+                continue
+            q = to_int(values[q_idx]) if q_idx >= 0 else None
+            yield p, q, n
@@ -5,14 +5,12 @@ from typing import List, Callable, Any, Optional
 from algtestprocess.modules.config import TPM2Identifier
 from algtestprocess.modules.data.tpm.profiles.support import ProfileSupportTPM
 from algtestprocess.modules.data.tpm.results.support import SupportResultTPM
+from algtestprocess.modules.parser.mmapfile import read_lines
 from algtestprocess.modules.parser.tpm.utils import get_params
 
 
 def get_data(path: str):
-    with open(path) as f:
-        data = f.readlines()
-    return list(filter(None, map(lambda x: x.strip(), data))), \
-        f.name.rsplit("/", 1)[1]
+    return read_lines(path, skip_empty=True), os.path.basename(path)
 
 
 def get_data_yaml(path: str):
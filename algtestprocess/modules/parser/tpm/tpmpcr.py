@@ -0,0 +1,293 @@
+import codecs
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from xml.etree import ElementTree as ET
+
+from algtestprocess.modules.scheduler import Scheduler, Task
+
+# Firmware versions of Intel TPMs reported wrongly by TPM-PCR
+FIRMWARE_ERRORS = {
+    "145.1.0.0": "401.1.0.0",
+    "146.1.0.0": "402.1.0.0",
+    "147.1.0.0": "403.1.0.0",
+    "46.12.0.0": "302.12.0.0",
+    "5.1058": "11.5.0.1058",
+    "6.1121": "11.6.0.1121",
+    "7.3290": "11.7.0.3290"
+}
+
+# Number of reports parsed by a single task of the scheduler
+REPORTS_PER_TASK = 256
+
+TPM_VERSION = re.compile(r"TPM-Version:(\d+\.\d+).*Revision:(\d+\.\d+)")
+
+# Bytes an XML report may start with, files starting otherwise are skipped
+# without being handed to the parser
+XML_SIGNATURES = (b"<", codecs.BOM_UTF8 + b"<",
+                  codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+# Elements of the report we need, parsing stops once all of them are read
+WANTED = {"EK", "RSK", "FirmwareVersion", "TPM"}
+
+TPMPCRReport = Dict[str, Optional[str]]
+"""
+{
+    "path": str,
+    "EK": str,
+    "RSK": str,
+    "firmware": str,
+    "TPM Version": Optional[str],
+    "TPM Revision": Optional[str]
+}
+"""
+
+
+def walk(current_dir, depth, predicate=None):
+    """
+    Tries to find all the paths for measurement folders
+
+    Sentinel of the recursion is finding a txt file
+
+    :param current_dir: the directory we process now
+    :return: list of paths to valid measurement folders
+    """
+    if predicate is None:
+        predicate = lambda x: x.is_file() and '.txt' in x.name
+
+    scan = list(os.scandir(current_dir))
+
+    if any([predicate(entry) for entry in scan]):
+        return [current_dir]
+
+    if depth <= 0:
+        return []
+
+    result = []
+    for entry in scan:
+        if entry.is_dir():
+            result += walk(entry.path, depth - 1)
+
+    return result
+
+
+def report_paths(tpm_pcr_path: str) -> Iterator[str]:
+    """Paths of all files in measurement folders of the TPM-PCR dump"""
+    for path in walk(tpm_pcr_path, 10):
+        for entry in os.scandir(path):
+            if entry.is_file():
+                yield entry.path
+
+
+def is_xml(path: str) -> bool:
+    """Checks the signature of the file, leading whitespace is allowed"""
+    with open(path, "rb") as f:
+        head = f.read(256)
+    return head.lstrip(b" \t\r\n").startswith(XML_SIGNATURES)
+
+
+def read_elements(path: str) -> Dict[str, Optional[str]]:
+    """
+    Streams the report until EK and RSK (children of the root) and first
+    FirmwareVersion and TPM elements (descendants of the root) are read
+    :return: tag -> text of found elements
+    """
+    found: Dict[str, Optional[str]] = {}
+    pending: Dict[str, ET.Element] = {}
+    depth = 0
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            tag = element.tag
+            # EK and RSK are looked up only among children of the root
+            if tag in WANTED and tag not in found and tag not in pending \
+                    and (depth == 2 or depth > 2 and tag not in {"EK", "RSK"}):
+                pending[tag] = element
+            continue
+
+        depth -= 1
+        tag = element.tag
+        if pending.get(tag) is element:
+            found[tag] = element.text
+            del pending[tag]
+            if len(found) == len(WANTED):
+                break
+        if depth == 1:
+            # Children of the root are not needed once read
+            element.clear()
+
+    return found
+
+
+def parse_report(path: str) -> Tuple[Optional[TPMPCRReport], List[str]]:
+    """
+    Reads EK, RSK and firmware of the TPM from the TPM-PCR XML report
+    :return: report or None if the file is not a report with EK,
+             messages about incomplete reports
+    """
+    messages = []
+    try:
+        if not is_xml(path):
+            return None, messages
+        found = read_elements(path)
+    except (ET.ParseError, OSError, UnicodeError):
+        return None, messages
+
+    # If there is no EK, we continue
+    if "EK" not in found:
+        return None, messages
+
+    # If there is EK, we assume there is RSK
+    if "RSK" not in found:
+        logging.error(f"parse_report: {path} has EK but no RSK")
+        return None, messages
+
+    # And there MUST be firmware version
+    fw = found.get("FirmwareVersion")
+    if fw is None:
+        messages.append(path)
+        return None, messages
+    fw = fw.replace('  ', ' ')
+
+    if 'INTC' in fw:
+        for err in FIRMWARE_ERRORS:
+            if err in fw:
+                fw = fw.replace(err, FIRMWARE_ERRORS[err])
+                break
+
+    tpm_version = None
+    tpm_revision = None
+    if "TPM" not in found:
+        messages.append(f"No <TPM> tag found {path}")
+    elif found["TPM"] is not None and \
+            (res := TPM_VERSION.search(found["TPM"])) is not None:
+        tpm_version = res.group(1)
+        tpm_revision = res.group(2)
+
+    return {
+        "path": path,
+        "EK": found["EK"],
+        "RSK": found["RSK"],
+        "firmware": fw,
+        "TPM Version": tpm_version,
+        "TPM Revision": tpm_revision,
+    }, messages
+
+
+def digest(key: Optional[str]) -> Optional[bytes]:
+    return hashlib.sha256(key.encode("utf-8")).digest() \
+        if key is not None else None
+
+
+def parse_reports(paths: List[str]) \
+        -> List[Tuple[Optional[TPMPCRReport], List[str]]]:
+    """
+    Parses the chunk of reports in a worker of the scheduler, reports with
+    keys already seen in the chunk are left out, as they are left out by
+    ingest_reports as well, so that less is sent back and journaled
+    :return: reports (None if not parsed) with messages of the parser
+    """
+    ret = []
+    seen: Dict[str, Tuple[Set[Optional[bytes]], Set[Optional[bytes]]]] = {}
+    for path in paths:
+        report, messages = parse_report(path)
+        if report is not None:
+            eks, rsks = seen.setdefault(report["firmware"], (set(), set()))
+            ek, rsk = digest(report["EK"]), digest(report["RSK"])
+            if ek in eks and rsk in rsks:
+                report = None
+            eks.add(ek)
+            rsks.add(rsk)
+        if report is not None or messages:
+            ret.append((report, messages))
+    return ret
+
+
+def ingest_reports(
+        reports: Iterable[Tuple[Optional[TPMPCRReport], List[str]]],
+        stats: Dict[str, dict]
+) -> Dict[str, dict]:
+    """
+    Collects unique EKs and RSKs per firmware from the parsed reports
+    :param reports: reports with messages of the parser in order of paths
+    :param stats: measurement statistics updated with TPM-PCR firmwares
+    :return: firmware -> TPM version, revision, EKs, RSKs and report paths
+    """
+    measurements = {}
+    # Digests of already included keys per firmware
+    seen: Dict[str, Tuple[Set[Optional[bytes]], Set[Optional[bytes]]]] = {}
+    for report, messages in reports:
+        for message in messages:
+            print(message)
+        if report is None:
+            continue
+
+        fw = report["firmware"]
+        tpm_version = report["TPM Version"]
+        tpm_revision = report["TPM Revision"]
+        stats.setdefault(fw, {
+            'tpm name': fw,
+            'tpm version': tpm_version,
+            'tpm revision': tpm_revision,
+            'tpm_pcr': True,
+            'tpm2-algtest': False
+        })
+        measurements.setdefault(fw, {
+            'TPM Version': tpm_version,
+            'TPM Revision': tpm_revision,
+            'EK': [],
+            'RSK': [],
+            'paths': []
+        })
+        eks, rsks = seen.setdefault(fw, (set(), set()))
+
+        ek, rsk = digest(report["EK"]), digest(report["RSK"])
+        if ek not in eks or rsk not in rsks:
+            eks.add(ek)
+            rsks.add(rsk)
+            measurements[fw]['EK'].append(report["EK"])
+            measurements[fw]['RSK'].append(report["RSK"])
+            measurements[fw]['paths'].append(report["path"])
+            stats[fw].setdefault('rsa eks', 0)
+            stats[fw].setdefault('rsa rsks', 0)
+            stats[fw]['rsa eks'] += 1
+            stats[fw]['rsa rsks'] += 1
+
+    return measurements
+
+
+def ingest_tpm_pcr(
+        tpm_pcr_path: str,
+        stats: Dict[str, dict],
+        scheduler: Optional[Scheduler] = None,
+        chunk_size: int = REPORTS_PER_TASK
+) -> Dict[str, dict]:
+    """
+    Collects unique EKs and RSKs per firmware from the TPM-PCR dump, the
+    reports are parsed in chunks by tasks of the scheduler, so that the
+    chunks are journaled, retried and quarantined as measurement folders
+    :param tpm_pcr_path: root of the dump
+    :param stats: measurement statistics updated with TPM-PCR firmwares
+    :param scheduler: scheduler running the tasks, sequential if not given
+    :param chunk_size: number of reports parsed by a single task
+    :return: firmware -> TPM version, revision, EKs, RSKs and report paths
+    """
+    paths = list(report_paths(tpm_pcr_path))
+    chunks = [paths[i:i + chunk_size]
+              for i in range(0, len(paths), chunk_size)]
+    tasks = [Task(f"tpm-pcr:{chunk[0]}", parse_reports, (chunk,),
+                  inputs=chunk)
+             for chunk in chunks]
+    results = (scheduler or Scheduler(progress=False)).run(tasks)
+
+    reports = []
+    for chunk, result in zip(chunks, results):
+        if not result.ok:
+            logging.error(f"ingest_tpm_pcr: reports from {chunk[0]} to "
+                          f"{chunk[-1]} failed, {result.error}")
+            continue
+        # Tuples are lists when resumed from the journal
+        reports += [(report, messages) for report, messages in result.result]
+    return ingest_reports(reports, stats)
@@ -0,0 +1,515 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, \
+    Sequence, Tuple
+
+DONE = "done"
+FAILED = "failed"
+# Worker of the task timed out, crashed or ran out of memory
+KILLED = "killed"
+RESUMED = "resumed"
+QUARANTINED = "quarantined"
+
+# Exit code of the worker which exceeded its memory limit
+OUT_OF_MEMORY_EXIT = 86
+
+
+def inputs_digest(paths: Iterable[str]) -> str:
+    """
+    Cheap digest of input files and directories (recursively) given by
+    their paths, sizes and modification times
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        for root, dirs, files in os.walk(path) if os.path.isdir(path) \
+                else [(os.path.dirname(path), [], [os.path.basename(path)])]:
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                h.update(
+                    f"{file_path}\0{stat.st_size}\0{stat.st_mtime_ns}\0"
+                    .encode("utf-8", errors="surrogateescape"))
+    return h.hexdigest()
+
+
+class Task:
+    """
+    Unit of work of the scheduler, typically an operation applied to one
+    measurement folder
+
+    The operation has to be a module level function, so that it can be
+    sent to worker processes, and its result has to be json serializable,
+    so that it can be journaled.
+    """
+
+    def __init__(
+            self,
+            key: str,
+            operation: Callable[..., Any],
+            args: Sequence[Any] = (),
+            inputs: Iterable[str] = (),
+            outputs: Iterable[str] = (),
+            params: Sequence[Any] = ()
+    ):
+        """
+        :param key: identifier of the task unique within the journal,
+               e.g. "summary:<measurement folder>"
+        :param operation: function called with args in the worker
+        :param inputs: files and folders the task reads
+        :param outputs: files the task may write
+        :param params: parameters which change the result apart from inputs
+        """
+        self.key = key
+        self.operation = operation
+        self.args = tuple(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = tuple(params)
+        self._inputs_digest: Optional[str] = None
+        self._digest: Optional[str] = None
+
+    @property
+    def inputs_digest(self) -> str:
+        """Digest of the input files only"""
+        if self._inputs_digest is None:
+            self._inputs_digest = inputs_digest(self.inputs)
+        return self._inputs_digest
+
+    @property
+    def digest(self) -> str:
+        """Digest of the input files together with parameters of the task"""
+        if self._digest is None:
+            serialized = json.dumps([self.inputs_digest, self.key, self.params],
+                                    sort_keys=True, default=str)
+            self._digest = hashlib.sha256(
+                serialized.encode("utf-8")).hexdigest()
+        return self._digest
+
+
+class TaskResult:
+    def __init__(self, key: str, status: str, result: Any = None,
+                 error: Optional[str] = None, attempts: int = 0):
+        self.key = key
+        self.status = status
+        self.result = result
+        self.error = error
+        self.attempts = attempts
+
+    @property
+    def ok(self) -> bool:
+        return self.status in {DONE, RESUMED}
+
+
+class Journal:
+    """
+    Append-only json lines log of finished tasks
+
+    Tasks recorded as done with the same digest of inputs, whose produced
+    outputs still exist, are not run again when resuming.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if resume and os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line of interrupted run may be incomplete
+                        continue
+                    self.records[record["key"]] = record
+        elif os.path.exists(path):
+            os.remove(path)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a")
+
+    def close(self):
+        self._file.close()
+
+    def completed(self, task: Task) -> Optional[Dict[str, Any]]:
+        """Record of the task if it is done and up to date"""
+        record = self.records.get(task.key)
+        if record is None or record["status"] != DONE \
+                or record["digest"] != task.digest:
+            return None
+        if not all(os.path.exists(x) for x in record.get("outputs", [])):
+            return None
+        return record
+
+    def append(self, task: Task, result: TaskResult):
+        record = {
+            "key": task.key,
+            "digest": task.digest,
+            "status": result.status,
+            "attempts": result.attempts,
+            "error": result.error,
+            "result": result.result,
+            "outputs": [x for x in task.outputs if os.path.exists(x)],
+            "time": time.time(),
+        }
+        self.records[task.key] = record
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+
+
+def is_larger(limit: Optional[float], recorded: Optional[float]) -> bool:
+    """Compares limits, None is unlimited and so larger than any limit"""
+    if recorded is None:
+        return False
+    return limit is None or limit > recorded
+
+
+class Quarantine:
+    """
+    Persisted list of tasks whose worker timed out, crashed or ran out
+    of memory, together with the reasons
+
+    Quarantined tasks are skipped until their input files change or they
+    are run with a larger timeout or memory limit than they were killed
+    under, so that a single broken measurement does not stall every
+    following run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.records = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                logging.warning(
+                    f"Quarantine: could not load {self.path}, starting empty")
+
+    def get(self, task: Task, timeout: Optional[float] = None,
+            memory_limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Record of the task if it is quarantined, did not change and the
+        limits are not larger than those it was quarantined under
+        :param timeout: current timeout in seconds, None if unlimited
+        :param memory_limit: current memory limit in bytes, None if unlimited
+        """
+        record = self.records.get(task.key)
+        if record is None or record["digest"] != task.inputs_digest:
+            return None
+        if is_larger(timeout, record.get("timeout")) \
+                or is_larger(memory_limit, record.get("memory_limit")):
+            return None
+        return record
+
+    def add(self, task: Task, reason: str, timeout: Optional[float] = None,
+            memory_limit: Optional[int] = None):
+        """
+        :param timeout: timeout the task was killed under, None if unlimited
+        :param memory_limit: memory limit the task was killed under in bytes,
+               None if unlimited
+        """
+        self.records[task.key] = {
+            "digest": task.inputs_digest,
+            "reason": reason,
+            "timeout": timeout,
+            "memory_limit": memory_limit,
+            "time": time.time(),
+        }
+        self.save()
+
+    def remove(self, task: Task):
+        if self.records.pop(task.key, None) is not None:
+            self.save()
+
+    def release_all(self):
+        """Releases all tasks, so that they are run again"""
+        self.records = {}
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.records, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    """Reports finished tasks on standard error"""
+
+    def __init__(self, name: str, total: int, enabled: bool = True):
+        self.name = name
+        self.total = total
+        self.enabled = enabled
+        self.finished = 0
+        self.failed = 0
+        self.start = time.monotonic()
+
+    def update(self, result: TaskResult):
+        self.finished += 1
+        self.failed += not result.ok
+        logging.info(f"{self.name}: {result.key} {result.status} "
+                     f"after {result.attempts} attempts {result.error or ''}")
+        if not self.enabled:
+            return
+        elapsed = time.monotonic() - self.start
+        eta = elapsed / self.finished * (self.total - self.finished)
+        sys.stderr.write(
+            f"\r{self.name}: {self.finished}/{self.total} tasks, "
+            f"{self.failed} failed, {elapsed:.0f}s elapsed, "
+            f"~{eta:.0f}s left")
+        if self.finished == self.total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+
+def limit_memory(memory_limit: int):
+    """Limits the address space of the current process in bytes"""
+    try:
+        import resource
+    except ImportError:
+        logging.warning("limit_memory: memory limits are not supported")
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _work(connection, memory_limit: Optional[int] = None):
+    """Loop of the worker process, runs tasks sent by the scheduler"""
+    if memory_limit:
+        limit_memory(memory_limit)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        operation, args = message
+        try:
+            reply = (DONE, operation(*args), None)
+        except MemoryError:
+            # State of the process is not reliable anymore, the scheduler
+            # replaces it by a new one
+            os._exit(OUT_OF_MEMORY_EXIT)
+        except Exception as e:
+            logging.exception(f"_work: {operation.__name__} failed")
+            reply = (FAILED, None, f"{type(e).__name__}: {e}")
+        try:
+            connection.send(reply)
+        except (TypeError, ValueError, AttributeError) as e:
+            connection.send((FAILED, None, f"unpicklable result: {e}"))
+
+
+class Worker:
+    """Persistent worker process running one task at a time"""
+
+    def __init__(self, memory_limit: Optional[int] = None):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_work, args=(child, memory_limit), daemon=True)
+        self.process.start()
+        child.close()
+        self.task: Optional[Task] = None
+        self.attempt = 0
+        self.deadline: Optional[float] = None
+
+    def submit(self, task: Task, attempt: int, timeout: Optional[float]):
+        self.task = task
+        self.attempt = attempt
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.connection.send((task.operation, task.args))
+
+    def release(self):
+        self.task = None
+        self.deadline = None
+
+    def exit_reason(self) -> str:
+        if self.process.exitcode == OUT_OF_MEMORY_EXIT:
+            return "exceeded memory limit"
+        return f"worker crashed with exit code {self.process.exitcode}"
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class Scheduler:
+    """
+    Runs tasks in a pool of persistent worker processes
+
+    Failed tasks are retried, tasks running longer than the timeout are
+    killed together with their worker, which is replaced by a new one.
+    With a journal, finished tasks are recorded as soon as they finish,
+    so that an interrupted run can be resumed without repeating them.
+    With a quarantine, tasks whose worker was killed in the last attempt
+    are recorded and skipped by following runs until their inputs change.
+    """
+
+    def __init__(
+            self,
+            jobs: int = 1,
+            retries: int = 0,
+            timeout: Optional[float] = None,
+            journal: Optional[Journal] = None,
+            progress: bool = True,
+            name: str = "scheduler",
+            memory_limit: Optional[int] = None,
+            quarantine: Optional[Quarantine] = None
+    ):
+        """
+        :param jobs: number of worker processes
+        :param retries: number of times a failed task is run again
+        :param timeout: wall-clock limit of single attempt in seconds
+        :param journal: journal of finished tasks, resumes from its records
+        :param progress: report progress on standard error
+        :param name: name of the run used in progress and logs
+        :param memory_limit: address space limit of each worker in bytes
+        :param quarantine: tasks to be skipped, killed tasks are added to it
+        """
+        self.jobs = max(1, jobs)
+        self.retries = retries
+        self.timeout = timeout
+        self.journal = journal
+        self.progress = progress
+        self.name = name
+        self.memory_limit = memory_limit
+        self.quarantine = quarantine
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def run(self, tasks: List[Task]) -> List[TaskResult]:
+        """
+        Runs the tasks, tasks completed in the journal or quarantined
+        are not run again
+        :return: results in order of the tasks
+        """
+        results: Dict[str, TaskResult] = {}
+        progress = Progress(self.name, len(tasks), self.progress)
+
+        pending: Deque[Tuple[Task, int]] = deque()
+        for task in tasks:
+            record = self.journal.completed(task) if self.journal else None
+            quarantined = self.quarantine.get(
+                task, self.timeout, self.memory_limit) if self.quarantine \
+                else None
+            if record is not None:
+                results[task.key] = TaskResult(
+                    task.key, RESUMED, record["result"],
+                    attempts=record["attempts"])
+                progress.update(results[task.key])
+            elif quarantined is not None:
+                logging.warning(
+                    f"{self.name}: skipping quarantined {task.key}, "
+                    f"{quarantined['reason']}")
+                results[task.key] = TaskResult(
+                    task.key, QUARANTINED,
+                    error=f"quarantined, {quarantined['reason']}")
+                progress.update(results[task.key])
+            else:
+                pending.append((task, 1))
+
+        workers: List[Worker] = []
+        try:
+            while pending or any(w.task is not None for w in workers):
+                # Assign tasks to idle workers, spawning them as needed
+                while pending:
+                    worker = next((w for w in workers if w.task is None), None)
+                    if worker is None:
+                        if len(workers) >= self.jobs:
+                            break
+                        worker = Worker(self.memory_limit)
+                        workers.append(worker)
+                    task, attempt = pending.popleft()
+                    worker.submit(task, attempt, self.timeout)
+
+                busy = [w for w in workers if w.task is not None]
+                deadlines = [w.deadline for w in busy if w.deadline]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) \
+                    if deadlines else None
+                ready = wait([w.connection for w in busy], timeout)
+
+                for worker in busy:
+                    task, attempt = worker.task, worker.attempt
+                    if worker.connection in ready:
+                        try:
+                            status, result, error = worker.connection.recv()
+                        except (EOFError, OSError):
+                            self._replace(workers, worker)
+                            status, result = KILLED, None
+                            error = worker.exit_reason()
+                    elif worker.deadline and \
+                            time.monotonic() >= worker.deadline:
+                        status, result = KILLED, None
+                        error = f"timed out after {self.timeout}s"
+                        self._replace(workers, worker)
+                    else:
+                        continue
+
+                    worker.release()
+                    if status != DONE and attempt <= self.retries:
+                        logging.warning(
+                            f"{self.name}: {task.key} attempt {attempt} "
+                            f"failed, {error}, retrying")
+                        pending.append((task, attempt + 1))
+                        continue
+
+                    results[task.key] = TaskResult(task.key, status, result,
+                                                   error, attempt)
+                    if self.quarantine is not None and status == KILLED:
+                        logging.error(
+                            f"{self.name}: quarantining {task.key}, {error}")
+                        self.quarantine.add(task, error, self.timeout,
+                                            self.memory_limit)
+                    elif self.quarantine is not None and status == DONE:
+                        self.quarantine.remove(task)
+                    if self.journal is not None:
+                        self.journal.append(task, results[task.key])
+                    progress.update(results[task.key])
+        finally:
+            for worker in workers:
+                if worker.task is not None:
+                    worker.kill()
+                else:
+                    worker.stop()
+
+        return [results[task.key] for task in tasks]
+
+    @staticmethod
+    def _replace(workers: List[Worker], worker: Worker):
+        """Kills the worker, a new one is spawned when there is a task"""
+        worker.kill()
+        workers.remove(worker)
@@ -110,7 +110,7 @@ def format_pgp_key(key):
     """
     if key is None:
         return None
-    if isinstance(key, (int, long)):
+    if isinstance(key, int):
         return '%016x' % key
     elif isinstance(key, list):
         return [format_pgp_key(x) for x in key]
@@ -312,7 +312,7 @@ def to_string(x):
     """
     if isinstance(x, bytes):
         return x.decode('utf-8')
-    if isinstance(x, basestring):
+    if isinstance(x, str):
         return x
 
 
@@ -324,7 +324,7 @@ def to_bytes(x):
     """
     if isinstance(x, bytes):
         return x
-    if isinstance(x, basestring):
+    if isinstance(x, str):
         return x.encode('utf-8')
 
 
@@ -1760,7 +1760,7 @@ class RocaFingerprinter(object):
         :param sub_idx:
         :return:
         """
-        if isinstance(data, (int, long)):
+        if isinstance(data, int):
             js = collections.OrderedDict()
             js['type'] = 'js-mod-num'
             js['fname'] = name
@@ -1777,7 +1777,7 @@ class RocaFingerprinter(object):
 
             return TestResult(js)
 
-        self.process_mod_line(data, name, idx, aux={'stype': 'json', 'sub_idx': sub_idx})
+        return self.process_mod_line(to_bytes(data), name, idx, aux={'stype': 'json', 'sub_idx': sub_idx})
 
     def process_js_certs(self, data, name, idx, sub_idx):
         """
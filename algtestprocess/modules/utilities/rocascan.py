@@ -0,0 +1,330 @@
+import io
+import json
+import logging
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree as ET
+
+from algtestprocess.modules.data.tpm.keystore import split_key
+from algtestprocess.modules.parser.tpm.rsakeys import parse_header
+from algtestprocess.modules.parser.tpm.tpmpcr import XML_SIGNATURES, \
+    read_elements
+
+PEM = "pem"
+DER = "der"
+PGP = "pgp"
+SSH = "ssh"
+JSON = "json"
+APK = "apk"
+MOD_HEX = "mod-hex"
+MOD_DEC = "mod-dec"
+MOD_BASE64 = "mod-base64"
+LDIFF = "ldiff"
+JKS = "jks"
+PKCS7 = "pkcs7"
+TPM_PCR = "tpm-pcr"
+KEYGEN = "keygen"
+FORMATS = [PEM, DER, PGP, SSH, JSON, APK, MOD_HEX, MOD_DEC, MOD_BASE64,
+           LDIFF, JKS, PKCS7, TPM_PCR, KEYGEN]
+
+# Formats with one record per line, these are streamed line by line
+LINE_FORMATS = {SSH: "process_ssh_line", JSON: "process_json_line"}
+# Single modulus per line, the number type is sniffed from the first line,
+# so that each modulus is tested only once
+MOD_FORMATS = {MOD_HEX: "hex", MOD_DEC: "dec", MOD_BASE64: "base64"}
+# Formats parsed from the whole content by RocaFingerprinter
+WHOLE_FORMATS = {PEM: "process_pem", DER: "process_der", PGP: "process_pgp",
+                 APK: "process_apk", LDIFF: "process_ldiff",
+                 JKS: "process_jks", PKCS7: "process_pkcs7"}
+
+# Number of bytes the format is sniffed from
+HEAD_SIZE = 4096
+
+# Files larger than this are memory-mapped instead of read
+MMAP_THRESHOLD = 1 << 20
+
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz")
+
+# Single modulus per line as decimal, hex or base64 number, short lines
+# are left out as they are mostly plain words or small numbers
+MODULUS_LINES = [
+    (MOD_DEC, re.compile(rb"[0-9]{40,}")),
+    (MOD_HEX, re.compile(rb"(0x)?[a-fA-F0-9]{40,}")),
+    (MOD_BASE64, re.compile(rb"[a-zA-Z0-9+/]{40,}={0,2}")),
+]
+
+# Java KeyStore and JCE KeyStore
+JKS_SIGNATURES = (b"\xfe\xed\xfe\xed", b"\xce\xce\xce\xce")
+
+ScanResult = Tuple[str, Optional[str], List[str], int, int]
+"""path, sniffed format, JSON lines of results, tested and found keys"""
+
+
+def has_extension(name: str, extensions: Iterable[str]) -> bool:
+    name = name.lower()
+    return any(name.endswith(f".{ext}") for ext in extensions)
+
+
+def sniff(head: bytes, name: str) -> Optional[str]:
+    """
+    Detects the format from the first bytes of the file,
+    the extension is used only where the magic is shared by more formats
+    :param head: first HEAD_SIZE bytes of the file
+    :param name: name of the file
+    :return: one of FORMATS or None if the file should be skipped
+    """
+    if head.startswith(JKS_SIGNATURES) or has_extension(name, ["bks"]):
+        return JKS
+    if head.startswith(b"PK\x03\x04"):
+        return APK if has_extension(name, ["apk"]) else None
+
+    text = head.lstrip(b" \t\r\n")
+    if text.startswith(b"-----BEGIN PGP"):
+        return PGP
+    if text.startswith(b"-----BEGIN PKCS7"):
+        return PKCS7
+    if text.startswith(b"-----BEGIN"):
+        return PEM
+    if text.startswith(b"ssh-rsa") or b"\nssh-rsa " in text:
+        return SSH
+    if text.startswith((b"{", b"[")):
+        return JSON
+    if text.startswith(XML_SIGNATURES):
+        # Reports without EK are left out by the parser
+        return TPM_PCR
+    if b"binary::" in head:
+        return LDIFF
+
+    # ASN.1 SEQUENCE with long form length
+    if len(head) > 1 and head[0] == 0x30 and 0x81 <= head[1] <= 0x84:
+        return PKCS7 if has_extension(name, ["pkcs7", "p7s", "p7", "p7b"]) \
+            else DER
+    # OpenPGP packet header of public key or signature
+    if head and head[0] & 0x80 and has_extension(
+            name, ["pgp", "gpg", "key", "pub", "asc"]):
+        return PGP
+
+    line = text.split(b"\n", 1)[0].strip()
+    # Keygen CSV of tpm2-algtest, e.g. id;p;q;n;e
+    if "n" in parse_header(line)[1]:
+        return KEYGEN
+    for fmt, regex in MODULUS_LINES:
+        if regex.fullmatch(line):
+            return fmt
+    return None
+
+
+@lru_cache(maxsize=None)
+def roca_fingerprinter(old: bool = False):
+    """Fingerprinter of the process, created once per process and method"""
+    import algtestprocess.modules.utilities.roca as roca
+
+    app = roca.RocaFingerprinter()
+    app.switch_fingerprint_method(old)
+    return app
+
+
+def lines(source) -> Iterator[bytes]:
+    """Lines of the file like object (or mmap) without copying it whole"""
+    for line in iter(source.readline, b""):
+        yield line.strip()
+
+
+def process_tpm_pcr(app, source, name: str) -> list:
+    """
+    Tests EK and RSK of TPM-PCR XML report, only whole moduli are tested,
+    keys given by prefix and suffix are skipped
+    :param source: path or file like object of the report
+    """
+    try:
+        found = read_elements(source)
+    except (ET.ParseError, UnicodeError) as e:
+        logging.debug(f"process_tpm_pcr: could not parse {name=}, {e}")
+        return []
+
+    ret = []
+    for idx, tag in enumerate(["EK", "RSK"]):
+        material = split_key(found.get(tag) or "")
+        if material is None or material[1] is not None:
+            continue
+        ret.append(app.process_mod_line_num(
+            material[0], name, idx, "hex", aux={"subtype": TPM_PCR, "key": tag}
+        ))
+    return ret
+
+
+def process_keygen(app, source, name: str) -> Iterator:
+    """Tests moduli of the n column of tpm2-algtest keygen CSV"""
+    rows = lines(source)
+    delimiter, columns = parse_header(next(rows, b""))
+    n_idx = columns.index("n")
+    delimiter = delimiter.encode("utf-8")
+    for idx, line in enumerate(rows):
+        values = line.split(delimiter)
+        if len(values) <= n_idx:
+            continue
+        n = values[n_idx].strip()
+        if not n or n.lower() == b"nan":
+            continue
+        yield app.process_mod_line_num(n, name, idx, "hex",
+                                       aux={"subtype": KEYGEN})
+
+
+def process(app, fmt: str, data, name: str) -> Iterator:
+    """
+    Runs the parser of the format, line formats are tested line by line
+    as the results are consumed
+    :param data: bytes, mmap or path (TPM-PCR only) of the file
+    """
+    if fmt == TPM_PCR:
+        if not isinstance(data, str):
+            data = io.BytesIO(data if isinstance(data, bytes) else data[:])
+        yield from process_tpm_pcr(app, data, name)
+        return
+
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    if fmt == KEYGEN:
+        yield from process_keygen(app, source, name)
+    elif fmt in MOD_FORMATS:
+        for idx, line in enumerate(lines(source)):
+            if line:
+                yield app.process_mod_line_num(line, name, idx,
+                                               MOD_FORMATS[fmt])
+    elif fmt in LINE_FORMATS:
+        process_line = getattr(app, LINE_FORMATS[fmt])
+        for idx, line in enumerate(lines(source)):
+            yield process_line(line, name, idx)
+    else:
+        yield getattr(app, WHOLE_FORMATS[fmt])(bytes(data), name)
+
+
+def to_lines(results: Iterable, fmt: str, marked_only: bool) \
+        -> Iterator[str]:
+    """Serializes the test results into JSON lines one by one"""
+    import algtestprocess.modules.utilities.roca as roca
+
+    for result in roca.flatten(results):
+        if not isinstance(result, roca.TestResult):
+            continue
+        if marked_only and not result.marked:
+            continue
+        record = result.to_json()
+        record["format"] = fmt
+        for key, value in record.items():
+            if isinstance(value, bytes):
+                record[key] = value.decode("utf-8", errors="replace")
+        yield json.dumps(record, cls=roca.AutoJSONEncoder)
+
+
+def scan_data(app, data: bytes, name: str, marked_only: bool) \
+        -> Tuple[Optional[str], List[str]]:
+    fmt = sniff(data[:HEAD_SIZE], name)
+    if fmt is None:
+        return None, []
+    return fmt, list(to_lines(process(app, fmt, data, name), fmt,
+                              marked_only))
+
+
+def scan_tar(app, path: str, marked_only: bool) -> List[str]:
+    """Scans members of the archive, each one is sniffed on its own"""
+    import tarfile
+
+    ret = []
+    with tarfile.open(path) as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            data = tar.extractfile(member).read()
+            _, sub = scan_data(app, data, f"{path}:{member.name}", marked_only)
+            ret += sub
+    return ret
+
+
+def scan_file(path: str, old: bool = False, marked_only: bool = True) \
+        -> ScanResult:
+    """
+    Tests keys found in the file for ROCA fingerprint
+    :param path: path to the file
+    :param old: use the fingerprinting by moduli instead of discrete log
+    :param marked_only: keep only the keys with fingerprint
+    :return: see ScanResult
+    """
+    app = roca_fingerprinter(old)
+    tested, found = app.tested, app.found
+    fmt = None
+    results: List[str] = []
+    try:
+        if has_extension(path, [ext[1:] for ext in TAR_EXTENSIONS]):
+            fmt, results = "tar", scan_tar(app, path, marked_only)
+        else:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return path, None, [], 0, 0
+                if size < MMAP_THRESHOLD:
+                    fmt, results = scan_data(app, f.read(), path, marked_only)
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                            as mm:
+                        fmt = sniff(mm[:HEAD_SIZE], path)
+                        if fmt is not None:
+                            results = list(to_lines(
+                                process(app, fmt,
+                                        path if fmt == TPM_PCR else mm, path),
+                                fmt, marked_only
+                            ))
+    except Exception as e:
+        logging.error(f"scan_file: could not scan {path=}, {e}")
+    return path, fmt, results, app.tested - tested, app.found - found
+
+
+def _scan_file(args: Tuple[str, bool, bool]) -> ScanResult:
+    return scan_file(*args)
+
+
+def walk_files(path: str) -> Iterator[str]:
+    """Files of the directory tree, symbolic links to directories are not
+    followed"""
+    if not os.path.isdir(path):
+        yield path
+        return
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in sorted(it, key=lambda x: x.name):
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                yield entry.path
+    for subdir in subdirs:
+        yield from walk_files(subdir)
+
+
+def roca_scan(
+        paths: Iterable[str],
+        jobs: int = 1,
+        old: bool = False,
+        marked_only: bool = True
+) -> Iterator[ScanResult]:
+    """
+    Scans files and directory trees for keys with ROCA fingerprint
+    :param paths: files, archives or directories searched recursively
+    :param jobs: number of processes scanning the files
+    :param old: use the fingerprinting by moduli instead of discrete log
+    :param marked_only: report only the keys with fingerprint
+    :return: results per file in order of the walk as they are finished
+    """
+    tasks = [(file_path, old, marked_only)
+             for path in paths for file_path in walk_files(path)]
+    if jobs <= 1 or len(tasks) <= 1:
+        yield from map(_scan_file, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(
+            _scan_file, tasks,
+            chunksize=max(1, min(64, len(tasks) // (4 * jobs)))
+        )
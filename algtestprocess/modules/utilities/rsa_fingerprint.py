@@ -3,7 +3,15 @@ Functions to obtain 5p_5q_blum_mod_roca fingerprint from https://crocs.fi.muni.c
 Use RSAFingerprint to obtain fingerprint for single key
 Use RSAFingerprintSet to obtain fingerprint and aggregated results for list with multiple keys
 """
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import gcd
+
 import algtestprocess.modules.utilities.roca as roca
+from algtestprocess.modules.parser.tpm.rsakeys import CHUNK_SIZE, \
+    key_chunks, keygen_files, read_keys
+
 app = roca.RocaFingerprinter()
 
 
@@ -39,68 +47,255 @@ def is_decreased_number_divisible_range(num, factor_range):
     return False
 
 
+def odd_primes_product(limit):
+    sieve = bytearray([1]) * (limit + 1)
+    product = 1
+    for i in range(3, limit + 1, 2):
+        if sieve[i]:
+            product *= i
+            sieve[i * i::2 * i] = bytearray(len(sieve[i * i::2 * i]))
+    return product
+
+
+RANGE_LIMITS = [5, 251, 17863]
+# p - 1 is even, so it is divisible by some factor between 3 and the limit
+# exactly when it is divisible by 4 or by an odd prime up to the limit
+RANGE_PRODUCTS = [odd_primes_product(limit) for limit in RANGE_LIMITS]
+
+
 def is_decreased_number_divisible(number):
-    ranges = [5, 251, 17863]
-    for range_limit in ranges:
-        if is_decreased_number_divisible_range(number, range(3, range_limit + 1)):
+    decreased_num = number - 1
+    if decreased_num % 4 == 0:
+        return RANGE_LIMITS[0]
+    for range_limit, product in zip(RANGE_LIMITS, RANGE_PRODUCTS):
+        if gcd(decreased_num, product) > 1:
             return range_limit
 
     return -1
 
 
+def fingerprint_features(p, q, n):
+    """
+    Computes 5p_5q_blum_mod_roca features of single key
+    :param p: prime p
+    :param q: prime q, recomputed from n and p if None
+    :param n: modulus
+    :return: msb5_p, msb5_q, msb8_n, second_lsb_p, second_lsb_q, second_lsb_n,
+             small_divisors_p, small_divisors_q, is_roca, is_blum
+    """
+    if q is None:
+        q = n // p
+    msb5_p, second_lsb_p = extract_bits5(p)
+    msb5_q, second_lsb_q = extract_bits5(q)
+    msb8_n, second_lsb_n = extract_bits8(n)
+    return (
+        msb5_p, msb5_q, msb8_n, second_lsb_p, second_lsb_q, second_lsb_n,
+        is_decreased_number_divisible(p), is_decreased_number_divisible(q),
+        app.has_fingerprint_moduli(n),
+        # Blum integer is product of primes congruent to 3 modulo 4
+        second_lsb_p == 1 and second_lsb_q == 1
+    )
+
+
+# Features the keys are counted by in fingerprint tables
+BUCKET_COLUMNS = ["msb5_p", "msb5_q", "blum", "small_divisors_p",
+                  "small_divisors_q", "roca"]
+
+
+def count_buckets(keys, recompute_q=True):
+    """
+    Counts keys per fingerprint bucket
+    :param keys: iterable of (p, q, n), q may be None
+    :param recompute_q: compute q from n and p even if it is present
+    :return: Counter of BUCKET_COLUMNS values
+    """
+    fingerprints = RSAFingerprintSet(keys, recompute_q=recompute_q,
+                                     keep_keys=False)
+    fingerprints.compute_fingerprint()
+    return Counter(fingerprints.histogram(BUCKET_COLUMNS))
+
+
+def _count_chunk(args):
+    group, algorithm, chunk, recompute_q = args
+    return group, algorithm, count_buckets(read_keys(*chunk), recompute_q)
+
+
+def fingerprint_counts(groups, jobs=1, recompute_q=True,
+                       chunk_size=CHUNK_SIZE):
+    """
+    Counts RSA keys of measurements per group, algorithm and fingerprint
+    bucket, keygen CSVs are streamed in chunks so that only counts and a
+    chunk of keys per process are held in memory
+    :param groups: group (e.g. firmware) -> measurement folders
+    :param jobs: number of processes computing the features
+    :param recompute_q: compute q from n and p even if it is present
+    :param chunk_size: number of bytes of CSV processed by single task
+    :return: (group, algorithm) -> Counter of BUCKET_COLUMNS values
+    """
+    tasks = [
+        (group, algorithm, chunk, recompute_q)
+        for group, folders in groups.items()
+        for folder in folders
+        for algorithm, path in keygen_files(folder)
+        for chunk in key_chunks(path, chunk_size)
+    ]
+    if jobs <= 1 or len(tasks) <= 1:
+        results = map(_count_chunk, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(_count_chunk, tasks)
+
+    counts = {}
+    try:
+        for group, algorithm, chunk_counts in results:
+            counts.setdefault((group, algorithm), Counter()).update(
+                chunk_counts)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return counts
+
+
+# Features of fingerprint_features and their compact array types
+FEATURE_COLUMNS = ["msb5_p", "msb5_q", "msb8_n", "second_lsb_p", "second_lsb_q",
+                   "second_lsb_n", "small_divisors_p", "small_divisors_q",
+                   "roca", "blum"]
+FEATURE_TYPECODES = ["B", "B", "B", "B", "B", "B", "h", "h", "B", "B"]
+FEATURE_DTYPES = ["uint8", "uint8", "uint8", "bool", "bool", "bool", "int16",
+                  "int16", "bool", "bool"]
+
+
+def to_number(value):
+    """Key material given as int or hex string"""
+    return value if isinstance(value, int) else int(value, 16)
+
+
 class RSAFingerprintSet:
     """
     The class accepts list of RSA keys given by primes p, q and modulus n.
     A after running compute_fingerprint() method, aggregate RSA fingerprint results are computed for the whole set
+
+    Features of keys are stored in NumPy arrays (see FEATURE_COLUMNS), one
+    item per key, so millions of keys fit in few megabytes when the key
+    material is dropped (keep_keys=False).
     """
-    pqn_list = []
-    pqn_fingerprints = []
-    is_blum = True  # True if all keys are in the form of Blum prime, False if at least one key is not Blum prime
-    at_least_one_roca_fingerprint = False   # by default False, True if at least one key is with ROCA fingerprint
-    avoid_factors_max = -1  # -1 if no avoidance of small factors in p-1/q-1, 5/251/17863 if no small factors below given limit are factors
 
-    def __init__(self, pqn: list, recompute_q=True):
+    def __init__(self, pqn, recompute_q=True, keep_keys=True):
+        """
+        :param pqn: iterable of (p, q, n) as hex strings or ints,
+                    q may be None, then it is recomputed
+        :param recompute_q: compute q from n and p even if it is present
+        :param keep_keys: keep pqn after the features are computed
+        """
         self.pqn_list = pqn
-        self.pqn_fingerprints = []
+        self.features = {}
         self.is_blum = True  # True if all keys are in the form of Blum prime, False if at least one key is not Blum prime
         self.at_least_one_roca_fingerprint = False  # by default False, True if at least one key is with ROCA fingerprint
         self.avoid_factors_max = -1  # -1 if no avoidance of small factors in p-1/q-1, 5/251/17863 if no small factors below given limit are factors
         self.recompute_q = recompute_q
+        self.keep_keys = keep_keys
+
+    @staticmethod
+    def from_result(result, recompute_q=True, keep_keys=True):
+        """
+        Fingerprint set of keys of CryptoPropResult, the decoded columns of
+        the result are reused, rows without p, q or n are left out
+        """
+        p, q, n = result.columns(["p", "q", "n"])
+        if recompute_q:
+            q = result.recomputed_q()
+        pqn = [(x, y, z) for x, y, z in zip(p.ints, q.ints, n.ints)
+               if x is not None and y is not None and z is not None]
+        return RSAFingerprintSet(pqn, recompute_q=False, keep_keys=keep_keys)
 
     def compute_fingerprint(self):
-        never_below_17863 = True
-        never_below_251 = True
-        never_below_5 = True
-        for item in self.pqn_list:
-            p, q, n = item
-            fingerprint = RSAFingerprint(p, q, n, recompute_q=self.recompute_q)
-            fingerprint.compute_fingerprint()
-            self.pqn_fingerprints.append(fingerprint)
+        import numpy as np
 
-            if fingerprint.small_divisors_p == 17863 or fingerprint.small_divisors_q == 17863:
-                never_below_17863 = False
-            if fingerprint.small_divisors_p == 251 or fingerprint.small_divisors_q == 251:
-                never_below_251 = False
-            if fingerprint.small_divisors_p == 5 or fingerprint.small_divisors_q == 5:
-                never_below_5 = False
+        columns = [array(typecode) for typecode in FEATURE_TYPECODES]
+        # Keys given by a generator are kept only if asked for
+        kept = [] if self.keep_keys and not isinstance(self.pqn_list, list) \
+            else None
+        for p, q, n in self.pqn_list:
+            if kept is not None:
+                kept.append((p, q, n))
+            num_p, num_n = to_number(p), to_number(n)
+            num_q = None if self.recompute_q or q is None else to_number(q)
+            for column, value in zip(
+                    columns, fingerprint_features(num_p, num_q, num_n)):
+                column.append(value)
 
-            if fingerprint.is_roca:
-                self.at_least_one_roca_fingerprint = True
+        self.features = {
+            name: np.asarray(column).astype(dtype)
+            for name, column, dtype in zip(FEATURE_COLUMNS, columns,
+                                           FEATURE_DTYPES)
+        }
+        if kept is not None:
+            self.pqn_list = kept
+        elif not self.keep_keys:
+            self.pqn_list = None
 
-            if not fingerprint.is_blum:
-                self.is_blum = False
+        divisors = np.concatenate([self.features["small_divisors_p"],
+                                   self.features["small_divisors_q"]])
+        self.at_least_one_roca_fingerprint = bool(self.features["roca"].any())
+        self.is_blum = bool(self.features["blum"].all())
 
-        # all hits
+        # Largest limit below which no p - 1 or q - 1 has small factor
         self.avoid_factors_max = -1
-        if never_below_5:
-            self.avoid_factors_max = 5
-        if never_below_251:
-            self.avoid_factors_max = 251
-        if never_below_17863:
-            self.avoid_factors_max = 17863
+        for limit in RANGE_LIMITS:
+            if not (divisors == limit).any():
+                self.avoid_factors_max = limit
+
+    def __len__(self):
+        return len(self.features["roca"]) if self.features else 0
+
+    def histogram(self, by=None):
+        """
+        Number of keys per combination of feature values
+        :param by: features to group by, BUCKET_COLUMNS by default
+        :return: tuple of feature values -> number of keys
+        """
+        import numpy as np
+
+        by = BUCKET_COLUMNS if by is None else by
+        if len(self) == 0:
+            return {}
+        stacked = np.stack([self.features[name].astype(np.int32)
+                            for name in by], axis=1)
+        values, counts = np.unique(stacked, axis=0, return_counts=True)
+        return {tuple(int(x) for x in value): int(count)
+                for value, count in zip(values, counts)}
+
+    def heatmap(self, x="msb5_p", y="msb5_q", size=32):
+        """
+        Dense 2D histogram of two small integer features
+        :return: array with number of keys at [y value, x value]
+        """
+        import numpy as np
+
+        flat = self.features[y].astype(np.int64) * size + \
+            self.features[x].astype(np.int64)
+        return np.bincount(flat, minlength=size * size).reshape(size, size)
+
+    @property
+    def pqn_fingerprints(self):
+        """Fingerprints of single keys, key material is None if dropped"""
+        keys = self.pqn_list if self.pqn_list is not None \
+            else [(None, None, None)] * len(self)
+        fingerprints = []
+        for i, (p, q, n) in enumerate(keys):
+            fingerprint = RSAFingerprint(p, q, n, recompute_q=self.recompute_q)
+            (fingerprint.msb5_p, fingerprint.msb5_q, fingerprint.msb8_n,
+             fingerprint.second_lsb_p, fingerprint.second_lsb_q,
+             fingerprint.second_lsb_n, fingerprint.small_divisors_p,
+             fingerprint.small_divisors_q, fingerprint.is_roca,
+             fingerprint.is_blum) = [self.features[name][i].item()
+                                     for name in FEATURE_COLUMNS]
+            fingerprints.append(fingerprint)
+        return fingerprints
 
     def __str__(self):
-        return (f"Total keys: {len(self.pqn_fingerprints)}, All are Blum: {self.is_blum},\n" \
+        return (f"Total keys: {len(self)}, All are Blum: {self.is_blum},\n" \
                 f"At least one ROCA: {self.at_least_one_roca_fingerprint},\n" \
                 f"Avoidance of small factors in primes: {self.avoid_factors_max}\n")
 
@@ -111,25 +306,25 @@ class RSAFingerprint:
     A after running compute_fingerprint() method, https://crocs.fi.muni.cz/public/papers/privrsa_esorics20
     fingerprint is computed.
     """
-    p = 0
-    q = 0
-    n = 0
-    msb5_p = 0
-    msb5_q = 0
-    msb8_n = 0
-    second_lsb_p = 0
-    second_lsb_q = 0
-    second_lsb_n = 0
-    small_divisors_p = -1
-    small_divisors_q = -1
-    is_roca = False
-    is_blum = False
+    __slots__ = ["p", "q", "n", "recompute_q", "msb5_p", "msb5_q", "msb8_n",
+                 "second_lsb_p", "second_lsb_q", "second_lsb_n",
+                 "small_divisors_p", "small_divisors_q", "is_roca", "is_blum"]
 
     def __init__(self, p: str, q: str, n: str, recompute_q=False):
         self.p = p
         self.q = q
         self.n = n
         self.recompute_q = recompute_q
+        self.msb5_p = 0
+        self.msb5_q = 0
+        self.msb8_n = 0
+        self.second_lsb_p = 0
+        self.second_lsb_q = 0
+        self.second_lsb_n = 0
+        self.small_divisors_p = -1
+        self.small_divisors_q = -1
+        self.is_roca = False
+        self.is_blum = False
 
     def compute_fingerprint(self):
         # In some measurements, q prime might be omitted, so we need to recompute that
@@ -142,21 +337,10 @@ class RSAFingerprint:
             num_q = int(self.q, 16)
             num_n = int(self.n, 16)
 
-        self.msb5_p, self.second_lsb_p = extract_bits5(num_p)
-        self.msb5_q, self.second_lsb_q = extract_bits5(num_q)
-        self.msb8_n, self.second_lsb_n = extract_bits8(num_n)
-
-        # Check if modulus is (probabilistically) Blum integer
-        if self.second_lsb_p == 1 or self.second_lsb_q == 1:    # if both second lsbs are 1 => n can't be Blum integer
-            self.is_blum = False
-
-        # Check small divisors
-        self.small_divisors_p = is_decreased_number_divisible(num_p)
-        self.small_divisors_q = is_decreased_number_divisible(num_q)
-
-        # Compute ROCA fingerprint
-        if app.has_fingerprint_moduli(num_n):
-            self.is_roca = True
+        (self.msb5_p, self.msb5_q, self.msb8_n,
+         self.second_lsb_p, self.second_lsb_q, self.second_lsb_n,
+         self.small_divisors_p, self.small_divisors_q,
+         self.is_roca, self.is_blum) = fingerprint_features(num_p, num_q, num_n)
 
     def __str__(self):
         return f"{self.msb5_p}, {self.msb5_q}, {self.second_lsb_p}, {self.second_lsb_q}, {self.small_divisors_p}, " \
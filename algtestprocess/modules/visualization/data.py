@@ -0,0 +1,204 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pandas import DataFrame, Series
+
+from algtestprocess.modules.data.hexcolumn import HexColumn
+
+if TYPE_CHECKING:
+    from algtestprocess.modules.data.tpm.results.cryptoprops import \
+        CryptoPropResult
+
+
+def most_significant_byte(x: int) -> int:
+    """Returns the most significant byte of the big-endian encoding of x"""
+    return x >> (
+        x.bit_length() - (8 if x.bit_length() % 8 == 0 else x.bit_length() % 8)
+    )
+
+
+class HeatmapData:
+    """
+    Computed data of the RSA heatmap, the most significant bytes of the
+    primes and moduli, independent of any matplotlib state, so that it can
+    be pickled to worker processes or stored
+    """
+
+    def __init__(self, p_byte, q_byte, n_byte):
+        self.p_byte = np.asarray(p_byte, dtype=np.uint8)
+        self.q_byte = np.asarray(q_byte, dtype=np.uint8)
+        self.n_byte = np.asarray(n_byte, dtype=np.uint8)
+
+        if len(self.p_byte) < 1:
+            raise ValueError("visualized dataframe must not be empty")
+
+        self.p_min = int(self.p_byte.min())
+        self.p_max = int(self.p_byte.max())
+        self.q_min = int(self.q_byte.min())
+        self.q_max = int(self.q_byte.max())
+        self.n_min = int(self.n_byte.min())
+        self.n_max = int(self.n_byte.max())
+
+    @property
+    def record_count(self) -> int:
+        return len(self.p_byte)
+
+    def histogram(self) -> np.ndarray:
+        """
+        Counts of (P, Q) most significant byte pairs
+        :return: 256x256 array indexed by [p, q]
+        """
+        counts = np.zeros((256, 256), dtype=np.int64)
+        np.add.at(counts, (self.p_byte, self.q_byte), 1)
+        return counts
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "p_byte": self.p_byte.tolist(),
+            "q_byte": self.q_byte.tolist(),
+            "n_byte": self.n_byte.tolist(),
+        }
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "HeatmapData":
+        return HeatmapData(d["p_byte"], d["q_byte"], d["n_byte"])
+
+
+def compute_heatmap_data(
+    df: DataFrame, result: Optional["CryptoPropResult"] = None
+) -> HeatmapData:
+    """
+    Computes the most significant bytes of P, Q and N
+    :param df: dataframe containing hex encoded n and p
+    :param result: result the dataframe is data of, its decoded columns
+    are used and shared with other analyses
+    :return: heatmap data
+    """
+    if result is not None:
+        p, q, n = result.columns(["p", "q", "n"], df)
+        # As the data doesn't contain q prime it needs to be computed
+        computed_q = result.recomputed_q(df)
+    else:
+        p, q, n = [
+            HexColumn.decode(df[name]) if name in df.columns
+            else HexColumn([None] * len(df))
+            for name in ["p", "q", "n"]
+        ]
+        computed_q = n.quotient(p)
+
+    mask = p.valid() & q.valid() & n.valid()
+    if not mask.any():
+        raise ValueError("visualized dataframe must not be empty")
+
+    return HeatmapData(
+        p.top_byte()[mask], computed_q.top_byte()[mask], n.top_byte()[mask]
+    )
+
+
+class SpectrogramData:
+    """
+    Computed data of the nonce spectrogram, the most significant bytes of
+    nonces with the signature durations and the plotted duration range
+    """
+
+    def __init__(self, xs, ys, ymin: int, ymax: int, time_unit: int = 1000000):
+        """
+        :param xs: nonce most significant bytes
+        :param ys: signature durations in seconds
+        :param ymin: minimal plotted duration in time units
+        :param ymax: maximal plotted duration in time units
+        :param time_unit: conversion constant of seconds to time units
+        """
+        self.xs = np.asarray(xs, dtype=np.uint8)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.ymin = int(ymin)
+        self.ymax = int(ymax)
+        self.time_unit = time_unit
+
+    def mesh(self) -> Tuple[List[int], List[int], np.ndarray]:
+        """
+        Remaps two dimensional data [msb of nonce, signature duration] to
+        three dimensional data [msb of nonce, signature duration, occurences]
+
+        :returns:  X values, Y values, and 2D array of size len(Y)*len(X)
+        """
+        X = list(range(256))
+        Y = list(range(self.ymin, self.ymax))
+
+        Z = np.zeros((len(Y), len(X)), dtype=np.int64)
+        durations = np.round(self.ys * self.time_unit).astype(np.int64)
+        mask = (durations >= self.ymin) & (durations < self.ymax)
+        np.add.at(Z, (durations[mask] - self.ymin, self.xs[mask]), 1)
+        return X, Y, Z
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "xs": self.xs.tolist(),
+            "ys": self.ys.tolist(),
+            "ymin": self.ymin,
+            "ymax": self.ymax,
+            "time_unit": self.time_unit,
+        }
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "SpectrogramData":
+        return SpectrogramData(
+            d["xs"], d["ys"], d["ymin"], d["ymax"], d["time_unit"]
+        )
+
+
+def spectrogram_yrange(
+    df: DataFrame,
+    yrange: Tuple[Optional[float], Optional[float]] = (None, None),
+) -> Tuple[float, float]:
+    """
+    Range of signature durations shown by the spectrogram, only the duration
+    columns of the dataframe are used
+
+    :param df: dataframe containing durations
+    :param yrange: minimal and maximal duration in seconds, when not set
+    the range is estimated from the data with outliers excluded
+    :returns: minimal and maximal duration in seconds
+    """
+    ymin, ymax = yrange
+    if ymin is None or ymax is None:
+        ymin = Series(df["duration"] + df["duration_extra"]).nsmallest(5).max()
+        ymax = Series(df["duration"] + df["duration_extra"]).nlargest(5).min()
+    return ymin, ymax
+
+
+def compute_spectrogram_data(
+    df: DataFrame,
+    yrange: Tuple[Optional[float], Optional[float]] = (None, None),
+    time_unit: int = 1000000,
+    result: Optional["CryptoPropResult"] = None,
+) -> SpectrogramData:
+    """
+    Computes the most significant bytes of nonce from given dataframe
+    along with signature durations
+
+    :param df: dataframe containing nonces and durations
+    :param yrange: minimal and maximal duration in seconds, when not set
+    the range is estimated from the data with outliers excluded
+    :param time_unit: conversion constant of seconds to time units
+    :param result: result the dataframe is data of, its decoded nonces
+    are used and shared with other analyses
+    :returns: spectrogram data
+    """
+    ymin, ymax = spectrogram_yrange(df, yrange)
+
+    nonce = result.columns(["nonce"], df)[0] if result is not None \
+        else HexColumn.decode(df["nonce"])
+    duration = df.duration + df.duration_extra
+    mask = nonce.valid() & duration.notna().to_numpy()
+
+    if not mask.any():
+        raise ValueError("visualized dataframe must not be empty")
+
+    return SpectrogramData(
+        nonce.top_byte()[mask],
+        duration.to_numpy()[mask],
+        round(ymin * time_unit),
+        round(ymax * time_unit),
+        time_unit,
+    )
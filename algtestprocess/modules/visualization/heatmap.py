@@ -1,13 +1,19 @@
+from typing import Any, Dict, List, Optional
+
 import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import logging
+import threading
 import numpy as np
 import seaborn as sns
 import matplotlib as mpl
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
 from overrides import overrides
 
-from algtestprocess.modules.visualization.plot import Plot
+from algtestprocess.modules.visualization.data import HeatmapData, \
+    compute_heatmap_data
+from algtestprocess.modules.visualization.plot import Plot, PlotCache
 
 
 class Heatmap(Plot):
@@ -17,8 +23,8 @@ class Heatmap(Plot):
 
     def __init__(
         self,
-        rsa_df,
-        device_name,
+        rsa_df=None,
+        device_name=None,
         pqnf=None,
         title="",
         fig=None,
@@ -32,6 +38,9 @@ class Heatmap(Plot):
         label_values=True,
         additional_text=None,
         additional_text_font_size=5,
+        cache: Optional[PlotCache] = None,
+        data: Optional[HeatmapData] = None,
+        result=None,
     ):
         """
         Init function  the p,q,n bytes and builds the plot
@@ -39,14 +48,23 @@ class Heatmap(Plot):
         :param device_name: to draw into the plot
         :param pqnf: possibly a function which takes df as input and returns the PQN MSBs
         :param title: text, possibly short abbreviation for the host computer
+        :param cache: optional cache of rendered plots, not used when
+        drawing into the given figure
+        :param data: precomputed heatmap data, used instead of rsa_df
+        :param result: CryptoPropResult of rsa_df, its decoded columns are
+        reused
         """
-        super().__init__()
-        pqnf = pqnf or self.compute_pqn_bytes
-        print(device_name, len(rsa_df))
+        super().__init__(cache)
+        if data is None:
+            data = (
+                HeatmapData(*pqnf(rsa_df)) if pqnf
+                else compute_heatmap_data(rsa_df, result)
+            )
+        self.data = data
         self.device_name = device_name
         self.title = title
-        self.p_byte, self.q_byte, self.n_byte = pqnf(rsa_df)
         self.fig = fig
+        self.external_fig = fig is not None
         self.ticks = ticks
         self.legend = legend
         self.parts = set(parts) if not isinstance(parts, set) else parts
@@ -58,56 +76,52 @@ class Heatmap(Plot):
         self.additional_text = additional_text
         self.additional_text_font_size = additional_text_font_size
 
-    def compute_pqn_bytes(self, df):
-        df = df.dropna(subset=["p", "q", "n"])
-
-        if len(df) < 1:
-            raise ValueError("visualized dataframe must not be empty")
-
-        # As the data doesn't contain q prime it needs to be computed
-        n = list(map(lambda x: int(x, 16), list(df.n)))
-        p = list(map(lambda x: int(x, 16), list(df.p)))
-        q = [a // b for a, b in zip(n, p)]
-
-        p_byte = [
-            x
-            >> (x.bit_length() - (8 if x.bit_length() % 8 == 0 else x.bit_length() % 8))
-            for x in p
-        ]
-        q_byte = [
-            x
-            >> (x.bit_length() - (8 if x.bit_length() % 8 == 0 else x.bit_length() % 8))
-            for x in q
-        ]
-        n_byte = [
-            x
-            >> (x.bit_length() - (8 if x.bit_length() % 8 == 0 else x.bit_length() % 8))
-            for x in n
-        ]
-
-        return p_byte, q_byte, n_byte
-
-    def heatmap(self):
-        device_name = self.device_name
-        p_byte = self.p_byte
-        q_byte = self.q_byte
-        n_byte = self.n_byte
-
-        record_count = len(p_byte)
-        p_min = min(p_byte)
-        p_max = max(p_byte)
-        q_min = min(q_byte)
-        q_max = max(q_byte)
-        n_min = min(n_byte)
-        n_max = max(n_byte)
-
-        fig = self.fig
-        if fig is None:
-            fig = plt.figure(figsize=(7.5, 12))
-            self.fig = fig
+    @overrides
+    def cache_parts(self):
+        # Plots drawn into the figure supplied by caller are not standalone
+        if self.external_fig:
+            return None
+        params = {
+            "device_name": self.device_name,
+            "title": self.title,
+            "ticks": self.ticks,
+            "legend": self.legend,
+            "parts": sorted(self.parts),
+            "part_height_ratios": list(self.part_height_ratios),
+            "text_font_size": self.text_font_size,
+            "title_font_size": self.title_font_size,
+            "label_values": self.label_values,
+            "additional_text": self.additional_text,
+            "additional_text_font_size": self.additional_text_font_size,
+        }
+        data = self.data
+        return data.p_byte, data.q_byte, data.n_byte, params
+
+    @staticmethod
+    def colormap():
+        cmap = LinearSegmentedColormap.from_list(
+            "Random gradient 9291",
+            (
+                # Edit this gradient at https://eltos.github.io/gradient/#Random%20gradient%209291=25:D35248-50:E2453B-75:BA0700-100:710000
+                (0.000, (0.827, 0.322, 0.282)),
+                (0.250, (0.827, 0.322, 0.282)),
+                (0.500, (0.886, 0.271, 0.231)),
+                (0.750, (0.729, 0.027, 0.000)),
+                (1.000, (0.443, 0.000, 0.000)),
+            ),
+        )
+        cmap.set_bad("#FFFFFF")
+        return cmap
 
+    def layout(self, fig) -> Dict[str, Any]:
+        """
+        Creates the axes of the plot parts along with the texts
+        :param fig: figure to draw into
+        :return: dictionary of created axes and text artists by name
+        """
+        parts = {}
         if "title" in self.parts:
-            fig.suptitle(
+            parts["title"] = fig.suptitle(
                 self.title, fontsize=self.title_font_size, ha="right", va="top"
             )
 
@@ -127,10 +141,6 @@ class Heatmap(Plot):
             width_ratios=(7, 2),
             height_ratios=(2, 7),
         )
-        # top_gs.left = 0.1
-        # top_gs.right = 0.9
-        # top_gs.bottom = 0.1
-        # top_gs.top = 0.9
 
         if "text" in self.parts:
             # Text gs for device name
@@ -155,18 +165,19 @@ class Heatmap(Plot):
 
         if "heatmap" in self.parts:
             hm_ax = fig.add_subplot(top_gs[1, 0])
-            hm_histx_ax = fig.add_subplot(top_gs[0, 0], sharex=hm_ax)
-            hm_histy_ax = fig.add_subplot(top_gs[1, 1], sharey=hm_ax)
+            parts["hm_ax"] = hm_ax
+            parts["hm_histx_ax"] = fig.add_subplot(top_gs[0, 0], sharex=hm_ax)
+            parts["hm_histy_ax"] = fig.add_subplot(top_gs[1, 1], sharey=hm_ax)
 
         if "text" in self.parts:
             text_ax = fig.add_subplot(
                 text_gs[0, 0] if self.additional_text is None else text_gs[1, 0]
             )
             text_ax.set_axis_off()
-            text_ax.text(
+            parts["text"] = text_ax.text(
                 0.4,
                 -5 if self.additional_text is not None else -1.2,
-                device_name,
+                self.device_name,
                 transform=text_ax.transAxes,
                 ha="center",
                 va="top",
@@ -178,7 +189,7 @@ class Heatmap(Plot):
             if self.additional_text is not None:
                 additional_text_ax = fig.add_subplot(text_gs[2:, 0])
                 additional_text_ax.set_axis_off()
-                additional_text_ax.text(
+                parts["additional_text"] = additional_text_ax.text(
                     0,
                     -5,
                     self.additional_text,
@@ -193,100 +204,103 @@ class Heatmap(Plot):
                 )
 
         if "distributions" in self.parts:
-            p_dens_ax = fig.add_subplot(bottom_gs[0:2, 0:2])
-            q_dens_ax = fig.add_subplot(bottom_gs[3:, 0:2])
-            n_dens_ax = fig.add_subplot(bottom_gs[:, 2:8])
-
-        # Draw heatmap/scatterplot
-        if "heatmap" in self.parts:
-            cmap = LinearSegmentedColormap.from_list(
-                "Random gradient 9291",
-                (
-                    # Edit this gradient at https://eltos.github.io/gradient/#Random%20gradient%209291=25:D35248-50:E2453B-75:BA0700-100:710000
-                    (0.000, (0.827, 0.322, 0.282)),
-                    (0.250, (0.827, 0.322, 0.282)),
-                    (0.500, (0.886, 0.271, 0.231)),
-                    (0.750, (0.729, 0.027, 0.000)),
-                    (1.000, (0.443, 0.000, 0.000)),
-                ),
-            )
-            cmap.set_bad("#FFFFFF")
-            sns.histplot(
-                x=p_byte, y=q_byte, bins=range(128, 256), ax=hm_ax, cmap=cmap, vmin=1
-            )
-
-            hm_ax.set_xlim(128, 255)
-            hm_ax.set_ylim(128, 255)
-            hm_ax.set_xlabel("P", loc="left")
-            hm_ax.set_ylabel("Q", loc="bottom")
-
-            # Position label for P (xaxis)
-            xlbl = hm_ax.xaxis.get_label()
-            x0, y0 = xlbl.get_position()
-            hm_ax.xaxis.set_label_coords(x0 - 0.1, y0 - 0.175)
-
-            # Position label for Q (yaxis)
-            ylbl = hm_ax.yaxis.get_label()
-            x0, y0 = ylbl.get_position()
-            hm_ax.yaxis.set_label_coords(x0 - 0.1, y0 - 0.1)
+            parts["p_dens_ax"] = fig.add_subplot(bottom_gs[0:2, 0:2])
+            parts["q_dens_ax"] = fig.add_subplot(bottom_gs[3:, 0:2])
+            parts["n_dens_ax"] = fig.add_subplot(bottom_gs[:, 2:8])
+
+        return parts
+
+    def minmax_labels(self) -> List[str]:
+        """Legend labels of the P and Q minimum and maximum lines"""
+        data = self.data
+        return [
+            f"${name}$" + (" =" + format(value, "b") if self.label_values else "")
+            for name, value in [
+                ("P_{min}", data.p_min),
+                ("P_{max}", data.p_max),
+                ("Q_{min}", data.q_min),
+                ("Q_{max}", data.q_max),
+            ]
+        ]
 
-            # Colored vertical lines for maximums and minimums
+    def draw_minmax_lines(self, hm_ax):
+        """
+        Draws colored lines for maximums and minimums, and P=Q diagonal
+        :return: the drawn lines in order of legend labels
+        """
+        data = self.data
+        p_min_label, p_max_label, q_min_label, q_max_label = self.minmax_labels()
+        lines = [
             hm_ax.vlines(
-                x=p_min,
+                x=data.p_min,
                 ymin=128,
                 ymax=256,
                 colors="green",
                 ls=":",
                 lw=1,
-                label="$P_{min}$"
-                + (" =" + format(p_min, "b") if self.label_values else ""),
-            )
+                label=p_min_label,
+            ),
             hm_ax.vlines(
-                x=p_max,
+                x=data.p_max,
                 ymin=128,
                 ymax=256,
                 colors="blue",
                 ls=":",
                 lw=1,
-                label="$P_{max}$"
-                + (" =" + format(p_max, "b") if self.label_values else ""),
-            )
+                label=p_max_label,
+            ),
             hm_ax.hlines(
-                y=q_min,
+                y=data.q_min,
                 xmin=128,
                 xmax=256,
                 colors="orange",
                 ls=":",
                 lw=1,
-                label="$Q_{min}$"
-                + (" =" + format(q_min, "b") if self.label_values else ""),
-            )
+                label=q_min_label,
+            ),
             hm_ax.hlines(
-                y=q_max,
+                y=data.q_max,
                 xmin=128,
                 xmax=256,
                 colors="purple",
                 ls=":",
                 lw=1,
-                label="$Q_{max}$"
-                + (" =" + format(q_max, "b") if self.label_values else ""),
-            )
+                label=q_max_label,
+            ),
+        ]
 
-            hm_ax.plot(
-                list(range(128, 256)),
-                list(range(128, 256)),
-                "black",
-                linestyle=":",
-                marker="",
-                lw=1,
-                label="P=Q",
-            )
+        (diagonal,) = hm_ax.plot(
+            list(range(128, 256)),
+            list(range(128, 256)),
+            "black",
+            linestyle=":",
+            marker="",
+            lw=1,
+            label="P=Q",
+        )
+        return lines + [diagonal]
 
-        # Show legend
-        if self.legend:
-            hm_ax.legend(loc="lower left")
+    def style_axes(self, parts: Dict[str, Any]):
+        """Sets up labels, ticks and spines which do not depend on data"""
+        if "heatmap" in self.parts:
+            hm_ax = parts["hm_ax"]
+            hm_ax.set_xlim(128, 255)
+            hm_ax.set_ylim(128, 255)
+            hm_ax.set_xlabel("P", loc="left")
+            hm_ax.set_ylabel("Q", loc="bottom")
+
+            # Position label for P (xaxis)
+            xlbl = hm_ax.xaxis.get_label()
+            x0, y0 = xlbl.get_position()
+            hm_ax.xaxis.set_label_coords(x0 - 0.1, y0 - 0.175)
+
+            # Position label for Q (yaxis)
+            ylbl = hm_ax.yaxis.get_label()
+            x0, y0 = ylbl.get_position()
+            hm_ax.yaxis.set_label_coords(x0 - 0.1, y0 - 0.1)
 
         if self.ticks:
+            hm_ax = parts["hm_ax"]
             # Set the ticks in binary form
             ticks = list(range(128, 256, 8)) + [255]
             hm_ax.set_xticks(ticks)
@@ -297,11 +311,57 @@ class Heatmap(Plot):
             hm_ax.set_yticklabels(list(map(lambda num: format(num, "b"), ticks)))
             hm_ax.set_aspect("equal", adjustable="box")
 
+        if "heatmap" in self.parts:
+            # Turn off axes of histograms for P and Q
+            parts["hm_histx_ax"].set_axis_off()
+            parts["hm_histy_ax"].set_axis_off()
+
+        if "distributions" in self.parts:
+            for name in ["p_dens_ax", "q_dens_ax", "n_dens_ax"]:
+                ax = parts[name]
+                ax.spines["top"].set_visible(False)
+                ax.spines["left"].set_visible(False)
+                ax.spines["right"].set_visible(False)
+                ax.set_xticks([128, 256])
+                ax.set_yticks([])
+
+    def heatmap(self):
+        data = self.data
+        p_byte = data.p_byte
+        q_byte = data.q_byte
+        n_byte = data.n_byte
+
+        fig = self.fig
+        if fig is None:
+            fig = Figure(figsize=(7.5, 12))
+            self.fig = fig
+
+        parts = self.layout(fig)
+
+        # Draw heatmap/scatterplot
+        if "heatmap" in self.parts:
+            hm_ax = parts["hm_ax"]
+            sns.histplot(
+                x=p_byte,
+                y=q_byte,
+                bins=range(128, 256),
+                ax=hm_ax,
+                cmap=Heatmap.colormap(),
+                vmin=1,
+            )
+            self.draw_minmax_lines(hm_ax)
+
+        # Show legend
+        if self.legend:
+            parts["hm_ax"].legend(loc="lower left")
+
+        bins = list(range(128, 257, 1))
         if "heatmap" in self.parts:
             # Add histograms for P and Q
-            bins = list(range(128, 257, 1))
-            hm_histx_ax.hist(p_byte, bins=bins, color="white", ec="black", density=True)
-            hm_histy_ax.hist(
+            parts["hm_histx_ax"].hist(
+                p_byte, bins=bins, color="white", ec="black", density=True
+            )
+            parts["hm_histy_ax"].hist(
                 q_byte,
                 bins=bins,
                 orientation="horizontal",
@@ -310,39 +370,18 @@ class Heatmap(Plot):
                 density=True,
             )
 
-            # Turn off their axes
-            hm_histx_ax.set_axis_off()
-            hm_histy_ax.set_axis_off()
-
         if "distributions" in self.parts:
             # Draw p,q,n histograms
-            p_dens_ax.hist(
-                p_byte, bins=bins, color="black", histtype="stepfilled", density=True
-            )
-            q_dens_ax.hist(
-                q_byte, bins=bins, color="black", histtype="stepfilled", density=True
-            )
-            n_dens_ax.hist(
-                n_byte, bins=bins, color="black", histtype="stepfilled", density=True
-            )
-
-            p_dens_ax.spines["top"].set_visible(False)
-            p_dens_ax.spines["left"].set_visible(False)
-            p_dens_ax.spines["right"].set_visible(False)
-            p_dens_ax.set_xticks([128, 256])
-            p_dens_ax.set_yticks([])
-
-            q_dens_ax.spines["top"].set_visible(False)
-            q_dens_ax.spines["left"].set_visible(False)
-            q_dens_ax.spines["right"].set_visible(False)
-            q_dens_ax.set_xticks([128, 256])
-            q_dens_ax.set_yticks([])
+            for name, xs in [
+                ("p_dens_ax", p_byte),
+                ("q_dens_ax", q_byte),
+                ("n_dens_ax", n_byte),
+            ]:
+                parts[name].hist(
+                    xs, bins=bins, color="black", histtype="stepfilled", density=True
+                )
 
-            n_dens_ax.spines["top"].set_visible(False)
-            n_dens_ax.spines["left"].set_visible(False)
-            n_dens_ax.spines["right"].set_visible(False)
-            n_dens_ax.set_xticks([128, 256])
-            n_dens_ax.set_yticks([])
+        self.style_axes(parts)
 
     @overrides
     def plot(self):
@@ -451,3 +490,179 @@ class Heatmap(Plot):
         "#FF0300",
         "#FF0000",
     ]
+
+
+class HeatmapTemplate:
+    """
+    Preconfigured figure of the default heatmap layout, in which only the
+    data artists are updated for each plotted dataset
+    """
+
+    EDGES = np.arange(128, 257)
+    GRID_EDGES = np.arange(128, 256)
+
+    # Templates are not shared between threads, as figures are not thread-safe
+    _local = threading.local()
+
+    def __init__(self, heatmap: Heatmap):
+        fig = Figure(figsize=(7.5, 12))
+        FigureCanvasAgg(fig)
+        self.fig = fig
+        self.parts = heatmap.layout(fig)
+
+        hm_ax = self.parts["hm_ax"]
+        cells = len(HeatmapTemplate.GRID_EDGES) - 1
+        self.image = hm_ax.imshow(
+            np.ma.masked_all((cells, cells)),
+            cmap=Heatmap.colormap(),
+            origin="lower",
+            extent=(128, 255, 128, 255),
+            interpolation="nearest",
+            aspect="auto",
+            vmin=1,
+            vmax=1,
+        )
+        self.lines = heatmap.draw_minmax_lines(hm_ax)
+        self.legend = (
+            hm_ax.legend(handles=self.lines, loc="lower left")
+            if heatmap.legend
+            else None
+        )
+
+        zeros = np.zeros(len(HeatmapTemplate.EDGES) - 1)
+        self.histx = self.parts["hm_histx_ax"].bar(
+            HeatmapTemplate.EDGES[:-1],
+            zeros,
+            width=1,
+            align="edge",
+            color="white",
+            ec="black",
+        )
+        self.histy = self.parts["hm_histy_ax"].barh(
+            HeatmapTemplate.EDGES[:-1],
+            zeros,
+            height=1,
+            align="edge",
+            color="white",
+            ec="black",
+        )
+        self.distributions = [
+            self.parts[name].stairs(
+                zeros, HeatmapTemplate.EDGES, fill=True, color="black"
+            )
+            for name in ["p_dens_ax", "q_dens_ax", "n_dens_ax"]
+        ]
+        heatmap.style_axes(self.parts)
+
+    @staticmethod
+    def key(heatmap: Heatmap):
+        """Parameters of the heatmap which determine the layout"""
+        return (
+            frozenset(heatmap.parts),
+            heatmap.ticks,
+            heatmap.legend,
+            tuple(heatmap.part_height_ratios),
+            heatmap.text_font_size,
+            heatmap.title_font_size,
+            heatmap.additional_text is not None,
+            heatmap.additional_text_font_size,
+        )
+
+    @staticmethod
+    def get(heatmap: Heatmap) -> "HeatmapTemplate":
+        """Returns the template of this thread suitable for the heatmap"""
+        templates = getattr(HeatmapTemplate._local, "templates", None)
+        if templates is None:
+            templates = HeatmapTemplate._local.templates = {}
+        key = HeatmapTemplate.key(heatmap)
+        if key not in templates:
+            templates[key] = HeatmapTemplate(heatmap)
+        return templates[key]
+
+    @staticmethod
+    def density(xs: np.ndarray) -> np.ndarray:
+        counts, _ = np.histogram(xs, bins=HeatmapTemplate.EDGES)
+        return counts / (counts.sum() or 1)
+
+    def update(self, heatmap: Heatmap):
+        """Swaps the data artists and texts for the ones of given heatmap"""
+        data = heatmap.data
+        parts = self.parts
+
+        if "title" in parts:
+            parts["title"].set_text(heatmap.title)
+        parts["text"].set_text(heatmap.device_name)
+        if "additional_text" in parts:
+            parts["additional_text"].set_text(heatmap.additional_text)
+
+        counts, _, _ = np.histogram2d(
+            data.p_byte,
+            data.q_byte,
+            bins=[HeatmapTemplate.GRID_EDGES, HeatmapTemplate.GRID_EDGES],
+        )
+        self.image.set_data(np.ma.masked_less_equal(counts.T, 0))
+        self.image.set_clim(1, max(counts.max(), 1))
+
+        p_min_line, p_max_line, q_min_line, q_max_line, _ = self.lines
+        p_min_line.set_segments([[(data.p_min, 128), (data.p_min, 256)]])
+        p_max_line.set_segments([[(data.p_max, 128), (data.p_max, 256)]])
+        q_min_line.set_segments([[(128, data.q_min), (256, data.q_min)]])
+        q_max_line.set_segments([[(128, data.q_max), (256, data.q_max)]])
+        if self.legend is not None:
+            for text, label in zip(self.legend.get_texts(),
+                                   heatmap.minmax_labels()):
+                text.set_text(label)
+
+        for bar, height in zip(self.histx, self.density(data.p_byte)):
+            bar.set_height(height)
+        for bar, width in zip(self.histy, self.density(data.q_byte)):
+            bar.set_width(width)
+        for stairs, xs in zip(self.distributions,
+                              [data.p_byte, data.q_byte, data.n_byte]):
+            stairs.set_data(self.density(xs))
+
+        histx_ax = parts["hm_histx_ax"]
+        histx_ax.relim()
+        histx_ax.autoscale_view(scalex=False)
+        histy_ax = parts["hm_histy_ax"]
+        histy_ax.relim()
+        histy_ax.autoscale_view(scaley=False)
+        for name in ["p_dens_ax", "q_dens_ax", "n_dens_ax"]:
+            parts[name].relim()
+            parts[name].autoscale_view()
+
+
+class FastHeatmap(Heatmap):
+    """
+    Heatmap rendered into a reusable figure template, without seaborn
+
+    The counts are computed with numpy and drawn as an image, only the
+    data artists are updated for each dataset. Heatmaps with custom parts
+    or figure fall back to the regular drawing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.template: Optional[HeatmapTemplate] = None
+
+    def fast_supported(self) -> bool:
+        return not self.external_fig and Heatmap.DEFAULT_PARTS <= self.parts
+
+    @overrides
+    def plot(self):
+        if not self.fast_supported():
+            super().plot()
+            return
+        self.template = HeatmapTemplate.get(self)
+        self.template.update(self)
+        self.fig = self.template.fig
+
+    @overrides
+    def finalize(self):
+        if self.template is None:
+            super().finalize()
+            return
+        # The template figure is kept for the following heatmaps
+        self.template = None
+        self.fig = None
+        self._plotted = False
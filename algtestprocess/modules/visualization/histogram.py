@@ -2,8 +2,8 @@ import pandas as pd
 from typing import Callable, Dict, List, Optional, Tuple, Union
 from algtestprocess.modules.visualization.plot import Plot
 from overrides import overrides
-import matplotlib.pyplot as plt
-from matplotlib import gridspec
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
 import numpy as np
 
 
@@ -82,7 +82,7 @@ class HistogramMix(Plot):
         self.plots_data.setdefault(name, [])
         self.plots_data[name].append((xx, title, xlabel, ylabel, label, bins, density))
 
-    def histogram(self, ax: plt.Axes, data: List[HistData]):
+    def histogram(self, ax: Axes, data: List[HistData]):
         set_metadata = False
         for (xx, title, xlabel, ylabel, label, bins, density) in data:
             ax.hist(xx, density=density, bins=bins, label=label, alpha=0.5)
@@ -121,7 +121,8 @@ class HistogramMix(Plot):
             # closest square
             self.cols = self.rows = int(np.ceil(np.sqrt(len(self.plots_data))))
 
-        fig, axes = plt.subplots(ncols=self.cols, nrows=self.rows, figsize=(19, 19))
+        fig = Figure(figsize=(19, 19))
+        axes = fig.subplots(ncols=self.cols, nrows=self.rows)
         self.fig = fig
         self.subplots(axes)
         self.fig.tight_layout()
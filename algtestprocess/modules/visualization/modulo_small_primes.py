@@ -3,11 +3,13 @@ from math import sqrt
 from typing import Dict, List, Optional, Tuple
 from overrides import overrides
 from pandas import DataFrame
-import matplotlib.pyplot as plt
-from matplotlib.pyplot import Axes
+import matplotlib as mpl
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
 import numpy as np
 from pandas.core.ops import logical_op
 
+from algtestprocess.modules.data.hexcolumn import HexColumn
 from algtestprocess.modules.visualization.plot import Plot
 
 
@@ -19,6 +21,7 @@ class ModulusSmallPrimes(Plot):
         primes: List[int] = [11, 13, 17, 19],
         ll_primes: Optional[List[List[int]]] = None,
         grid: Optional[Tuple[int, int]] = None,
+        result=None,
     ) -> None:
         """
         Constructor of ModulusSmallPrimes plot
@@ -28,8 +31,12 @@ class ModulusSmallPrimes(Plot):
         :param primes: list of primes
         :param ll_primes: list of list of primes
         :param grid: grid of resulting plot (self.rows, self.cols)
+        :param result: CryptoPropResult of df, its decoded moduli are reused
         """
-        self.n = list(map(lambda x: int(x, 16), df.n))
+        super().__init__()
+        n = result.columns(["n"], df)[0] if result is not None \
+            else HexColumn.decode(df.n)
+        self.n = n.values()
         self.title = title
 
         self.primes = primes
@@ -78,7 +85,7 @@ class ModulusSmallPrimes(Plot):
         distribution = self.compute_distributions(primes)
 
         ax.set_prop_cycle(
-            "color", [plt.cm.Set1(i) for i in np.linspace(0, 1, len(primes))]
+            "color", [mpl.colormaps["Set1"](i) for i in np.linspace(0, 1, len(primes))]
         )
 
         for p, remainders in distribution.items():
@@ -110,7 +117,8 @@ class ModulusSmallPrimes(Plot):
 
     @overrides
     def plot(self):
-        fig, axes = plt.subplots(self.cols, self.rows, figsize=(19, 19))
+        fig = Figure(figsize=(19, 19))
+        axes = fig.subplots(self.cols, self.rows)
         self.fig = fig
         if self.ll_primes:
             self.subplots(axes)
@@ -1,41 +1,196 @@
+import hashlib
 import io
+import json
+import os
 from abc import ABC, abstractmethod
-from typing import Optional
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+import numpy as np
+from matplotlib.backend_bases import FigureCanvasBase
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure, FigureBase
+
+
+class PlotCache:
+    """
+    Content addressed store of rendered plots
+
+    Rendered images are stored under a hash of the data the plot was computed
+    from together with its rendering parameters, so that identical plots of
+    the same dataset are rendered by matplotlib only once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """
+        Computes the key from numpy arrays, lists of numbers
+        and json serializable parameters
+        """
+        h = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                h.update(str(part.dtype).encode())
+                h.update(np.ascontiguousarray(part).tobytes())
+            elif isinstance(part, (list, tuple)) and part and all(
+                    isinstance(x, (int, float, np.number)) for x in part):
+                h.update(np.asarray(part).tobytes())
+            else:
+                h.update(json.dumps(part, sort_keys=True, default=str).encode())
+            # Separator prevents collisions of concatenated parts
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    def _path(self, key: str, format: str) -> str:
+        return os.path.join(self.path, f"{key}.{format}")
+
+    def get(self, key: str, format: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key, format), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, format: str, data: bytes):
+        path = self._path(key, format)
+        # Write to temporary file first, so that concurrent readers never
+        # see partially written image
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
 
 
 class Plot(ABC):
-    def __init__(self):
-        self.fig: Optional[plt.Figure | plt.FigureBase] = None
+    """
+    Base class of visualizations
+
+    Plots draw into their own matplotlib Figure, which is rendered with
+    Agg canvas without touching pyplot global state, so that different
+    plots can be rendered concurrently from multiple threads.
+    """
+
+    def __init__(self, cache: Optional[PlotCache] = None):
+        self.fig: Optional[Figure | FigureBase] = None
+        self.cache = cache
+        self._plotted = False
+        self._key: Optional[str] = None
 
     @abstractmethod
     def plot(self):
         """Abstract method which is called by build()"""
         pass
 
+    def cache_parts(self) -> Optional[Tuple[Any, ...]]:
+        """
+        Computed data and rendering parameters which identify the plot,
+        plots which do not support caching return None
+        """
+        return None
+
+    def _cache_key(self) -> Optional[str]:
+        if self.cache is None:
+            return None
+        if self._key is None:
+            parts = self.cache_parts()
+            if parts is None:
+                return None
+            self._key = PlotCache.key(type(self).__name__, *parts)
+        return self._key
+
+    def _ensure_plotted(self):
+        if not self._plotted:
+            self.plot()
+            self._plotted = True
+
     def build(self):
-        """Builds the plot so it can be saved or shown"""
-        self.plot()
+        """
+        Builds the plot so it can be saved or shown, with cache
+        the drawing is postponed until it is known the plot is not cached
+        """
+        if self._cache_key() is None:
+            self._ensure_plotted()
         return self
 
     def show(self):
         """Shows the plot"""
+        import matplotlib.pyplot as plt
+
+        self._ensure_plotted()
+        # Let the pyplot manager of a dummy figure display our figure
+        manager = plt.figure().canvas.manager
+        manager.canvas.figure = self.fig
+        self.fig.set_canvas(manager.canvas)
         plt.show()
 
-    def svg(self):
-        """Saves svg as string"""
+    def render(self, format: str = "png") -> bytes:
+        """Renders the plot into bytes of given format, possibly from cache"""
+        key = self._cache_key()
+        if key is not None:
+            data = self.cache.get(key, format)
+            if data is not None:
+                if self._plotted:
+                    self.finalize()
+                return data
+
+        self._ensure_plotted()
+        fig = self.fig
+        # Figures created without pyplot have no backend attached
+        if type(fig.canvas) is FigureCanvasBase:
+            FigureCanvasAgg(fig)
         f = io.BytesIO()
-        plt.savefig(f, format="svg")
-        value = f.getvalue()
+        fig.savefig(f, format=format)
+        data = f.getvalue()
         f.close()
         self.finalize()
-        return value.decode("ascii")
+
+        if key is not None:
+            self.cache.put(key, format, data)
+        return data
+
+    def svg(self):
+        """Saves svg as string"""
+        return self.render("svg").decode("utf-8")
 
     def save(self, filename: str, format: str = "png"):
         """Saves the figure in under the given filename and in given format"""
-        plt.savefig(filename, format=format)
-        self.finalize()
+        data = self.render(format)
+        with open(filename, "wb") as f:
+            f.write(data)
 
     def finalize(self):
-        plt.close('all')
+        """Releases the figure, figures supplied by caller are left intact"""
+        if self.fig is not None and not getattr(self, "external_fig", False):
+            self.fig.clear()
         self.fig = None
+        self._plotted = False
+
+
+def render_plots(plots: List[Plot], format: str = "png",
+                 threads: Optional[int] = None) -> List[bytes]:
+    """
+    Renders the plots concurrently in a thread pool
+    :param plots: plots to render
+    :param format: output format of all plots
+    :param threads: number of threads, by default chosen by the executor
+    :return: rendered plots in the order of given plots
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda plot: plot.render(format), plots))
+
+
+def save_plots(items: List[Tuple[Plot, str]], format: str = "png",
+               threads: Optional[int] = None):
+    """
+    Saves the plots concurrently in a thread pool
+    :param items: tuples of plot and filename
+    :param format: output format of all plots
+    :param threads: number of threads, by default chosen by the executor
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in executor.map(lambda item: item[0].save(item[1], format),
+                              items):
+            pass
@@ -0,0 +1,259 @@
+// Client side renderer of the compact similarity table
+//
+// The similarity matrices are loaded from the payload generated by
+// algtestprocess (see pages/similarity.py). Only the visible part of the
+// table is drawn into canvas, so the page stays small for hundreds of devices.
+
+var SimilarityData = {
+  // Decodes the base64 typed array {dtype, shape, data}
+  decode: function (array) {
+    var bytes = atob(array.data);
+    var buffer = new Uint8Array(bytes.length);
+    for (var i = 0; i < bytes.length; i++) {
+      buffer[i] = bytes.charCodeAt(i);
+    }
+    if (array.dtype === "float32") {
+      return new Float32Array(buffer.buffer);
+    }
+    return buffer;
+  }
+};
+
+var SimilarityTable = {
+  draw: function (id, payload, options) {
+    var cfg = {
+      cell: 14,
+      labels: 220,
+      height: window.innerHeight - 150
+    };
+    if (options) {
+      for (var key in options) {
+        cfg[key] = options[key];
+      }
+    }
+
+    var devices = payload.devices;
+    var groups = payload.groups;
+    var n = devices.length;
+    var values = SimilarityData.decode(payload.similarity);
+    // Each pair of devices is drawn as 3x2 cells, one per group
+    var pairW = 3 * cfg.cell;
+    var pairH = 2 * cfg.cell;
+
+    var root = document.getElementById(id);
+    root.style.position = "relative";
+
+    var scroller = document.createElement("div");
+    scroller.style.overflow = "auto";
+    scroller.style.height = cfg.height + "px";
+    scroller.style.position = "relative";
+    var spacer = document.createElement("div");
+    spacer.style.width = (cfg.labels + n * pairW) + "px";
+    spacer.style.height = (cfg.labels + n * pairH) + "px";
+    scroller.appendChild(spacer);
+
+    var canvas = document.createElement("canvas");
+    canvas.style.position = "absolute";
+    canvas.style.left = "0";
+    canvas.style.top = "0";
+    canvas.style.pointerEvents = "none";
+
+    var tooltip = document.createElement("div");
+    tooltip.className = "tooltip-inner";
+    tooltip.style.position = "absolute";
+    tooltip.style.display = "none";
+    tooltip.style.pointerEvents = "none";
+    tooltip.style.whiteSpace = "nowrap";
+    tooltip.style.zIndex = "10";
+
+    root.appendChild(scroller);
+    root.appendChild(canvas);
+    root.appendChild(tooltip);
+
+    var ctx = canvas.getContext("2d");
+
+    function similarity(g, i, j) {
+      return values[(g * n + i) * n + j] / 100;
+    }
+
+    function color(s) {
+      if (Math.round(100 * s) === 0) {
+        return "#f5f5f5";
+      }
+      return s > 0.5
+        ? "rgba(140, 200, 120, " + s.toFixed(2) + ")"
+        : "rgba(200, 120, 140, " + (1 - s).toFixed(2) + ")";
+    }
+
+    function render() {
+      var w = scroller.clientWidth;
+      var h = scroller.clientHeight;
+      if (canvas.width !== w || canvas.height !== h) {
+        canvas.width = w;
+        canvas.height = h;
+      }
+      var left = scroller.scrollLeft;
+      var top = scroller.scrollTop;
+      ctx.clearRect(0, 0, w, h);
+
+      var firstCol = Math.max(0, Math.floor(left / pairW));
+      var lastCol = Math.min(n, Math.ceil((left + w - cfg.labels) / pairW));
+      var firstRow = Math.max(0, Math.floor(top / pairH));
+      var lastRow = Math.min(n, Math.ceil((top + h - cfg.labels) / pairH));
+
+      ctx.font = Math.floor(cfg.cell * 0.6) + "px sans-serif";
+      ctx.textAlign = "center";
+      ctx.textBaseline = "middle";
+      for (var i = firstRow; i < lastRow; i++) {
+        for (var j = firstCol; j < lastCol; j++) {
+          var x = cfg.labels + j * pairW - left;
+          var y = cfg.labels + i * pairH - top;
+          for (var g = 0; g < groups.length; g++) {
+            var cx = x + (g % 3) * cfg.cell;
+            var cy = y + Math.floor(g / 3) * cfg.cell;
+            if (i === j) {
+              ctx.fillStyle = "#e0e0e0";
+              ctx.fillRect(cx, cy, cfg.cell, cfg.cell);
+              continue;
+            }
+            var s = similarity(g, i, j);
+            ctx.fillStyle = color(s);
+            ctx.fillRect(cx, cy, cfg.cell, cfg.cell);
+            if (cfg.cell >= 18 && Math.round(100 * s) !== 0) {
+              ctx.fillStyle = "#000";
+              ctx.fillText(Math.round(100 * s), cx + cfg.cell / 2,
+                cy + cfg.cell / 2);
+            }
+          }
+          ctx.strokeStyle = "#fafafa";
+          ctx.strokeRect(x, y, pairW, pairH);
+        }
+      }
+
+      // Device names stay visible while scrolling
+      ctx.fillStyle = "#fff";
+      ctx.fillRect(0, 0, w, cfg.labels);
+      ctx.fillRect(0, 0, cfg.labels, h);
+      ctx.fillStyle = "#000";
+      ctx.font = "11px sans-serif";
+      ctx.textAlign = "right";
+      for (var row = firstRow; row < lastRow; row++) {
+        var ly = cfg.labels + row * pairH - top + pairH / 2;
+        ctx.fillText(devices[row], cfg.labels - 4, ly, cfg.labels - 8);
+      }
+      for (var col = firstCol; col < lastCol; col++) {
+        var lx = cfg.labels + col * pairW - left + pairW / 2;
+        ctx.save();
+        ctx.translate(lx, cfg.labels - 4);
+        ctx.rotate(-Math.PI / 2);
+        ctx.textAlign = "left";
+        ctx.fillText(devices[col], 0, 0, cfg.labels - 8);
+        ctx.restore();
+      }
+      ctx.fillStyle = "#fff";
+      ctx.fillRect(0, 0, cfg.labels, cfg.labels);
+      ctx.fillStyle = "#000";
+      ctx.textAlign = "center";
+      for (var a = 0; a < groups.length; a++) {
+        ctx.fillText(groups[a],
+          cfg.labels - pairW + (a % 3) * cfg.cell + cfg.cell / 2,
+          cfg.labels - pairH + Math.floor(a / 3) * cfg.cell + cfg.cell / 2);
+      }
+    }
+
+    function pairAt(event) {
+      var rect = scroller.getBoundingClientRect();
+      var x = event.clientX - rect.left + scroller.scrollLeft - cfg.labels;
+      var y = event.clientY - rect.top + scroller.scrollTop - cfg.labels;
+      if (event.clientX - rect.left < cfg.labels ||
+        event.clientY - rect.top < cfg.labels) {
+        return null;
+      }
+      var i = Math.floor(y / pairH);
+      var j = Math.floor(x / pairW);
+      if (i < 0 || j < 0 || i >= n || j >= n || i === j) {
+        return null;
+      }
+      return [i, j];
+    }
+
+    scroller.addEventListener("scroll", render);
+    window.addEventListener("resize", render);
+    scroller.addEventListener("mousemove", function (event) {
+      var pair = pairAt(event);
+      if (!pair) {
+        tooltip.style.display = "none";
+        scroller.style.cursor = "default";
+        return;
+      }
+      var text = devices[pair[0]] + " vs " + devices[pair[1]] + ": ";
+      for (var g = 0; g < groups.length; g++) {
+        text += (g > 0 ? ", " : "") + groups[g] + " " +
+          Math.round(100 * similarity(g, pair[0], pair[1]));
+      }
+      tooltip.textContent = text;
+      tooltip.style.display = "block";
+      tooltip.style.left = (event.clientX - root.getBoundingClientRect().left + 12) + "px";
+      tooltip.style.top = (event.clientY - root.getBoundingClientRect().top + 12) + "px";
+      scroller.style.cursor = "pointer";
+    });
+    scroller.addEventListener("mouseleave", function () {
+      tooltip.style.display = "none";
+    });
+    scroller.addEventListener("click", function (event) {
+      var pair = pairAt(event);
+      if (pair) {
+        window.location = payload.compare + "?a=" + pair[0] + "&b=" + pair[1];
+      }
+    });
+
+    render();
+  }
+};
+
+var CompareView = {
+  // Renders radar graph of the device pair given by ?a=&b= query parameters
+  draw: function (id, payload) {
+    var params = new URLSearchParams(window.location.search);
+    var a = parseInt(params.get("a"), 10);
+    var b = parseInt(params.get("b"), 10);
+    var n = payload.devices.length;
+    if (isNaN(a) || isNaN(b) || a < 0 || b < 0 || a >= n || b >= n) {
+      document.getElementById("compare-title").textContent =
+        "Unknown pair of devices";
+      return;
+    }
+
+    var name1 = payload.devices[a];
+    var name2 = payload.devices[b];
+    document.title = document.title + " - " + name1 + " vs " + name2;
+    document.getElementById("compare-title").textContent =
+      "Comparison on " + name1 + " and " + name2;
+    document.getElementById("compare-name1").textContent = name1;
+    document.getElementById("compare-name2").textContent = name2;
+
+    var radar = payload.radar;
+    var f = radar.axes.length;
+    var values = SimilarityData.decode(radar.values);
+    var avgs = SimilarityData.decode(radar.avgs);
+    var data = [a, b].map(function (p) {
+      return radar.axes.map(function (axis, k) {
+        var avg = avgs[p * f + k];
+        return {
+          axis: axis,
+          value: values[p * f + k],
+          title: isNaN(avg) ? "NS" : axis + " " + avg.toFixed(2) + " ms"
+        };
+      });
+    });
+
+    var w = document.getElementById(id.replace("#", "")).offsetWidth;
+    var h = window.innerHeight - 70;
+    RadarChart.draw(id, data, {
+      w: w - 175,
+      h: h - 175,
+      maxValue: 1.0,
+      levels: 10
+    });
+  }
+};
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Import-time benchmark of the pyprocess command line
+
+Each command is resolved (with --help) in a fresh interpreter run with
+python -X importtime, the imports are summed and checked against the budget.
+Non-plotting commands must not import the scientific stack at all.
+Help of a command group is not measured, listing the commands with their
+descriptions imports all of them.
+
+Usage: python benchmarks/importtime.py [--budget-ms 200]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ["--help"],
+    ["tpm", "metadata-update", "--help"],
+    ["tpm", "summary-create", "--help"],
+    ["javacard", "convert", "--help"],
+]
+
+HEAVY = ["numpy", "pandas", "matplotlib", "seaborn", "scipy", "PIL"]
+
+
+def importtime(args: List[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    Runs the command with -X importtime
+    :return: module -> (self, cumulative) import time in us
+    """
+    code = "from algtestprocess.modules.cli.base import cli; " \
+           f"cli({args!r})"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get("PYTHONPATH")] if p])
+    # The cli logs into its working directory
+    with tempfile.TemporaryDirectory() as cwd:
+        run = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=cwd, env=env, capture_output=True, text=True
+        )
+    if run.returncode != 0:
+        raise RuntimeError(f"{args} failed:\n{run.stderr}")
+
+    modules = {}
+    for line in run.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.rstrip()] = (int(own), int(cumulative))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--budget-ms", type=float, default=200)
+    parser.add_argument("--top", type=int, default=5,
+                        help="Number of slowest top level imports shown")
+    options = parser.parse_args()
+
+    failed = False
+    for args in COMMANDS:
+        modules = importtime(args)
+        top_level = {
+            name.strip(): cumulative
+            for name, (_, cumulative) in modules.items()
+            if not name.startswith("  ")
+        }
+        total = sum(top_level.values()) / 1000
+        heavy = sorted({
+            name.strip().split(".")[0] for name in modules
+            if name.strip().split(".")[0] in HEAVY
+        })
+        ok = total <= options.budget_ms and not heavy
+        failed |= not ok
+
+        print(f"{'ok  ' if ok else 'FAIL'} pyprocess {' '.join(args)}: "
+              f"{total:.1f} ms" + (f", imports {', '.join(heavy)}"
+                                   if heavy else ""))
+        slowest = sorted(top_level.items(), key=lambda x: -x[1])
+        for name, cumulative in slowest[:options.top]:
+            print(f"       {cumulative / 1000:8.1f} ms  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()